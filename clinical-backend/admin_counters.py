@@ -0,0 +1,168 @@
+"""
+Pre-aggregated counters for the admin dashboard
+
+A background task recomputes every counter with one $facet aggregation per
+collection (all collections in parallel) and stores the result as a single
+snapshot document. Dashboard requests read that snapshot - from a short-lived
+in-process cache when possible - so their cost does not grow with the data.
+
+Every API worker runs the background task, but only the one holding the lease
+on the snapshot document (refreshingUntil) recomputes in a given interval.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from pymongo.errors import DuplicateKeyError
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ID = "admin_dashboard"
+
+# collection -> {counter name: filter}
+COUNTER_QUERIES: Dict[str, Dict[str, dict]] = {
+    "users": {"total_users": {"userType": "user"}},
+    "doctors": {"total_doctors": {}},
+    "hospitals": {"total_hospitals": {}},
+    "background_verifications": {"pending_verifications": {"status": "pending"}},
+    "appointments": {"total_appointments": {}},
+    "user_documents": {"total_documents": {}, "pending_documents": {"status": "pending"}},
+    "doctor_portfolios": {"total_portfolios": {}, "pending_portfolios": {"status": "pending"}},
+    "doctor_patient_relationships": {"active_relationships": {"status": "active"}},
+}
+COUNTER_NAMES = {name for counters in COUNTER_QUERIES.values() for name in counters}
+
+_cache: Optional[dict] = None
+_cache_expires = 0.0
+_refresh_task: Optional[asyncio.Task] = None
+_pending_refresh: Optional[asyncio.Task] = None
+_inline_refresh: Optional[asyncio.Task] = None
+_changes_pending = False
+_refresh_lock = asyncio.Lock()
+
+
+async def _count_collection(db, collection: str, counters: Dict[str, dict]) -> Dict[str, int]:
+    """All counters of one collection in a single pass"""
+    facet = {
+        name: ([{"$match": query}] if query else []) + [{"$count": "n"}]
+        for name, query in counters.items()
+    }
+    result = await db[collection].aggregate([{"$facet": facet}]).to_list(length=1)
+    buckets = result[0] if result else {}
+    return {name: (buckets.get(name) or [{"n": 0}])[0]["n"] for name in counters}
+
+
+async def refresh_admin_counters(db) -> dict:
+    """Recompute every counter and store the snapshot"""
+    async with _refresh_lock:
+        results = await asyncio.gather(*[
+            _count_collection(db, collection, counters)
+            for collection, counters in COUNTER_QUERIES.items()
+        ])
+        values = {}
+        for counts in results:
+            values.update(counts)
+        snapshot = {"values": values, "refreshedAt": datetime.utcnow()}
+        await db.admin_counters.update_one({"_id": SNAPSHOT_ID}, {"$set": snapshot}, upsert=True)
+        _store_in_cache(snapshot)
+        return snapshot
+
+
+def _store_in_cache(snapshot: dict):
+    global _cache, _cache_expires
+    _cache = snapshot
+    _cache_expires = time.monotonic() + settings.admin_counters_cache_ttl_seconds
+
+
+async def _refresh_after_changes(db):
+    global _changes_pending
+    # Changes made while a refresh is running trigger one more pass
+    while _changes_pending:
+        _changes_pending = False
+        try:
+            await refresh_admin_counters(db)
+        except Exception as e:
+            logger.warning(f"Admin counter refresh failed: {e}")
+
+
+async def _refresh_once(db) -> dict:
+    """Inline refresh shared by every request that finds the snapshot stale"""
+    global _inline_refresh
+    if _inline_refresh is None or _inline_refresh.done():
+        _inline_refresh = asyncio.create_task(refresh_admin_counters(db))
+    # Shielded so one cancelled request does not cancel the refresh the others wait on
+    return await asyncio.shield(_inline_refresh)
+
+
+def request_admin_counters_refresh(db):
+    """Refresh in the background after an admin action changed the counted data"""
+    global _pending_refresh, _changes_pending
+    _changes_pending = True
+    if _pending_refresh is None or _pending_refresh.done():
+        _pending_refresh = asyncio.create_task(_refresh_after_changes(db))
+
+
+async def get_admin_counters(db, refresh: bool = False) -> dict:
+    """
+    Current counter snapshot: {"values": {...}, "refreshedAt": datetime}.
+    Recomputed inline only when forced or when no recent snapshot exists; concurrent
+    requests for a stale snapshot wait on the same recount.
+    """
+    if refresh:
+        return await refresh_admin_counters(db)
+    if _cache is not None and time.monotonic() < _cache_expires:
+        return _cache
+
+    snapshot = await db.admin_counters.find_one({"_id": SNAPSHOT_ID})
+    max_age = settings.admin_counters_refresh_seconds * 2
+    if (
+        not snapshot
+        or set(snapshot.get("values", {})) != COUNTER_NAMES
+        or (datetime.utcnow() - snapshot["refreshedAt"]).total_seconds() > max_age
+    ):
+        return await _refresh_once(db)
+
+    _store_in_cache(snapshot)
+    return snapshot
+
+
+async def _acquire_refresh_lease(db) -> bool:
+    """Claim the periodic recount for this process until the next interval"""
+    now = datetime.utcnow()
+    try:
+        await db.admin_counters.find_one_and_update(
+            {"_id": SNAPSHOT_ID, "$or": [{"refreshingUntil": {"$exists": False}}, {"refreshingUntil": {"$lte": now}}]},
+            {"$set": {"refreshingUntil": now + timedelta(seconds=settings.admin_counters_refresh_seconds)}},
+            projection={"_id": 1},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False  # The snapshot exists and another worker holds the lease
+    return True
+
+
+async def _refresh_loop(db):
+    while True:
+        try:
+            # Workers without the lease read the snapshot the lease holder writes
+            if await _acquire_refresh_lease(db):
+                await refresh_admin_counters(db)
+        except Exception as e:
+            logger.warning(f"Admin counter refresh failed: {e}")
+        await asyncio.sleep(settings.admin_counters_refresh_seconds)
+
+
+def start_admin_counters_refresh(db):
+    """Start the periodic refresh task (called on app startup)"""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_loop(db))
+
+
+def stop_admin_counters_refresh():
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        _refresh_task = None
@@ -0,0 +1,156 @@
+"""
+Daily rollups backing the admin analytics endpoints
+
+A scheduled job aggregates raw appointments and feedbacks into small
+per-day rollup collections:
+
+- appointment_rollups: count per (day, hospital_id, specialization, status)
+- feedback_rollups: count and rating sum per (day, doctor_id)
+
+The first run builds everything; later runs only recompute a window of
+recent days (appointment statuses keep changing around the appointment date,
+feedback is append-only), so the job cost does not grow with history.
+Analytics queries then aggregate the rollups instead of raw collections.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from pymongo import UpdateOne
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_job_task: Optional[asyncio.Task] = None
+_build_lock = asyncio.Lock()
+
+
+def _day_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, value.day)
+
+
+async def ensure_rollup_indexes(db):
+    await db.appointments.create_index("appointment_date")
+    await db.doctors.create_index("user_id")
+    await db.feedbacks.create_index("created_at")
+    await db.appointment_rollups.create_index([("day", 1), ("status", 1)])
+    await db.feedback_rollups.create_index([("day", 1), ("doctor_id", 1)])
+
+
+async def _date_range(collection, field: str) -> Optional[Tuple[datetime, datetime]]:
+    """Day range covering every document in the collection"""
+    first = await collection.find_one({field: {"$type": "date"}}, {field: 1}, sort=[(field, 1)])
+    last = await collection.find_one({field: {"$type": "date"}}, {field: 1}, sort=[(field, -1)])
+    if not first or not last:
+        return None
+    return _day_start(first[field]), _day_start(last[field]) + timedelta(days=1)
+
+
+async def _replace_window(rollups, start: datetime, end: datetime, rows: list, key_fields: tuple):
+    """Upsert the recomputed rows of a window, then drop buckets that no longer exist"""
+    computed_at = datetime.utcnow()
+    operations = []
+    for row in rows:
+        group = row.pop("_id")
+        doc = {**group, **row, "day": datetime.strptime(group["day"], "%Y-%m-%d"), "computedAt": computed_at}
+        rollup_id = "|".join(str(doc.get(field)) for field in ("day",) + key_fields)
+        operations.append(UpdateOne({"_id": rollup_id}, {"$set": doc}, upsert=True))
+    for i in range(0, len(operations), 1000):
+        await rollups.bulk_write(operations[i:i + 1000], ordered=False)
+    await rollups.delete_many({"day": {"$gte": start, "$lt": end}, "computedAt": {"$lt": computed_at}})
+
+
+async def rollup_appointments(db, start: datetime, end: datetime) -> int:
+    pipeline = [
+        {"$match": {"appointment_date": {"$gte": start, "$lt": end}}},
+        {"$lookup": {"from": "doctors", "localField": "doctor_id", "foreignField": "user_id", "as": "doctor"}},
+        {"$group": {
+            "_id": {
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$appointment_date"}},
+                "hospital_id": "$hospital_id",
+                "specialization": {"$ifNull": [{"$arrayElemAt": ["$doctor.specialization", 0]}, "Unknown"]},
+                "status": "$status"
+            },
+            "count": {"$sum": 1}
+        }}
+    ]
+    rows = await db.appointments.aggregate(pipeline).to_list(length=None)
+    await _replace_window(db.appointment_rollups, start, end, rows, ("hospital_id", "specialization", "status"))
+    return len(rows)
+
+
+async def rollup_feedbacks(db, start: datetime, end: datetime) -> int:
+    pipeline = [
+        {"$match": {"created_at": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                "doctor_id": "$doctor_id"
+            },
+            "count": {"$sum": 1},
+            "rating_sum": {"$sum": "$rating"}
+        }}
+    ]
+    rows = await db.feedbacks.aggregate(pipeline).to_list(length=None)
+    await _replace_window(db.feedback_rollups, start, end, rows, ("doctor_id",))
+    return len(rows)
+
+
+async def run_rollups(db, full: bool = False) -> dict:
+    """Build all rollups (full) or only the recent window (incremental)"""
+    async with _build_lock:
+        state = await db.analytics_rollup_state.find_one({"_id": "rollups"}) or {}
+        full = full or not state.get("fullBuildAt")
+        today = _day_start(datetime.utcnow())
+        result = {"full": full, "appointment_buckets": 0, "feedback_buckets": 0}
+
+        if full:
+            await ensure_rollup_indexes(db)
+            appointment_window = await _date_range(db.appointments, "appointment_date")
+            feedback_window = await _date_range(db.feedbacks, "created_at")
+        else:
+            appointment_window = (
+                today - timedelta(days=settings.analytics_rollup_lookback_days),
+                today + timedelta(days=settings.analytics_rollup_lookahead_days + 1)
+            )
+            # Feedback is only ever inserted - restart from the last processed day
+            feedback_window = (state.get("feedbackThrough", today) - timedelta(days=1), today + timedelta(days=1))
+
+        if appointment_window:
+            result["appointment_buckets"] = await rollup_appointments(db, *appointment_window)
+        if feedback_window:
+            result["feedback_buckets"] = await rollup_feedbacks(db, *feedback_window)
+
+        update = {"lastRunAt": datetime.utcnow(), "feedbackThrough": today}
+        if full:
+            update["fullBuildAt"] = datetime.utcnow()
+        await db.analytics_rollup_state.update_one({"_id": "rollups"}, {"$set": update}, upsert=True)
+        logger.info(f"Analytics rollups updated: {result}")
+        return result
+
+
+async def get_rollup_state(db) -> Optional[dict]:
+    return await db.analytics_rollup_state.find_one({"_id": "rollups"}, {"_id": 0})
+
+
+async def _job_loop(db):
+    while True:
+        try:
+            await run_rollups(db)
+        except Exception as e:
+            logger.warning(f"Analytics rollup job failed: {e}")
+        await asyncio.sleep(settings.analytics_rollup_interval_seconds)
+
+
+def start_analytics_rollup_job(db):
+    """Start the scheduled rollup job (called on app startup)"""
+    global _job_task
+    if _job_task is None or _job_task.done():
+        _job_task = asyncio.create_task(_job_loop(db))
+
+
+def stop_analytics_rollup_job():
+    global _job_task
+    if _job_task is not None:
+        _job_task.cancel()
+        _job_task = None
@@ -1,75 +1,136 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from collections import OrderedDict
+from typing import Dict, Optional
 from jose import JWTError, jwt
 import hashlib
 import secrets
+import time
 from config import settings
-from cryptography.fernet import Fernet
-import os
+from crypto_service import crypto_service
+from password_service import password_service
 
-# Simple password hashing using SHA-256 with salt
+# Password hashing - blocking helpers, routes use the async password_service methods
 def hash_password(password: str) -> str:
-    salt = secrets.token_hex(16)
-    hash_obj = hashlib.sha256((password + salt).encode())
-    return f"sha256:{salt}:{hash_obj.hexdigest()}"
+    return password_service.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    try:
-        method, salt, hash_value = hashed_password.split(":")
-        if method != "sha256":
-            return False
-        expected = hashlib.sha256((plain_password + salt).encode()).hexdigest()
-        return secrets.compare_digest(expected, hash_value)
-    except:
-        return False
+    return password_service.verify(plain_password, hashed_password)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+# Kid of the single SECRET_KEY used before signing keys had ids
+LEGACY_KID = "default"
+
+
+def load_jwt_keys() -> Dict[str, str]:
+    """Signing keys by kid from JWT_SIGNING_KEYS ("kid:secret,kid:secret"), falling back to SECRET_KEY"""
+    keys: Dict[str, str] = {}
+    for entry in settings.jwt_signing_keys.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        kid, _, secret = entry.partition(":")
+        if not secret:
+            raise ValueError(f"Invalid JWT_SIGNING_KEYS entry for kid '{kid}'")
+        keys[kid.strip()] = secret.strip()
+    if not keys:
+        keys[LEGACY_KID] = settings.secret_key
+    return keys
+
+
+class TokenCache:
+    """Small LRU of verified token payloads keyed by the token's SHA-256, honoring exp"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        payload = self._entries.get(key)
+        if payload is None:
+            return None
+        if payload.get("exp") is not None and payload["exp"] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def set(self, token: str, payload: dict):
+        if self.max_size <= 0:
+            return
+        self._entries[self._key(token)] = payload
+        self._entries.move_to_end(self._key(token))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+_jwt_keys = load_jwt_keys()
+_active_kid = settings.jwt_active_kid or next(iter(_jwt_keys))
+if _active_kid not in _jwt_keys:
+    raise ValueError(f"JWT active kid '{_active_kid}' is not configured")
+_token_cache = TokenCache(settings.token_cache_size)
+
+
+def _encode_token(data: dict, expire: datetime, token_type: str) -> str:
     to_encode = data.copy()
+    to_encode.update({"exp": expire, "type": token_type})
+    return jwt.encode(
+        to_encode,
+        _jwt_keys[_active_kid],
+        algorithm=settings.algorithm,
+        headers={"kid": _active_kid}
+    )
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
-    return encoded_jwt
+    return _encode_token(data, expire, "access")
+
+def create_refresh_token(data: dict, expire: Optional[datetime] = None) -> str:
+    expire = expire or datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
+    # jti keeps refresh tokens issued within the same second distinct (and identifies them for revocation)
+    return _encode_token({"jti": secrets.token_hex(8), **data}, expire, "refresh")
 
-def decode_token(token: str) -> Optional[dict]:
+def _verify_token(token: str) -> Optional[dict]:
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
+        kid = jwt.get_unverified_header(token).get("kid")
+        # Tokens issued before key ids existed were signed with SECRET_KEY
+        key = _jwt_keys.get(kid) if kid else _jwt_keys.get(LEGACY_KID, settings.secret_key)
+        if key is None:
+            return None
+        return jwt.decode(token, key, algorithms=[settings.algorithm])
     except JWTError:
         return None
 
-# Encryption utilities - cache the key to ensure consistency
-_ENCRYPTION_KEY: Optional[bytes] = None
+def decode_token(token: str, token_type: str = "access") -> Optional[dict]:
+    payload = _token_cache.get(token)
+    if payload is None:
+        payload = _verify_token(token)
+        if payload is None:
+            return None
+        _token_cache.set(token, payload)
+    # Tokens without a type claim predate refresh tokens and are access tokens
+    if payload.get("type", "access") != token_type:
+        return None
+    return payload
 
+# Encryption utilities - ciphers are built once by the crypto service
 def get_encryption_key() -> bytes:
-    """Get or create encryption key from environment - cached for consistency"""
-    global _ENCRYPTION_KEY
-    if _ENCRYPTION_KEY is None:
-        key = os.getenv('ENCRYPTION_KEY')
-        if not key:
-            # For development, use a fixed default key (in production, set ENCRYPTION_KEY env var)
-            # This ensures consistent encryption/decryption across app restarts
-            key = "xJ3mPPVZGn-rbrtxzXGM0FZD06DBoejWke5Bj_3vQNM="
-            print(f"⚠️ Using default encryption key. Set ENCRYPTION_KEY env var in production!")
-        _ENCRYPTION_KEY = key.encode()
-    return _ENCRYPTION_KEY
+    """Get the primary encryption key"""
+    return crypto_service.primary_key
 
 def encrypt_data(data: str) -> str:
     """Encrypt sensitive data"""
-    if not data:
-        return data
-    f = Fernet(get_encryption_key())
-    return f.encrypt(data.encode()).decode()
+    return crypto_service.encrypt(data)
 
 def decrypt_data(encrypted_data: str) -> str:
     """Decrypt sensitive data"""
-    if not encrypted_data:
-        return encrypted_data
-    try:
-        f = Fernet(get_encryption_key())
-        return f.decrypt(encrypted_data.encode()).decode()
-    except:
-        # Return original data if decryption fails
-        return encrypted_data
+    return crypto_service.decrypt(encrypted_data)
@@ -0,0 +1,254 @@
+"""
+Incremental MongoDB Backup Script
+Appends every change since the last run to per-collection change logs
+
+Together with a full export_db.py snapshot this gives point-in-time restores
+(see restore_db.py) without dumping chat_messages and notifications every time.
+
+Two modes:
+- changestream: tails the database change stream (replica set / Atlas only).
+  Captures inserts, updates, replaces, deletes and drops; the resume token is
+  saved after every flushed batch.
+- watermark: polls each collection for documents created (ObjectId _id time)
+  or modified (updatedAt, or updated_at on older user/doctor writes) since the
+  last run. Works on a standalone server, but only sees writes that set one of
+  those fields. It cannot capture:
+  - deletes, including TTL expiry of notifications and archived chat messages
+  - updates that leave updatedAt alone, e.g. the one-off fix_*.py scripts or
+    manual edits in the shell
+  - documents whose _id is not an ObjectId and that carry no updatedAt
+  A point-in-time restore from these deltas can be stale for such changes;
+  use changestream mode where the server supports it.
+"auto" uses the change stream when the server supports it.
+
+Change logs: <changes-dir>/<YYYY-MM-DD>/<collection>.ndjson, one entry per line:
+    {"ts": {"$date": ...}, "op": "upsert" | "delete" | "drop", "_id": ..., "doc": {...}}
+
+Usage (from clinical-backend/):
+    python backup_changes.py --snapshot-dir db_export/wellness_db         # one pass, e.g. from cron
+    python backup_changes.py --snapshot-dir db_export/wellness_db --follow
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId, Timestamp
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
+from config import settings
+from export_db import MongoJSONEncoder, decode_value, MANIFEST
+
+DEFAULT_CHANGES_DIR = "db_export/changes"
+STATE_FILE = "state.json"
+# Fields a write sets to mark a document as modified (watermark mode)
+MODIFIED_FIELDS = ("updatedAt", "updated_at")
+
+_encoder = MongoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+class ChangeLog:
+    """Buffers change entries and appends them to the per-day, per-collection files"""
+
+    def __init__(self, changes_dir: str):
+        self.changes_dir = changes_dir
+        self.pending = {}
+        self.count = 0
+        self.written = 0
+        self._lock = asyncio.Lock()
+
+    def add(self, collection: str, ts: datetime, op: str, document_id=None, document=None):
+        entry = {"ts": ts, "op": op, "_id": document_id}
+        if document is not None:
+            entry["doc"] = document
+        self.pending.setdefault((ts.strftime("%Y-%m-%d"), collection), []).append(entry)
+        self.count += 1
+
+    def _write(self, pending: dict):
+        for (day, collection), entries in pending.items():
+            day_dir = os.path.join(self.changes_dir, day)
+            os.makedirs(day_dir, exist_ok=True)
+            with open(os.path.join(day_dir, f"{collection}.ndjson"), "a", encoding="utf-8") as f:
+                f.write("".join(_encoder.encode(entry) + "\n" for entry in entries))
+                f.flush()
+                os.fsync(f.fileno())
+
+    async def flush(self):
+        """Durably write the buffered entries - call before saving the position they lead up to"""
+        # Serialized, so entries of a collection are appended in the order they were captured
+        async with self._lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+            count, self.count = self.count, 0
+            await asyncio.to_thread(self._write, pending)
+            self.written += count
+
+def load_state(changes_dir: str) -> dict:
+    try:
+        with open(os.path.join(changes_dir, STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_state(changes_dir: str, state: dict):
+    path = os.path.join(changes_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(MongoJSONEncoder(indent=2).encode(state))
+    os.replace(path + ".tmp", path)
+
+def initial_since(args) -> datetime:
+    """Where the first incremental run starts: --since or the start of the snapshot"""
+    if args.since:
+        return datetime.fromisoformat(args.since)
+    if args.snapshot_dir:
+        with open(os.path.join(args.snapshot_dir, MANIFEST), "r", encoding="utf-8") as f:
+            started_at = json.load(f).get("started_at")
+        if started_at:
+            return decode_value(started_at)
+    raise SystemExit("First run needs --since or --snapshot-dir pointing at an export with a manifest")
+
+# ==================== CHANGE STREAM MODE ====================
+def change_time(change: dict) -> datetime:
+    if change.get("wallTime"):
+        return change["wallTime"].replace(tzinfo=None)
+    return change["clusterTime"].as_datetime().replace(tzinfo=None)
+
+async def tail_change_stream(db, args, state: dict, log: ChangeLog):
+    options = {"full_document": "updateLookup"}
+    if state.get("resume_token"):
+        options["resume_after"] = state["resume_token"]
+    else:
+        since = initial_since(args).replace(tzinfo=timezone.utc)
+        options["start_at_operation_time"] = Timestamp(int(since.timestamp()), 0)
+
+    async with db.watch(**options) as stream:
+        print(f"Tailing change stream of '{args.database}'")
+        last_flush = time.monotonic()
+        while True:
+            change = await stream.try_next()
+            if change is not None:
+                collection = change.get("ns", {}).get("coll")
+                op = change["operationType"]
+                if collection in args.exclude or op not in ("insert", "update", "replace", "delete", "drop"):
+                    continue
+                ts = change_time(change)
+                if op == "drop":
+                    log.add(collection, ts, "drop")
+                elif op == "delete":
+                    log.add(collection, ts, "delete", change["documentKey"]["_id"])
+                elif change.get("fullDocument") is not None:
+                    # Updates carry the looked-up current document, so every entry is a full replace
+                    log.add(collection, ts, "upsert", change["documentKey"]["_id"], change["fullDocument"])
+
+            idle = change is None
+            if log.count >= args.batch_size or (log.count and (idle or time.monotonic() - last_flush > 5)):
+                await log.flush()
+                state.update(mode="changestream", resume_token=stream.resume_token, last_run=datetime.utcnow())
+                save_state(args.changes_dir, state)
+                last_flush = time.monotonic()
+            if idle:
+                if not args.follow:
+                    state.update(mode="changestream", resume_token=stream.resume_token, last_run=datetime.utcnow())
+                    save_state(args.changes_dir, state)
+                    return
+                await asyncio.sleep(args.poll_seconds)
+
+# ==================== WATERMARK MODE ====================
+async def poll_collection(db, name: str, since: datetime, until: datetime, log: ChangeLog, batch_size: int) -> int:
+    """Documents created or modified in [since, until)"""
+    query = {"$or": [
+        {"_id": {"$gte": ObjectId.from_datetime(since), "$lt": ObjectId.from_datetime(until)}},
+        *({field: {"$gte": since, "$lt": until}} for field in MODIFIED_FIELDS)
+    ]}
+    changed = 0
+    async for document in db[name].find(query).batch_size(batch_size):
+        modified = [document.get(field) for field in MODIFIED_FIELDS]
+        ts = max((t for t in modified if isinstance(t, datetime) and since <= t < until), default=None)
+        if ts is None:
+            document_id = document["_id"]
+            ts = document_id.generation_time.replace(tzinfo=None) if isinstance(document_id, ObjectId) else until
+        log.add(name, ts, "upsert", document["_id"], document)
+        changed += 1
+        if log.count >= batch_size:
+            await log.flush()
+    return changed
+
+async def poll_watermarks(db, args, state: dict, log: ChangeLog):
+    while True:
+        # Whole seconds, lagging behind now, so windows line up with ObjectId timestamps
+        until = (datetime.utcnow() - timedelta(seconds=args.lag_seconds)).replace(microsecond=0)
+        watermarks = state.setdefault("watermarks", {})
+        default_since = decode_value(state["since"]) if state.get("since") else initial_since(args)
+        names = [n for n in sorted(await db.list_collection_names()) if n not in args.exclude]
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def poll_one(name: str):
+            since = decode_value(watermarks[name]) if name in watermarks else default_since
+            if since >= until:
+                return name, 0
+            async with semaphore:
+                return name, await poll_collection(db, name, since, until, log, args.batch_size)
+
+        results = await asyncio.gather(*[poll_one(name) for name in names])
+        await log.flush()
+        for name in names:
+            watermarks[name] = until
+        state.update(mode="watermark", since=default_since, last_run=datetime.utcnow())
+        save_state(args.changes_dir, state)
+        changed = {name: count for name, count in results if count}
+        print(f"Captured changes up to {until.isoformat()}: {changed or 'none'}")
+
+        if not args.follow:
+            return
+        await asyncio.sleep(args.poll_seconds)
+
+async def backup_changes(args):
+    client = AsyncIOMotorClient(args.mongodb_url)
+    db = client[args.database]
+    os.makedirs(args.changes_dir, exist_ok=True)
+    state = load_state(args.changes_dir)
+    log = ChangeLog(args.changes_dir)
+    started = time.perf_counter()
+
+    mode = args.mode
+    if mode == "auto":
+        mode = state.get("mode")
+    if mode in (None, "changestream"):
+        try:
+            await tail_change_stream(db, args, state, log)
+            mode = "changestream"
+        except OperationFailure as e:
+            if mode == "changestream" or args.mode == "changestream":
+                raise
+            print(f"Change streams unavailable ({e.details.get('errmsg', e) if e.details else e}) - using watermarks")
+            mode = "watermark"
+    if mode == "watermark":
+        await poll_watermarks(db, args, state, log)
+
+    print(f"\nIncremental backup complete: {log.written} changes in {time.perf_counter() - started:.1f}s")
+    client.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Append MongoDB changes since the last run to change logs")
+    parser.add_argument("--mongodb-url", default=settings.mongodb_url)
+    parser.add_argument("--database", default=settings.database_name)
+    parser.add_argument("--changes-dir", default=DEFAULT_CHANGES_DIR)
+    parser.add_argument("--snapshot-dir", help="Full export the change log continues from (first run only)")
+    parser.add_argument("--since", help="ISO timestamp to start from instead of the snapshot start (first run only)")
+    parser.add_argument("--mode", choices=["auto", "changestream", "watermark"], default="auto")
+    parser.add_argument("--follow", action="store_true", help="Keep running instead of exiting when caught up")
+    parser.add_argument("--poll-seconds", type=float, default=30, help="Pause between passes with --follow")
+    parser.add_argument("--lag-seconds", type=int, default=5, help="Watermark mode: ignore the most recent seconds")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Changes buffered before writing")
+    parser.add_argument("--concurrency", type=int, default=4, help="Watermark mode: collections polled at the same time")
+    parser.add_argument(
+        "--exclude", nargs="*",
+        default=["admin_counters", "analytics_rollup_state", "appointment_rollups", "feedback_rollups"],
+        help="Derived collections that are rebuilt rather than backed up"
+    )
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(backup_changes(parse_args()))
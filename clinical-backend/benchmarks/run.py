@@ -0,0 +1,318 @@
+"""
+Load runner for the hot API paths
+
+Runs scripted workloads against a running API (seeded with benchmarks.seed)
+and reports p50/p95/p99 latency and throughput per route. Results can be
+saved and compared against a previous run to see the effect of a change.
+
+Usage (from clinical-backend/):
+    python -m benchmarks.run --base-url http://localhost:8000 --duration 20 --output before.json
+    python -m benchmarks.run --base-url http://localhost:8000 --duration 20 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import aiohttp
+from benchmarks.seed import BENCH_PASSWORD, ADMIN_EMAIL, patient_email, doctor_email
+
+WORKLOADS = [
+    "appointments", "conversations", "notifications", "hospitals",
+    "admin_stats", "booking_burst", "ws_fanout"
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """Latencies and errors per route for one workload"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def add(self, route: str, seconds: float, ok: bool = True):
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+
+    def summary(self) -> Dict[str, dict]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        result = {}
+        for route, values in self.latencies.items():
+            values = sorted(values)
+            result[route] = {
+                "requests": len(values),
+                "errors": self.errors.get(route, 0),
+                "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+            }
+        return result
+
+
+class BenchContext:
+    def __init__(self, args, session: aiohttp.ClientSession):
+        self.args = args
+        self.session = session
+        self.patients: List[dict] = []
+        self.doctors: List[dict] = []
+        self.admin: Optional[dict] = None
+
+    def url(self, path: str) -> str:
+        return self.args.base_url.rstrip("/") + path
+
+    async def request(self, recorder: Recorder, route: str, method: str, path: str,
+                      account: Optional[dict] = None, **kwargs):
+        headers = {"Authorization": f"Bearer {account['token']}"} if account else {}
+        started = time.perf_counter()
+        try:
+            async with self.session.request(method, self.url(path), headers=headers, **kwargs) as response:
+                body = await response.read()
+                ok = response.status < 400
+        except aiohttp.ClientError:
+            body, ok = b"", False
+        recorder.add(route, time.perf_counter() - started, ok)
+        return body if ok else None
+
+    async def login(self, email: str) -> Optional[dict]:
+        async with self.session.post(
+            self.url("/auth/login"), json={"email": email, "password": BENCH_PASSWORD}
+        ) as response:
+            if response.status != 200:
+                return None
+            data = await response.json()
+        user = data["user"]
+        return {"token": data["access_token"], "user_id": user.get("_id") or user.get("id"), "email": email}
+
+    async def login_pool(self):
+        """Log in a pool of seeded accounts (login itself is timed separately by bcrypt cost)"""
+        count = self.args.accounts
+        patients = await asyncio.gather(*[self.login(patient_email(i)) for i in range(count)])
+        doctors = await asyncio.gather(*[self.login(doctor_email(i)) for i in range(max(1, count // 5))])
+        self.patients = [p for p in patients if p]
+        self.doctors = [d for d in doctors if d]
+        self.admin = await self.login(ADMIN_EMAIL)
+        if not self.patients:
+            raise SystemExit("Could not log in any seeded patient - run benchmarks.seed against the API's database")
+
+
+# ==================== WORKLOADS ====================
+async def closed_loop(ctx: BenchContext, operation) -> Recorder:
+    """Run `operation` from `concurrency` workers back to back for `duration` seconds"""
+    recorder = Recorder()
+    deadline = time.perf_counter() + ctx.args.duration
+
+    async def worker(index: int):
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            await operation(recorder, rng)
+
+    await asyncio.gather(*[worker(i) for i in range(ctx.args.concurrency)])
+    recorder.finished = time.perf_counter()
+    return recorder
+
+
+async def appointments_workload(ctx: BenchContext) -> Recorder:
+    async def operation(recorder, rng):
+        if ctx.doctors and rng.random() < 0.3:
+            await ctx.request(recorder, "GET /appointments/ (doctor)", "GET", "/appointments/", rng.choice(ctx.doctors))
+        else:
+            await ctx.request(recorder, "GET /appointments/ (patient)", "GET", "/appointments/", rng.choice(ctx.patients))
+    return await closed_loop(ctx, operation)
+
+
+async def conversations_workload(ctx: BenchContext) -> Recorder:
+    async def operation(recorder, rng):
+        account = rng.choice(ctx.doctors) if ctx.doctors and rng.random() < 0.3 else rng.choice(ctx.patients)
+        await ctx.request(recorder, "GET /chat/conversations", "GET", "/chat/conversations", account)
+    return await closed_loop(ctx, operation)
+
+
+async def notifications_workload(ctx: BenchContext) -> Recorder:
+    # Every open tab polls notifications every 30s - this is the steady background load
+    async def operation(recorder, rng):
+        await ctx.request(recorder, "GET /notifications/", "GET", "/notifications/", rng.choice(ctx.patients))
+    return await closed_loop(ctx, operation)
+
+
+async def hospitals_workload(ctx: BenchContext) -> Recorder:
+    async def operation(recorder, rng):
+        await ctx.request(recorder, "GET /hospitals/", "GET", "/hospitals/", rng.choice(ctx.patients))
+    return await closed_loop(ctx, operation)
+
+
+async def admin_stats_workload(ctx: BenchContext) -> Recorder:
+    if not ctx.admin:
+        return Recorder()
+
+    async def operation(recorder, rng):
+        await ctx.request(recorder, "GET /admin/stats", "GET", "/admin/stats", ctx.admin)
+    return await closed_loop(ctx, operation)
+
+
+async def booking_burst_workload(ctx: BenchContext) -> Recorder:
+    """Many patients booking at the same instant (e.g. when a popular doctor opens slots)"""
+    recorder = Recorder()
+    doctor_ids = [d["user_id"] for d in ctx.doctors] or [None]
+    for round_number in range(ctx.args.burst_rounds):
+        rng = random.Random(round_number)
+        date = (datetime.utcnow() + timedelta(days=rng.randint(1, 30))).isoformat()
+        await asyncio.gather(*[
+            ctx.request(recorder, "POST /appointments/", "POST", "/appointments/", patient, json={
+                "patient_id": patient["user_id"], "doctor_id": rng.choice(doctor_ids),
+                "hospital_id": "default_hospital", "appointment_date": date,
+                "notes": "Benchmark booking"
+            })
+            for patient in (rng.choice(ctx.patients) for _ in range(ctx.args.burst_size))
+        ])
+    recorder.finished = time.perf_counter()
+    return recorder
+
+
+async def ws_fanout_workload(ctx: BenchContext) -> Recorder:
+    """One sender, N listeners subscribed to the same conversation over the multiplexed
+    /chat/ws socket - time until every listener has the message"""
+    recorder = Recorder()
+    if not ctx.doctors:
+        return recorder
+    patient, doctor = ctx.patients[0], ctx.doctors[0]
+    conversation_id = "_".join(sorted([patient["user_id"], doctor["user_id"]]))
+    ws_base = ctx.args.base_url.replace("http", "ws", 1).rstrip("/")
+
+    listeners = []
+    for i in range(ctx.args.ws_listeners):
+        account = patient if i % 2 == 0 else doctor
+        ws = await ctx.session.ws_connect(f"{ws_base}/chat/ws?token={account['token']}")
+        await ws.send_json({"type": "subscribe", "conversation_id": conversation_id})
+        while (await ws.receive_json(timeout=10)).get("type") != "subscribed":
+            pass
+        listeners.append(ws)
+    sender = listeners[0]
+
+    async def wait_for(ws, marker: str, sent_at: float):
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                break
+            data = json.loads(msg.data)
+            if marker in json.dumps(data):
+                recorder.add("WS fan-out delivery", time.perf_counter() - sent_at)
+                return
+        recorder.add("WS fan-out delivery", time.perf_counter() - sent_at, ok=False)
+
+    try:
+        for _ in range(ctx.args.ws_messages):
+            marker = uuid.uuid4().hex
+            sent_at = time.perf_counter()
+            waiters = [asyncio.wait_for(wait_for(ws, marker, sent_at), timeout=10) for ws in listeners]
+            await sender.send_json({
+                "type": "message", "conversation_id": conversation_id,
+                "message": f"bench {marker}", "message_type": "text"
+            })
+            results = await asyncio.gather(*waiters, return_exceptions=True)
+            for result in results:
+                if isinstance(result, asyncio.TimeoutError):
+                    recorder.add("WS fan-out delivery", 10.0, ok=False)
+    finally:
+        for ws in listeners:
+            await ws.close()
+    recorder.finished = time.perf_counter()
+    return recorder
+
+
+WORKLOAD_FUNCTIONS = {
+    "appointments": appointments_workload,
+    "conversations": conversations_workload,
+    "notifications": notifications_workload,
+    "hospitals": hospitals_workload,
+    "admin_stats": admin_stats_workload,
+    "booking_burst": booking_burst_workload,
+    "ws_fanout": ws_fanout_workload,
+}
+
+
+# ==================== REPORT ====================
+def print_report(results: Dict[str, Dict[str, dict]], baseline: Optional[dict] = None):
+    header = f"{'route':<34} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    for workload, routes in results.items():
+        print(f"\n== {workload}")
+        print(header)
+        for route, stats in routes.items():
+            print(
+                f"{route:<34} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8} "
+                f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['max_ms']:>9}"
+            )
+            before = (baseline or {}).get(workload, {}).get(route)
+            if before:
+                deltas = []
+                for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+                    if before[key]:
+                        deltas.append(f"{key} {(stats[key] - before[key]) / before[key] * 100:+.1f}%")
+                print(f"{'  vs baseline':<34} " + ", ".join(deltas))
+
+
+async def main(args):
+    timeout = aiohttp.ClientTimeout(total=60)
+    connector = aiohttp.TCPConnector(limit=max(args.concurrency, args.burst_size) + args.ws_listeners + 10)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        ctx = BenchContext(args, session)
+        await ctx.login_pool()
+        print(f"Logged in {len(ctx.patients)} patients, {len(ctx.doctors)} doctors, admin={'yes' if ctx.admin else 'no'}")
+
+        results = {}
+        for name in args.workloads:
+            print(f"Running {name}...")
+            recorder = await WORKLOAD_FUNCTIONS[name](ctx)
+            results[name] = recorder.summary()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "base_url": args.base_url,
+                "ran_at": datetime.utcnow().isoformat(),
+                "settings": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+                "results": results
+            }, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Wellness API hot paths")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=WORKLOADS)
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per closed-loop workload")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients per workload")
+    parser.add_argument("--accounts", type=int, default=50, help="Seeded patients to log in (doctors: 1/5 of this)")
+    parser.add_argument("--burst-size", type=int, default=50, help="Simultaneous bookings per burst")
+    parser.add_argument("--burst-rounds", type=int, default=5)
+    parser.add_argument("--ws-listeners", type=int, default=20, help="WebSocket clients in the fan-out conversation")
+    parser.add_argument("--ws-messages", type=int, default=50)
+    parser.add_argument("--output", help="Save results as JSON")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,207 @@
+"""
+Synthetic data generator for benchmarks
+
+Seeds users, hospitals, doctors, appointments, chat messages and notifications
+at a configurable scale into a LOCAL MongoDB. Every seeded account uses the
+password BENCH_PASSWORD so the load runner can log in as any of them:
+
+    patient{i}@wellness-bench.dev, doctor{i}@wellness-bench.dev, admin@wellness-bench.dev
+
+Usage (from clinical-backend/):
+    python -m benchmarks.seed --patients 2000 --doctors 200 --drop
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from auth import hash_password, encrypt_data
+
+BENCH_PASSWORD = "benchmark123"
+BENCH_DOMAIN = "wellness-bench.dev"
+DEFAULT_MONGODB_URL = "mongodb://localhost:27017"
+DEFAULT_DATABASE = "wellness_bench"
+
+SPECIALIZATIONS = [
+    "General Medicine", "Cardiology", "Dermatology", "Neurology", "Orthopedics",
+    "Pediatrics", "Psychiatry", "Gynecology", "Ophthalmology", "ENT"
+]
+CITIES = ["Chennai", "Bangalore", "Mumbai", "Delhi", "Hyderabad", "Pune", "Kolkata"]
+STATUSES = ["pending", "approved", "completed", "rejected", "cancelled", "missed"]
+INSERT_BATCH = 1000
+
+
+def patient_email(i: int) -> str:
+    return f"patient{i}@{BENCH_DOMAIN}"
+
+
+def doctor_email(i: int) -> str:
+    return f"doctor{i}@{BENCH_DOMAIN}"
+
+
+ADMIN_EMAIL = f"admin@{BENCH_DOMAIN}"
+
+
+def is_local_url(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return url.startswith("mongodb://") and host in ("localhost", "127.0.0.1", "::1", "mongo", "mongodb")
+
+
+async def insert_batched(collection, documents: list):
+    for start in range(0, len(documents), INSERT_BATCH):
+        await collection.insert_many(documents[start:start + INSERT_BATCH], ordered=False)
+
+
+async def seed(args):
+    rng = random.Random(args.seed)
+    client = AsyncIOMotorClient(args.mongodb_url)
+    db = client[args.database]
+    started = time.perf_counter()
+
+    if args.drop:
+        for name in ("users", "hospitals", "doctors", "appointments", "chat_messages",
+                     "notifications", "doctor_verifications", "background_verifications", "medical_records"):
+            await db[name].drop()
+
+    # Hashing is deliberately slow - hash once and share it
+    password = hash_password(BENCH_PASSWORD)
+    now = datetime.utcnow()
+
+    # Users
+    admin_id = ObjectId()
+    patient_ids = [ObjectId() for _ in range(args.patients)]
+    doctor_user_ids = [ObjectId() for _ in range(args.doctors)]
+    users = [{
+        "_id": admin_id, "name": "Bench Admin", "email": ADMIN_EMAIL, "mobile": "9000000000",
+        "userType": "clinical_admin", "currentRole": "clinical_admin", "password": password, "createdAt": now
+    }]
+    users += [{
+        "_id": user_id, "name": f"Patient {i}", "email": patient_email(i), "mobile": f"9{i:09d}",
+        "userType": "user", "currentRole": "user", "password": password,
+        "createdAt": now - timedelta(days=rng.randint(0, 365))
+    } for i, user_id in enumerate(patient_ids)]
+    users += [{
+        "_id": user_id, "name": f"Dr. Bench {i}", "email": doctor_email(i), "mobile": f"8{i:09d}",
+        "userType": "doctor", "currentRole": "doctor", "password": password,
+        "createdAt": now - timedelta(days=rng.randint(0, 365))
+    } for i, user_id in enumerate(doctor_user_ids)]
+    await insert_batched(db.users, users)
+
+    # Hospitals
+    hospital_ids = [ObjectId() for _ in range(args.hospitals)]
+    await insert_batched(db.hospitals, [{
+        "_id": hospital_id, "name": f"Bench Hospital {i}", "location": f"{i} Main Road",
+        "city": rng.choice(CITIES), "rating": round(rng.uniform(3, 5), 1),
+        "specialties": rng.sample(SPECIALIZATIONS, 3), "createdAt": now
+    } for i, hospital_id in enumerate(hospital_ids)])
+
+    # Doctor profiles - most verified, the rest waiting for admin verification
+    doctors = []
+    verifications = []
+    background_verifications = []
+    for i, user_id in enumerate(doctor_user_ids):
+        verified = rng.random() >= args.unverified_ratio
+        doctor = {
+            "_id": ObjectId(), "name": f"Dr. Bench {i}", "specialization": rng.choice(SPECIALIZATIONS),
+            "hospital_id": str(rng.choice(hospital_ids)), "user_id": str(user_id),
+            "experience_years": rng.randint(1, 30), "consultation_fee": rng.choice([300, 500, 800]),
+            "rating": round(rng.uniform(3, 5), 1), "verified": verified, "is_active": verified,
+            "license_number": f"BENCH-{i:05d}", "createdAt": now
+        }
+        doctors.append(doctor)
+        if not verified:
+            verifications.append({
+                "doctor_id": str(doctor["_id"]), "user_id": str(user_id), "status": "pending",
+                "hospital_id": doctor["hospital_id"], "license_number": doctor["license_number"],
+                "createdAt": now
+            })
+            # The admin verification queue reads background_verifications
+            background_verifications.append({
+                "entity_type": "doctor", "entity_id": str(doctor["_id"]), "status": "pending",
+                "documents_required": ["Medical License"], "createdAt": now, "updatedAt": now
+            })
+    await insert_batched(db.doctors, doctors)
+    if verifications:
+        await insert_batched(db.doctor_verifications, verifications)
+        await insert_batched(db.background_verifications, background_verifications)
+    verified_doctors = [d for d in doctors if d["verified"]] or doctors
+
+    # Appointments, plus one conversation per doctor-patient pair
+    appointments = []
+    pairs = set()
+    for patient_id in patient_ids:
+        for _ in range(args.appointments_per_patient):
+            doctor = rng.choice(verified_doctors)
+            appointments.append({
+                "patient_id": str(patient_id), "doctor_id": doctor["user_id"], "hospital_id": doctor["hospital_id"],
+                "appointment_date": now + timedelta(days=rng.randint(-180, 60), hours=rng.randint(8, 18)),
+                "status": rng.choice(STATUSES), "notes": encrypt_data(f"Synthetic note {rng.randint(0, 10**6)}"),
+                "createdAt": now - timedelta(days=rng.randint(0, 180))
+            })
+            pairs.add((str(patient_id), doctor["user_id"]))
+    await insert_batched(db.appointments, appointments)
+
+    messages = []
+    for patient_id, doctor_user_id in sorted(pairs):
+        # Same format as routes.chat.get_conversation_id
+        conversation_id = "_".join(sorted([patient_id, doctor_user_id]))
+        sent = now - timedelta(days=rng.randint(0, 90))
+        for m in range(args.messages_per_conversation):
+            sender_is_patient = m % 2 == 0
+            sender_id = patient_id if sender_is_patient else doctor_user_id
+            sent += timedelta(minutes=rng.randint(1, 240))
+            messages.append({
+                "conversation_id": conversation_id, "sender_id": sender_id,
+                "sender_role": "user" if sender_is_patient else "doctor",
+                "message": f"Synthetic message {m}", "message_type": "text",
+                "read_by": [sender_id] if rng.random() < 0.3 else [patient_id, doctor_user_id],
+                "timestamp": sent.isoformat(), "deleted": False
+            })
+    await insert_batched(db.chat_messages, messages)
+
+    # Notifications
+    notifications = []
+    recipients = [(str(p), "user") for p in patient_ids] + [(str(d), "doctor") for d in doctor_user_ids]
+    for user_id, user_type in recipients:
+        for n in range(args.notifications_per_user):
+            notifications.append({
+                "user_id": user_id, "user_type": user_type, "title": "Appointment Update",
+                "message": f"Synthetic notification {n}", "type": "appointment",
+                "read": rng.random() < 0.7, "createdAt": now - timedelta(hours=rng.randint(0, 24 * 60))
+            })
+    await insert_batched(db.notifications, notifications)
+
+    client.close()
+    print(
+        f"Seeded {args.database}: {len(users)} users, {len(hospital_ids)} hospitals, {len(doctors)} doctors "
+        f"({len(verifications)} pending verification), {len(appointments)} appointments, "
+        f"{len(messages)} chat messages in {len(pairs)} conversations, {len(notifications)} notifications "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a local MongoDB with synthetic benchmark data")
+    parser.add_argument("--mongodb-url", default=DEFAULT_MONGODB_URL)
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--hospitals", type=int, default=20)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--appointments-per-patient", type=int, default=5)
+    parser.add_argument("--messages-per-conversation", type=int, default=20)
+    parser.add_argument("--notifications-per-user", type=int, default=30)
+    parser.add_argument("--unverified-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible data")
+    parser.add_argument("--drop", action="store_true", help="Drop the seeded collections first")
+    parser.add_argument("--allow-remote", action="store_true", help="Allow seeding a non-local MongoDB")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.allow_remote and not is_local_url(args.mongodb_url):
+        raise SystemExit(f"Refusing to seed non-local MongoDB {args.mongodb_url} (use --allow-remote)")
+    asyncio.run(seed(args))
@@ -7,7 +7,72 @@ class Settings(BaseSettings):
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
-    
+    refresh_token_expire_days: int = 7
+    refresh_reuse_grace_seconds: int = 30  # A used refresh token presented again within this window is refused without revoking the session (concurrent tabs)
+
+    # JWT signing key-ring: "kid:secret,kid:secret" (falls back to SECRET_KEY)
+    jwt_signing_keys: str = ""
+    jwt_active_kid: str = ""  # Kid used to sign new tokens (default: first key)
+    token_cache_size: int = 1024  # Verified token payloads kept in memory
+
+    # Field encryption keys: "key_id:fernet_key,key_id:fernet_key" (falls back to ENCRYPTION_KEY)
+    encryption_keys: str = ""
+    encryption_primary_key_id: str = ""  # Key id used for new ciphertext (default: first key)
+    crypto_offload_threshold: int = 200  # Batch decrypts larger than this run in a thread pool
+    crypto_workers: int = 2
+
+    # Background re-encryption after adding a new primary encryption key
+    key_rotation_batch_size: int = 500
+    key_rotation_batch_delay_ms: int = 200  # Pause between batches to protect production latency
+    key_rotation_max_docs_per_second: int = 1000
+
+    # Password hashing: "bcrypt_sha256", "scrypt" or "argon2" (argon2 needs argon2-cffi);
+    # "bcrypt" is accepted as bcrypt_sha256, plain bcrypt hashes only verify
+    password_hash_scheme: str = "bcrypt_sha256"
+    password_hash_cost: int = 0  # bcrypt/scrypt log2 rounds, argon2 time cost (0 = scheme default)
+    password_hash_workers: int = 4  # Max concurrent hash/verify operations
+    password_hash_budget_ms: int = 250  # Target per-hash latency used by calibration
+
+    # Logging
+    log_level: str = "INFO"
+    log_format: str = "json"  # "json" or "text"
+    log_levels: str = ""  # Per-module overrides, e.g. "routes.chat=DEBUG,pymongo=WARNING"
+
+    # Query debugging (tests/staging): N+1 detection and per-request query budgets
+    query_debug: bool = False
+    query_budget: int = 0  # Max Mongo commands per request (0 = unlimited)
+    query_budget_overrides: str = ""  # Per-route budgets, e.g. "/admin/stats=3,/chat/conversations=5"
+    query_repeat_threshold: int = 3  # Same query shape this many times in one request is flagged
+    query_budget_mode: str = "warn"  # "warn" or "raise"
+
+    # Admin dashboard counters
+    admin_counters_refresh_seconds: int = 60  # Background $facet recount interval
+    admin_counters_cache_ttl_seconds: int = 10  # In-process cache of the counter snapshot
+
+    # Analytics rollups
+    analytics_rollup_interval_seconds: int = 900  # Incremental rollup job interval
+    analytics_rollup_lookback_days: int = 30  # Past appointment days recomputed each run (late status changes)
+    analytics_rollup_lookahead_days: int = 90  # Future appointment days recomputed each run (new bookings)
+
+    # Admin exports
+    export_batch_size: int = 500  # Cursor batch size - also the most documents an export holds in memory
+
+    # Notifications
+    notification_topic_broadcasts: bool = False  # Store role-wide broadcasts once, with per-user read receipts
+    notification_counter_recount_seconds: int = 300  # Rebuild a user's unread counter from the notifications after this
+
+    # Retention
+    notification_read_retention_days: int = 30  # TTL after a notification is read (0 = keep)
+    notification_max_age_days: int = 0  # Opt-in TTL after creation - deletes unread notifications too (0 = keep)
+    chat_archive_after_days: int = 180  # Older chat messages move to chat_messages_archive (0 = never)
+    chat_archive_interval_seconds: int = 3600
+    chat_archive_bucket_size: int = 500  # Messages per compressed archive document
+
+    # Chat WebSockets
+    ws_ping_interval_seconds: int = 25  # Heartbeat: ping every socket, reap idle ones
+    ws_idle_timeout_seconds: int = 60  # Close sockets with no frame (pong or message) for this long
+    ws_send_timeout_seconds: float = 5  # A send slower than this drops the socket
+
     # OTP Mode: "static" uses 123456, "email" sends real email OTP
     otp_mode: str = "static"  # "static" = use 123456, "email" = send real email
     static_otp: str = "123456"  # Static OTP used when otp_mode is "static"
@@ -0,0 +1,209 @@
+"""
+Crypto Service for encrypting sensitive (PHI) fields
+"""
+import asyncio
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Dict, Iterable, List, Optional, Type
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+from pydantic import BaseModel, PlainSerializer
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Key id used for the single legacy ENCRYPTION_KEY
+LEGACY_KEY_ID = "default"
+
+# Every Fernet token starts with the version byte 0x80 followed by a zero-padded timestamp
+FERNET_TOKEN_PREFIX = "gAAAAA"
+
+# For development only - in production set ENCRYPTION_KEY or ENCRYPTION_KEYS
+DEV_ENCRYPTION_KEY = "xJ3mPPVZGn-rbrtxzXGM0FZD06DBoejWke5Bj_3vQNM="
+
+
+def load_key_ring() -> Dict[str, bytes]:
+    """Read encryption keys from settings/environment, ordered with the primary key first"""
+    keys: Dict[str, bytes] = {}
+    for entry in settings.encryption_keys.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        key_id, _, key = entry.partition(":")
+        if not key or ":" in key_id:
+            raise ValueError(f"Invalid ENCRYPTION_KEYS entry for key id '{key_id}'")
+        keys[key_id.strip()] = key.strip().encode()
+
+    legacy_key = os.getenv('ENCRYPTION_KEY')
+    if legacy_key and LEGACY_KEY_ID not in keys:
+        keys[LEGACY_KEY_ID] = legacy_key.encode()
+
+    if not keys:
+        # This ensures consistent encryption/decryption across app restarts
+        logger.warning("Using default encryption key. Set ENCRYPTION_KEY env var in production!")
+        keys[LEGACY_KEY_ID] = DEV_ENCRYPTION_KEY.encode()
+
+    primary = settings.encryption_primary_key_id
+    if primary:
+        if primary not in keys:
+            raise ValueError(f"Primary encryption key id '{primary}' is not configured")
+        keys = {primary: keys[primary], **{k: v for k, v in keys.items() if k != primary}}
+    return keys
+
+
+class DecryptionError(Exception):
+    """Raised when a value is ciphertext but none of the configured keys can decrypt it"""
+
+
+class CryptoService:
+    """
+    Holds pre-built Fernet ciphers for every configured key.
+
+    New ciphertext is written as "<key_id>:<fernet token>" with the primary key.
+    Bare Fernet tokens (written before key ids existed) are still readable
+    through a MultiFernet over all keys.
+    """
+
+    def __init__(self, keys: Optional[Dict[str, bytes]] = None):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.load_keys(keys if keys is not None else load_key_ring())
+
+    def load_keys(self, keys: Dict[str, bytes]):
+        """(Re)build cipher objects - the first key is the primary key"""
+        if not keys:
+            raise ValueError("At least one encryption key is required")
+        self.keys = dict(keys)
+        self.ciphers: Dict[str, Fernet] = {key_id: Fernet(key) for key_id, key in self.keys.items()}
+        self.primary_key_id = next(iter(self.ciphers))
+        self.multi = MultiFernet(list(self.ciphers.values()))
+
+    @property
+    def primary_key(self) -> bytes:
+        return self.keys[self.primary_key_id]
+
+    def key_id_of(self, value: str) -> Optional[str]:
+        """Return the key id embedded in a ciphertext, or None for legacy/plain values"""
+        if not value or ":" not in value:
+            return None
+        key_id = value.split(":", 1)[0]
+        return key_id if key_id in self.ciphers else None
+
+    def is_encrypted(self, value: str) -> bool:
+        """Cheap check whether a stored value is ciphertext (keyed or legacy bare token)"""
+        if not value:
+            return False
+        return self.key_id_of(value) is not None or value.startswith(FERNET_TOKEN_PREFIX)
+
+    def encrypt(self, data: str, key_id: Optional[str] = None) -> str:
+        """Encrypt sensitive data with the primary (or given) key"""
+        if not data:
+            return data
+        key_id = key_id or self.primary_key_id
+        token = self.ciphers[key_id].encrypt(data.encode()).decode()
+        return f"{key_id}:{token}"
+
+    def decrypt(self, encrypted_data: str, strict: bool = False) -> str:
+        """
+        Decrypt sensitive data - returns the input unchanged if it is not ciphertext.
+        Ciphertext that no configured key can decrypt raises DecryptionError when strict,
+        otherwise it is logged and returned as-is.
+        """
+        if not self.is_encrypted(encrypted_data):
+            return encrypted_data
+        key_id = self.key_id_of(encrypted_data)
+        try:
+            if key_id:
+                token = encrypted_data.split(":", 1)[1]
+                return self.ciphers[key_id].decrypt(token.encode()).decode()
+            return self.multi.decrypt(encrypted_data.encode()).decode()
+        except (InvalidToken, ValueError):
+            if strict:
+                raise DecryptionError(f"Cannot decrypt value (key id: {key_id or 'legacy'})")
+            logger.warning(f"Failed to decrypt value (key id: {key_id or 'legacy'}) - returning ciphertext")
+            return encrypted_data
+
+    def rotate(self, value: str, key_id: Optional[str] = None) -> Optional[str]:
+        """
+        Re-encrypt a ciphertext under the primary (or given) key.
+        Returns None if the value is empty, plaintext or already under that key.
+        """
+        key_id = key_id or self.primary_key_id
+        if not self.is_encrypted(value) or self.key_id_of(value) == key_id:
+            return None
+        return self.encrypt(self.decrypt(value, strict=True), key_id)
+
+    def encrypt_fields(self, records: Iterable[dict], fields: Iterable[str]) -> None:
+        """Encrypt the given fields of every record in place"""
+        fields = tuple(fields)
+        for record in records:
+            for field in fields:
+                if record.get(field):
+                    record[field] = self.encrypt(record[field])
+
+    def decrypt_fields(self, records: Iterable[dict], fields: Iterable[str]) -> None:
+        """Decrypt the given fields of every record in place"""
+        fields = tuple(fields)
+        for record in records:
+            for field in fields:
+                if record.get(field):
+                    record[field] = self.decrypt(record[field])
+
+    async def decrypt_records(self, records: List[dict], fields: Iterable[str]) -> List[dict]:
+        """Decrypt a page of records, offloading large pages to the crypto thread pool"""
+        fields = tuple(fields)
+        if len(records) < settings.crypto_offload_threshold:
+            self.decrypt_fields(records, fields)
+            return records
+
+        loop = asyncio.get_running_loop()
+        workers = max(1, settings.crypto_workers)
+        chunk_size = -(-len(records) // workers)
+        await asyncio.gather(*[
+            loop.run_in_executor(self._get_executor(), self.decrypt_fields, records[i:i + chunk_size], fields)
+            for i in range(0, len(records), chunk_size)
+        ])
+        return records
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.crypto_workers),
+                thread_name_prefix="crypto"
+            )
+        return self._executor
+
+# Global crypto service instance
+crypto_service = CryptoService()
+
+
+# ==================== FIELD-LEVEL ENCRYPTION ====================
+class Encrypted:
+    """Marks a schema field that is stored encrypted at rest"""
+
+
+def _decrypt_on_serialize(value: str) -> str:
+    return crypto_service.decrypt(value)
+
+
+# Ciphertext is decrypted only when the field is actually written to a JSON response;
+# values already decrypted by a batch pass are left alone
+EncryptedStr = Annotated[
+    Optional[str],
+    Encrypted(),
+    PlainSerializer(_decrypt_on_serialize, return_type=Optional[str], when_used="json-unless-none")
+]
+
+
+def encrypted_fields(model: Type[BaseModel]) -> List[str]:
+    """Names of the fields of a schema model marked as encrypted"""
+    return [
+        name for name, field in model.model_fields.items()
+        if any(isinstance(meta, Encrypted) for meta in field.metadata)
+    ]
+
+
+def read_projection(model: Type[BaseModel], include_encrypted: bool = True) -> Optional[dict]:
+    """Mongo projection for reading a model - excludes ciphertext entirely for listing views"""
+    if include_encrypted:
+        return None
+    return {name: 0 for name in encrypted_fields(model)} or None
@@ -1,5 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import settings
+from instrumentation import command_listener
 from typing import Optional
 from fastapi import HTTPException, status
 import logging
@@ -12,16 +13,18 @@ database = None
 async def connect_to_mongo():
     global client, database
     try:
-        client = AsyncIOMotorClient(settings.mongodb_url, serverSelectionTimeoutMS=5000)
+        client = AsyncIOMotorClient(
+            settings.mongodb_url,
+            serverSelectionTimeoutMS=5000,
+            event_listeners=[command_listener]
+        )
         database = client[settings.database_name]
         # Test the connection
         await client.admin.command('ping')
-        print("Connected to MongoDB")
         logger.info("Connected to MongoDB")
     except Exception as e:
-        print(f"Warning: Could not connect to MongoDB: {e}")
-        print("Server will start but database operations will fail until MongoDB is available.")
         logger.warning(f"MongoDB connection failed: {e}")
+        logger.warning("Server will start but database operations will fail until MongoDB is available.")
         # Still set client and database to None so we can check later
         client = None
         database = None
@@ -31,7 +34,7 @@ async def close_mongo_connection():
     if client:
         try:
             client.close()
-            print("Disconnected from MongoDB")
+            logger.info("Disconnected from MongoDB")
         except Exception as e:
             logger.error(f"Error closing MongoDB connection: {e}")
 
@@ -1,14 +1,32 @@
 """
 MongoDB Database Export Script
-Exports all collections from the wellness_db database to JSON files
+Exports collections from the wellness_db database to NDJSON files
+
+Each collection is streamed in _id order, batch by batch, into
+<collection>.ndjson (.gz / .zst when compressed) - memory use is bounded by
+the batch size, not the collection size. Collections are exported
+concurrently. After every batch a checkpoint (<collection>.checkpoint.json)
+records the last exported _id and the file size, so an interrupted export
+continues where it stopped with --resume.
+
+Usage (from clinical-backend/):
+    python export_db.py --compress gzip
+    python export_db.py --resume
 """
+import argparse
 import asyncio
+import gzip
 import json
+import os
+import time
 from datetime import datetime
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import settings
-import os
+
+DEFAULT_EXPORT_DIR = "db_export/wellness_db"
+EXTENSIONS = {"none": ".ndjson", "gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+MANIFEST = "manifest.json"
 
 # Custom JSON encoder for MongoDB types
 class MongoJSONEncoder(json.JSONEncoder):
@@ -19,34 +37,172 @@ class MongoJSONEncoder(json.JSONEncoder):
             return {"$date": obj.isoformat()}
         return super().default(obj)
 
-async def export_database():
+_encoder = MongoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+def decode_value(value):
+    """Inverse of MongoJSONEncoder for a single value"""
+    if isinstance(value, dict) and "$oid" in value:
+        return ObjectId(value["$oid"])
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+def get_compressor(compress: str):
+    """bytes -> bytes for one batch. Every batch is a complete gzip member / zstd frame,
+    so a file truncated at a checkpoint is still a valid stream"""
+    if compress == "gzip":
+        return lambda data: gzip.compress(data, compresslevel=6)
+    if compress == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("zstd compression needs the 'zstandard' package (pip install zstandard)")
+        compressor = zstandard.ZstdCompressor(level=3)
+        return compressor.compress
+    return lambda data: data
+
+def checkpoint_path(export_dir: str, collection_name: str) -> str:
+    return os.path.join(export_dir, f"{collection_name}.checkpoint.json")
+
+def load_checkpoint(export_dir: str, collection_name: str):
+    try:
+        with open(checkpoint_path(export_dir, collection_name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_checkpoint(export_dir: str, collection_name: str, checkpoint: dict):
+    path = checkpoint_path(export_dir, collection_name)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(_encoder.encode(checkpoint))
+    os.replace(path + ".tmp", path)
+
+def write_batch(filepath: str, documents: list, compress) -> int:
+    """Encode, compress and append one batch; returns the new file size"""
+    data = "".join(_encoder.encode(doc) + "\n" for doc in documents).encode("utf-8")
+    with open(filepath, "ab") as f:
+        f.write(compress(data))
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+async def export_collection(db, collection_name: str, args, compress) -> dict:
+    filename = collection_name + EXTENSIONS[args.compress]
+    filepath = os.path.join(args.output_dir, filename)
+    checkpoint = load_checkpoint(args.output_dir, collection_name) if args.resume else None
+    if checkpoint and (
+        checkpoint.get("file") != filename
+        or not os.path.exists(filepath)
+        or os.path.getsize(filepath) < checkpoint["bytes"]
+    ):
+        checkpoint = None  # Different compression or missing data - start over
+
+    if checkpoint and checkpoint.get("done"):
+        print(f"Skipping '{collection_name}' - already exported ({checkpoint['count']} documents)")
+        return checkpoint
+
+    query = {}
+    if checkpoint:
+        # Drop anything written after the last checkpoint, then continue after its last _id
+        with open(filepath, "ab") as f:
+            f.truncate(checkpoint["bytes"])
+        if checkpoint.get("last_id") is not None:
+            query = {"_id": {"$gt": decode_value(checkpoint["last_id"])}}
+        print(f"Resuming '{collection_name}' after {checkpoint['count']} documents")
+    else:
+        checkpoint = {
+            "file": filename, "count": 0, "bytes": 0, "last_id": None, "done": False,
+            "started_at": datetime.utcnow()
+        }
+        open(filepath, "wb").close()
+
+    started = time.perf_counter()
+    cursor = db[collection_name].find(query).sort("_id", 1).batch_size(args.batch_size)
+    batch = []
+
+    async def flush():
+        checkpoint["bytes"] = await asyncio.to_thread(write_batch, filepath, batch, compress)
+        checkpoint["count"] += len(batch)
+        checkpoint["last_id"] = batch[-1]["_id"]
+        save_checkpoint(args.output_dir, collection_name, checkpoint)
+        batch.clear()
+
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= args.batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    checkpoint["done"] = True
+    checkpoint["exported_at"] = datetime.utcnow()
+    save_checkpoint(args.output_dir, collection_name, checkpoint)
+    print(
+        f"Exported {checkpoint['count']} documents from '{collection_name}' to {filepath} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return checkpoint
+
+async def export_indexes(collection) -> list:
+    """Secondary index definitions, so an import can recreate them after loading"""
+    info = await collection.index_information()
+    return [
+        {"name": name, **{k: v for k, v in spec.items() if k != "ns" and k != "v"}}
+        for name, spec in info.items() if name != "_id_"
+    ]
+
+async def export_database(args):
     # Connect to MongoDB
-    client = AsyncIOMotorClient(settings.mongodb_url)
-    db = client[settings.database_name]
-    
-    # Create export directory
-    export_dir = "db_export/wellness_db"
-    os.makedirs(export_dir, exist_ok=True)
-    
-    # Get all collection names
-    collection_names = await db.list_collection_names()
-    
-    print(f"Found {len(collection_names)} collections to export:")
+    client = AsyncIOMotorClient(args.mongodb_url)
+    db = client[args.database]
+    compress = get_compressor(args.compress)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    collection_names = args.collections or sorted(await db.list_collection_names())
+    print(f"Exporting {len(collection_names)} collections ({args.concurrency} at a time):")
     print(collection_names)
-    
-    for collection_name in collection_names:
-        collection = db[collection_name]
-        documents = await collection.find({}).to_list(length=None)
-        
-        # Save to JSON file
-        filepath = os.path.join(export_dir, f"{collection_name}.json")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(documents, f, cls=MongoJSONEncoder, indent=2, ensure_ascii=False)
-        
-        print(f"Exported {len(documents)} documents from '{collection_name}' to {filepath}")
-    
-    print(f"\nDatabase export complete! Files saved to: {export_dir}")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def export_one(name: str):
+        async with semaphore:
+            return name, await export_collection(db, name, args, compress)
+
+    results = dict(await asyncio.gather(*[export_one(name) for name in collection_names]))
+    indexes = await asyncio.gather(*[export_indexes(db[name]) for name in collection_names])
+
+    manifest = {
+        "database": args.database,
+        # Changes after this point may or may not be in the files - incremental backups replay from here
+        "started_at": min(
+            (decode_value(result["started_at"]) for result in results.values() if result.get("started_at")),
+            default=None
+        ),
+        "exported_at": datetime.utcnow(),
+        "compression": args.compress,
+        "collections": {
+            name: {"file": results[name]["file"], "count": results[name]["count"], "indexes": collection_indexes}
+            for name, collection_indexes in zip(collection_names, indexes)
+        }
+    }
+    with open(os.path.join(args.output_dir, MANIFEST), "w", encoding="utf-8") as f:
+        f.write(MongoJSONEncoder(indent=2).encode(manifest))
+
+    print(f"\nDatabase export complete! Files saved to: {args.output_dir}")
     client.close()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stream MongoDB collections to NDJSON files")
+    parser.add_argument("--mongodb-url", default=settings.mongodb_url)
+    parser.add_argument("--database", default=settings.database_name)
+    parser.add_argument("--output-dir", default=DEFAULT_EXPORT_DIR)
+    parser.add_argument("--collections", nargs="+", help="Export only these collections")
+    parser.add_argument("--compress", choices=list(EXTENSIONS), default="none")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4, help="Collections exported at the same time")
+    parser.add_argument("--resume", action="store_true", help="Continue from existing checkpoints")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    asyncio.run(export_database())
+    asyncio.run(export_database(parse_args()))
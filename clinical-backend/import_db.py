@@ -1,68 +1,229 @@
 """
 MongoDB Database Import Script
-Imports all collections from JSON files back into the wellness_db database
+Imports collections from an export_db.py export back into the wellness_db database
+
+Files are parsed incrementally (NDJSON line by line, .gz/.zst transparently;
+legacy .json arrays object by object) and written with unordered bulk upserts
+keyed on _id, so re-running an import never duplicates documents. Collections
+load concurrently; secondary indexes listed in the export manifest are created
+after all data is loaded. Progress is saved per collection, so an interrupted
+import continues where it stopped with --resume.
+
+Usage (from clinical-backend/):
+    python import_db.py
+    python import_db.py --input-dir /backups/nightly --drop
+    python import_db.py --resume
 """
+import argparse
 import asyncio
+import gzip
+import io
 import json
 import os
+import time
 from datetime import datetime
+from itertools import islice
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, InsertOne, ReplaceOne
 from config import settings
 
+DEFAULT_IMPORT_DIR = "db_export/wellness_db"
+DATA_SUFFIXES = (".ndjson", ".ndjson.gz", ".ndjson.zst", ".json")
+MANIFEST = "manifest.json"
+PROGRESS_FILE = "import_progress.json"
+READ_CHUNK = 1 << 20
+
 def convert_mongo_types(obj):
-    """Convert MongoDB extended JSON types back to Python types"""
-    if isinstance(obj, dict):
-        if "$oid" in obj:
-            return ObjectId(obj["$oid"])
-        if "$date" in obj:
-            return datetime.fromisoformat(obj["$date"])
-        return {k: convert_mongo_types(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [convert_mongo_types(item) for item in obj]
+    """object_hook: convert MongoDB extended JSON types back to Python types"""
+    if "$oid" in obj and len(obj) == 1:
+        return ObjectId(obj["$oid"])
+    if "$date" in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj["$date"])
     return obj
 
-async def import_database():
+_decoder = json.JSONDecoder(object_hook=convert_mongo_types)
+
+def open_text(filepath: str):
+    if filepath.endswith(".gz"):
+        return gzip.open(filepath, "rt", encoding="utf-8")
+    if filepath.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("Reading .zst exports needs the 'zstandard' package (pip install zstandard)")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(filepath, "rb"), read_across_frames=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return open(filepath, "r", encoding="utf-8")
+
+def iter_json_array(f):
+    """Yield the objects of a (legacy) top-level JSON array without loading the whole file"""
+    buffer = ""
+    position = 0
+    while True:
+        # Skip separators between elements
+        while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+            position += 1
+        if position < len(buffer):
+            try:
+                document, position = _decoder.raw_decode(buffer, position)
+                yield document
+                continue
+            except json.JSONDecodeError:
+                pass  # Element continues in the next chunk
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            if buffer[position:].strip():
+                raise ValueError("Truncated JSON array")
+            return
+        buffer = buffer[position:] + chunk
+        position = 0
+
+def iter_documents(filepath: str):
+    with open_text(filepath) as f:
+        if filepath.endswith(".json"):
+            yield from iter_json_array(f)
+            return
+        for line in f:
+            if line.strip():
+                yield _decoder.decode(line)
+
+def find_data_files(import_dir: str) -> dict:
+    """collection -> {"file": ..., "indexes": [...]}, from the manifest or the file names"""
+    manifest_path = os.path.join(import_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)["collections"]
+
+    collections = {}
+    for filename in sorted(os.listdir(import_dir)):
+        if filename in (MANIFEST, PROGRESS_FILE) or filename.endswith(".checkpoint.json"):
+            continue
+        suffix = next((s for s in DATA_SUFFIXES if filename.endswith(s)), None)
+        if suffix:
+            name = filename[:-len(suffix)]
+            # Prefer NDJSON over a legacy .json file of the same collection
+            if name not in collections or collections[name]["file"].endswith(".json"):
+                collections[name] = {"file": filename, "indexes": []}
+    return collections
+
+class Progress:
+    """Documents applied per collection, saved after every batch"""
+
+    def __init__(self, path: str, resume: bool):
+        self.path = path
+        self.state = {}
+        if resume and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def get(self, name: str) -> dict:
+        return self.state.get(name, {"applied": 0, "done": False})
+
+    def update(self, name: str, **values):
+        self.state[name] = {**self.get(name), **values}
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(self.path + ".tmp", self.path)
+
+def to_operation(document: dict):
+    if "_id" not in document:
+        return InsertOne(document)  # Cannot be made idempotent without an _id
+    return ReplaceOne({"_id": document["_id"]}, document, upsert=True)
+
+async def import_collection(db, name: str, filepath: str, args, progress: Progress) -> int:
+    state = progress.get(name)
+    if state["done"]:
+        print(f"Skipping '{name}' - already imported ({state['applied']} documents)")
+        return state["applied"]
+
+    skip = state["applied"]
+    if skip:
+        print(f"Resuming '{name}' after {skip} documents")
+
+    documents = iter_documents(filepath)
+    if skip:
+        await asyncio.to_thread(lambda: sum(1 for _ in islice(documents, skip)))
+
+    collection = db[name]
+    applied = skip
+    batches = 0
+    started = time.perf_counter()
+    while True:
+        # Parse the next batch off the event loop, then upsert it in one round trip
+        batch = await asyncio.to_thread(lambda: list(islice(documents, args.batch_size)))
+        if not batch:
+            break
+        await collection.bulk_write([to_operation(d) for d in batch], ordered=False)
+        applied += len(batch)
+        progress.update(name, applied=applied)
+        batches += 1
+        if batches % args.report_every == 0:
+            rate = (applied - skip) / max(time.perf_counter() - started, 1e-6)
+            print(f"  '{name}': {applied} documents ({rate:.0f}/s)")
+
+    progress.update(name, applied=applied, done=True)
+    print(f"Imported {applied} documents into '{name}' in {time.perf_counter() - started:.1f}s")
+    return applied
+
+async def create_indexes(db, name: str, indexes: list):
+    models = [
+        IndexModel([tuple(key) for key in index["key"]], **{k: v for k, v in index.items() if k != "key"})
+        for index in indexes
+    ]
+    if models:
+        await db[name].create_indexes(models)
+        print(f"Created {len(models)} indexes on '{name}'")
+
+async def import_database(args):
     # Connect to MongoDB
-    client = AsyncIOMotorClient(settings.mongodb_url)
-    db = client[settings.database_name]
-    
-    import_dir = "clinical-backend/db_export/wellness_db"
-    
+    client = AsyncIOMotorClient(args.mongodb_url)
+    db = client[args.database]
+
+    import_dir = args.input_dir
     if not os.path.exists(import_dir):
         print(f"Error: Import directory '{import_dir}' not found!")
         return
-    
-    # Get all JSON files
-    json_files = [f for f in os.listdir(import_dir) if f.endswith('.json')]
-    
-    print(f"Found {len(json_files)} collections to import:")
-    
-    for json_file in json_files:
-        collection_name = json_file.replace('.json', '')
-        filepath = os.path.join(import_dir, json_file)
-        
-        with open(filepath, 'r', encoding='utf-8') as f:
-            documents = json.load(f)
-        
-        # Convert MongoDB types
-        documents = convert_mongo_types(documents)
-        
-        if documents:
-            collection = db[collection_name]
-            
-            # Optional: Clear existing collection before importing
-            # await collection.delete_many({})
-            
-            # Insert documents
-            result = await collection.insert_many(documents)
-            print(f"Imported {len(result.inserted_ids)} documents into '{collection_name}'")
-        else:
-            print(f"No documents to import for '{collection_name}'")
-    
-    print(f"\nDatabase import complete!")
+
+    collections = find_data_files(import_dir)
+    if args.collections:
+        collections = {name: info for name, info in collections.items() if name in args.collections}
+    print(f"Found {len(collections)} collections to import ({args.concurrency} at a time):")
+    print(list(collections))
+
+    progress = Progress(os.path.join(import_dir, PROGRESS_FILE), args.resume)
+    if args.drop:
+        for name in collections:
+            if not progress.get(name)["applied"]:
+                await db[name].drop()
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def import_one(name: str, info: dict):
+        async with semaphore:
+            return await import_collection(db, name, os.path.join(import_dir, info["file"]), args, progress)
+
+    counts = await asyncio.gather(*[import_one(name, info) for name, info in collections.items()])
+
+    # Indexes last - building them once is much cheaper than maintaining them on every insert
+    await asyncio.gather(*[create_indexes(db, name, info.get("indexes") or []) for name, info in collections.items()])
+
+    print(f"\nDatabase import complete! {sum(counts)} documents in {len(collections)} collections")
     client.close()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import an export_db.py export into MongoDB")
+    parser.add_argument("--mongodb-url", default=settings.mongodb_url)
+    parser.add_argument("--database", default=settings.database_name)
+    parser.add_argument("--input-dir", default=DEFAULT_IMPORT_DIR)
+    parser.add_argument("--collections", nargs="+", help="Import only these collections")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per bulk_write")
+    parser.add_argument("--concurrency", type=int, default=4, help="Collections imported at the same time")
+    parser.add_argument("--report-every", type=int, default=50, help="Print progress every N batches")
+    parser.add_argument("--drop", action="store_true", help="Drop each collection before importing it")
+    parser.add_argument("--resume", action="store_true", help="Continue from import_progress.json")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
     print("Importing database...")
-    asyncio.run(import_database())
\ No newline at end of file
+    asyncio.run(import_database(parse_args()))
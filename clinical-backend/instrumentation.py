@@ -0,0 +1,239 @@
+"""
+Request and MongoDB instrumentation
+
+- TimingMiddleware records per-route latency histograms and adds a
+  Server-Timing header (total time, DB time and query count)
+- MongoCommandListener counts every Mongo command and the DB time spent
+  in it, both globally and for the request that issued it
+- render_metrics() exposes everything in Prometheus text format (/metrics)
+"""
+import bisect
+import threading
+import time
+from collections import Counter as ShapeCounter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from pymongo import monitoring
+from config import settings
+import query_debug
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    """Per-request counters, shared by reference with Motor's worker threads"""
+
+    def __init__(self, track_shapes: bool = False):
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.db_time = 0.0
+        # Query shape -> count, only collected in query debug mode
+        self.shapes: Optional[ShapeCounter] = ShapeCounter() if track_shapes else None
+        self.lock = threading.Lock()
+
+    def add_query(self, duration: float):
+        with self.lock:
+            self.db_count += 1
+            self.db_time += duration
+
+    def add_shape(self, shape: str):
+        with self.lock:
+            self.shapes[shape] += 1
+
+
+# Stats of the request being handled in the current context (None outside requests)
+request_stats_var: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # [bucket counts..., +Inf count, sum]
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for label_values, series in sorted(items):
+            base = _format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_with_le(base, str(bound))} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{_with_le(base, "+Inf")} {cumulative}')
+            lines.append(f"{self.name}_sum{base} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _with_le(base: str, le: str) -> str:
+    if not base:
+        return f'{{le="{le}"}}'
+    return base[:-1] + f',le="{le}"}}'
+
+
+# ==================== METRICS ====================
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries", "Mongo commands issued per HTTP request", ("method", "route"),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250)
+)
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency by command", ("command",)
+)
+mongo_command_failures = Counter(
+    "mongo_command_failures_total", "Failed Mongo commands by command", ("command",)
+)
+
+REGISTRY = [http_request_duration, http_request_db_queries, mongo_command_duration, mongo_command_failures]
+
+
+def register(metric):
+    """Add a metric defined elsewhere to /metrics"""
+    REGISTRY.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ==================== MONGO COMMAND MONITORING ====================
+class MongoCommandListener(monitoring.CommandListener):
+    """Counts commands and DB time - the request context is visible because Motor copies contextvars"""
+
+    # Handshake and health checks are not issued by request handlers
+    IGNORED = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name in self.IGNORED:
+            return
+        stats = request_stats_var.get()
+        if stats is not None and stats.shapes is not None:
+            stats.add_shape(query_debug.query_shape(event.command_name, event.command))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._record(event.command_name, event.duration_micros / 1_000_000)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        mongo_command_failures.inc(event.command_name)
+        self._record(event.command_name, event.duration_micros / 1_000_000)
+
+    def _record(self, command_name: str, duration: float):
+        if command_name in self.IGNORED:
+            return
+        mongo_command_duration.observe(duration, command_name)
+        stats = request_stats_var.get()
+        if stats is not None:
+            stats.add_query(duration)
+
+
+# Global command listener instance
+command_listener = MongoCommandListener()
+
+
+# ==================== HTTP MIDDLEWARE ====================
+class TimingMiddleware:
+    """Per-route latency histograms and a Server-Timing header"""
+
+    def __init__(self, app, excluded_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(track_shapes=settings.query_debug)
+        token = request_stats_var.set(stats)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - stats.started) * 1000
+                server_timing = (
+                    f'app;dur={total_ms:.1f}, '
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.db_count} queries"'
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_stats_var.reset(token)
+            # Route template (e.g. /appointments/{appointment_id}) keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - stats.started, method, route, str(status_code))
+            http_request_db_queries.observe(stats.db_count, method, route)
+
+        if stats.shapes is not None:
+            query_debug.check_request(method, route, stats.shapes)
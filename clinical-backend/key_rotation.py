@@ -0,0 +1,224 @@
+"""
+Online re-encryption of PHI fields after an encryption key rotation
+
+Walks each collection in _id order, rewrites ciphertext that is not under the
+primary key id and checkpoints progress in the key_rotation_jobs collection,
+so a job can be paused and resumed (or picked up again after a restart).
+Each job runs in at most one task per process: resuming cancels a paused
+task that is still sleeping between batches before starting a new one.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from config import settings
+from crypto_service import crypto_service, DecryptionError
+
+logger = logging.getLogger(__name__)
+
+# Collections and the fields stored encrypted in them
+ROTATION_TARGETS: Dict[str, List[str]] = {
+    "appointments": ["notes"],
+    "medical_records": ["description", "doctor_notes"],
+}
+
+# A running job that has not checkpointed for this long is considered abandoned
+STALE_AFTER = timedelta(minutes=2)
+
+# job id -> task running it in this process
+_tasks: Dict[ObjectId, asyncio.Task] = {}
+_start_lock = asyncio.Lock()
+
+
+def _new_collection_state() -> dict:
+    return {"last_id": None, "scanned": 0, "rotated": 0, "failed": 0, "done": False}
+
+
+async def get_latest_job(db) -> Optional[dict]:
+    return await db.key_rotation_jobs.find_one(sort=[("createdAt", -1)])
+
+
+async def start_key_rotation(db) -> Optional[dict]:
+    """
+    Start a re-encryption job to the current primary key id, or resume an unfinished one.
+    Returns None if the job is already running.
+    """
+    async with _start_lock:
+        target_key_id = crypto_service.primary_key_id
+        job = await db.key_rotation_jobs.find_one({
+            "target_key_id": target_key_id,
+            "status": {"$in": ["running", "paused", "failed"]}
+        })
+
+        if job and job["status"] == "running":
+            task = _tasks.get(job["_id"])
+            is_local = task is not None and not task.done()
+            if is_local or datetime.utcnow() - job["updatedAt"] < STALE_AFTER:
+                return None
+
+        if job is None:
+            job = {
+                "target_key_id": target_key_id,
+                "status": "running",
+                "collections": {name: _new_collection_state() for name in ROTATION_TARGETS},
+                "createdAt": datetime.utcnow(),
+                "updatedAt": datetime.utcnow(),
+                "error": None
+            }
+            result = await db.key_rotation_jobs.insert_one(job)
+            job["_id"] = result.inserted_id
+        else:
+            # A paused job's task may still be sleeping between batches - it must not wake
+            # up to find the job running again alongside the new task
+            await _stop_task(job["_id"])
+            await db.key_rotation_jobs.update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": "running", "error": None, "updatedAt": datetime.utcnow()}}
+            )
+            job["status"] = "running"
+
+        _tasks[job["_id"]] = asyncio.create_task(_run_job(db, job["_id"]))
+        return job
+
+
+async def _stop_task(job_id):
+    task = _tasks.pop(job_id, None)
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def pause_key_rotation(db) -> bool:
+    """Ask the running job to stop after its current batch"""
+    result = await db.key_rotation_jobs.update_many(
+        {"status": "running"},
+        {"$set": {"status": "paused", "updatedAt": datetime.utcnow()}}
+    )
+    return result.modified_count > 0
+
+
+async def get_key_rotation_progress(db) -> Optional[dict]:
+    """Latest job with per-collection progress estimates"""
+    job = await get_latest_job(db)
+    if not job:
+        return None
+
+    collections = {}
+    for name, state in job["collections"].items():
+        total = await db[name].estimated_document_count()
+        if state["done"]:
+            percent = 100.0
+        else:
+            percent = round(min(state["scanned"] / total * 100, 99.9), 1) if total else 0.0
+        collections[name] = {
+            "scanned": state["scanned"],
+            "rotated": state["rotated"],
+            "failed": state["failed"],
+            "done": state["done"],
+            "estimated_total": total,
+            "percent": percent
+        }
+
+    return {
+        "id": str(job["_id"]),
+        "target_key_id": job["target_key_id"],
+        "status": job["status"],
+        "collections": collections,
+        "error": job.get("error"),
+        "createdAt": job["createdAt"],
+        "updatedAt": job["updatedAt"]
+    }
+
+
+async def _run_job(db, job_id):
+    try:
+        for name, fields in ROTATION_TARGETS.items():
+            if not await _rotate_collection(db, job_id, name, fields):
+                return
+        await db.key_rotation_jobs.update_one(
+            {"_id": job_id, "status": "running"},
+            {"$set": {"status": "completed", "updatedAt": datetime.utcnow()}}
+        )
+        logger.info(f"Key rotation job {job_id} completed")
+    except Exception as e:
+        logger.exception(f"Key rotation job {job_id} failed")
+        await db.key_rotation_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "failed", "error": str(e), "updatedAt": datetime.utcnow()}}
+        )
+    finally:
+        if _tasks.get(job_id) is asyncio.current_task():
+            del _tasks[job_id]
+
+
+async def _rotate_collection(db, job_id, name: str, fields: List[str]) -> bool:
+    """Rotate one collection batch by batch. Returns False if the job was paused."""
+    batch_size = max(1, settings.key_rotation_batch_size)
+    min_batch_seconds = batch_size / max(1, settings.key_rotation_max_docs_per_second)
+    projection = {field: 1 for field in fields}
+
+    while True:
+        job = await db.key_rotation_jobs.find_one({"_id": job_id})
+        if not job or job["status"] != "running":
+            return False
+        state = job["collections"][name]
+        if state["done"]:
+            return True
+
+        started = time.monotonic()
+        query = {"_id": {"$gt": state["last_id"]}} if state["last_id"] is not None else {}
+        docs = await db[name].find(query, projection).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+
+        operations = []
+        failed = 0
+        for doc in docs:
+            current = {}
+            rotated = {}
+            for field in fields:
+                value = doc.get(field)
+                try:
+                    new_value = crypto_service.rotate(value)
+                except DecryptionError:
+                    failed += 1
+                    logger.warning(f"Key rotation: cannot decrypt {name}.{field} for {doc['_id']}")
+                    continue
+                if new_value is not None:
+                    current[field] = value
+                    rotated[field] = new_value
+            if rotated:
+                # Only overwrite values that have not changed since they were read
+                operations.append(UpdateOne({"_id": doc["_id"], **current}, {"$set": rotated}))
+
+        rotated_count = 0
+        if operations:
+            result = await db[name].bulk_write(operations, ordered=False)
+            rotated_count = result.modified_count
+
+        update = {
+            "$inc": {
+                f"collections.{name}.scanned": len(docs),
+                f"collections.{name}.rotated": rotated_count,
+                f"collections.{name}.failed": failed
+            },
+            "$set": {"updatedAt": datetime.utcnow()}
+        }
+        if docs:
+            update["$set"][f"collections.{name}.last_id"] = docs[-1]["_id"]
+        if len(docs) < batch_size:
+            update["$set"][f"collections.{name}.done"] = True
+        await db.key_rotation_jobs.update_one({"_id": job_id}, update)
+
+        if len(docs) < batch_size:
+            return True
+
+        # Throttle: fixed pause plus a cap on documents per second
+        elapsed = time.monotonic() - started
+        delay = max(settings.key_rotation_batch_delay_ms / 1000, min_batch_seconds - elapsed)
+        await asyncio.sleep(delay)
@@ -1,13 +1,28 @@
+from logging_config import setup_logging, shutdown_logging, RequestIdMiddleware
+setup_logging()
+
 from fastapi import FastAPI, Request, status, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
-from database import connect_to_mongo, close_mongo_connection
+from database import connect_to_mongo, close_mongo_connection, get_database
+from admin_counters import start_admin_counters_refresh, stop_admin_counters_refresh
+from analytics_rollups import start_analytics_rollup_job, stop_analytics_rollup_job
+from notification_service import notification_service
+from retention import start_retention_job, stop_retention_job
 from routes import auth, users, hospitals, doctors, appointments, medical_records, settings, notifications
+from routes.auth import ensure_refresh_token_indexes
 from routes.admin import router as admin_router
-from routes.chat import router as chat_router
-import traceback
+from routes.analytics import router as analytics_router
+from routes.exports import router as exports_router
+from routes.chat import router as chat_router, manager as chat_connections
 from fhir.fhir_proxy import router as fhir_router
+from instrumentation import TimingMiddleware, render_metrics
+from pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+from pymongo.errors import PyMongoError
+import logging
+
+logger = logging.getLogger(__name__)
  
 app = FastAPI(
     title="Wellness API",
@@ -18,12 +33,10 @@ app = FastAPI(
 # Request validation error handler
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    print(f"\n🚨 REQUEST VALIDATION ERROR on {request.method} {request.url}")
-    print(f"📋 Request body: {await request.body()}")
-    print(f"📋 Validation errors:")
-    for error in exc.errors():
-        print(f"  • Field: {error['loc']}, Error: {error['msg']}, Type: {error['type']}")
-    print(f"❌ Validation failed with {len(exc.errors())} errors\n")
+    logger.warning(
+        f"Request validation failed on {request.method} {request.url.path} with {len(exc.errors())} errors",
+        extra={"errors": [{"field": error["loc"], "msg": error["msg"], "type": error["type"]} for error in exc.errors()]}
+    )
  
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -36,9 +49,7 @@ async def global_exception_handler(request: Request, exc: Exception):
     if isinstance(exc, HTTPException):
         raise exc  # Let FastAPI handle HTTPException
     error_detail = str(exc)
-    traceback_str = traceback.format_exc()
-    print(f"Unhandled exception: {error_detail}")
-    print(f"Traceback: {traceback_str}")
+    logger.error(f"Unhandled exception: {error_detail}", exc_info=exc)
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
@@ -47,6 +58,12 @@ async def global_exception_handler(request: Request, exc: Exception):
         }
     )
  
+# Per-route latency, DB query counts and Server-Timing header
+app.add_middleware(TimingMiddleware)
+
+# Request id for log correlation
+app.add_middleware(RequestIdMiddleware)
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -54,16 +71,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER],
 )
  
 # Event handlers
 @app.on_event("startup")
 async def startup():
     await connect_to_mongo()
+    chat_connections.start_heartbeat()
+    try:
+        db = get_database()
+    except HTTPException:
+        logger.warning("Database unavailable - admin counters refresh, analytics rollups, retention and indexes skipped")
+        return
+    start_admin_counters_refresh(db)
+    start_analytics_rollup_job(db)
+    start_retention_job(db)
+    try:
+        await notification_service.ensure_indexes(db)
+        await ensure_refresh_token_indexes(db)
+    except PyMongoError as e:
+        logger.warning(f"Notification and refresh token indexes not created: {e}")
  
 @app.on_event("shutdown")
 async def shutdown():
+    stop_admin_counters_refresh()
+    stop_analytics_rollup_job()
+    stop_retention_job()
+    chat_connections.stop_heartbeat()
     await close_mongo_connection()
+    shutdown_logging()
  
 # Include routers
 app.include_router(auth)
@@ -75,6 +112,8 @@ app.include_router(medical_records)
 app.include_router(settings)
 app.include_router(notifications)
 app.include_router(admin_router)
+app.include_router(analytics_router)
+app.include_router(exports_router)
 app.include_router(chat_router)
 app.include_router(fhir_router)
  
@@ -90,9 +129,14 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
  
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
  
  
\ No newline at end of file
@@ -0,0 +1,283 @@
+"""
+Notification dispatch
+
+Every notification write goes through here. A dispatch to many recipients -
+all clinical admins, say - is one insert_many instead of one insert_one per
+user. With NOTIFICATION_TOPIC_BROADCASTS enabled, a role-wide broadcast is
+stored once as a topic notification (audience = role) and each user's read /
+dismissed state is kept as a receipt on that document.
+
+Each user also has a counter document (unread count, latest notification id,
+version) kept up to date by every write here, so badge polling and
+conditional list requests are a single _id lookup. Counters are built lazily
+from the notifications on first read and recounted after
+NOTIFICATION_COUNTER_RECOUNT_SECONDS, which also heals drift from writes made
+outside this service. A counter whose latest notification no longer exists
+(expired by a TTL index, or deleted) is recounted straight away; expiry of
+older, already read notifications shows up at the next periodic recount.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+Recipient = Tuple[str, str]  # (user_id, user_type)
+
+RECOUNT_ATTEMPTS = 3
+
+
+class NotificationService:
+    def __init__(self):
+        self._listeners: List[Callable[[List[dict]], Awaitable[None]]] = []
+
+    def add_listener(self, listener: Callable[[List[dict]], Awaitable[None]]):
+        """Called with every batch of newly stored notifications (e.g. to push them over WebSockets)"""
+        self._listeners.append(listener)
+
+    async def _notify(self, notifications: List[dict]):
+        for listener in self._listeners:
+            try:
+                await listener(notifications)
+            except Exception as e:
+                logger.warning(f"Notification listener failed: {e}")
+
+    async def ensure_indexes(self, db):
+        await db.notifications.create_index([("user_id", 1), ("user_type", 1), ("createdAt", -1)])
+        await db.notifications.create_index([("audience", 1), ("createdAt", -1)], sparse=True)
+        await db.notification_counters.create_index("user_type")
+
+    def build(self, user_id: Optional[str], user_type: Optional[str], title: str, message: str,
+              notification_type: str = "general", **extra) -> dict:
+        notification = {
+            "user_id": user_id,
+            "user_type": user_type,
+            "title": title,
+            "message": message,
+            "type": notification_type,
+            "read": False,
+            "createdAt": datetime.utcnow()
+        }
+        notification.update({k: v for k, v in extra.items() if v is not None})
+        return notification
+
+    async def resolve_recipients(self, db, role: Optional[str] = None, user_ids: Optional[Iterable[str]] = None) -> List[Recipient]:
+        """Recipients by role and/or user id, from one projected users query"""
+        clauses = []
+        if role:
+            clauses.append({"userType": role})
+        if user_ids:
+            ids = [ObjectId(uid) for uid in set(user_ids) if ObjectId.is_valid(uid)]
+            clauses.append({"_id": {"$in": ids}})
+        if not clauses:
+            return []
+        query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+        users = await db.users.find(query, {"userType": 1}).to_list(length=None)
+        return [(str(user["_id"]), user.get("userType")) for user in users]
+
+    async def send(self, db, user_id: str, user_type: str, title: str, message: str,
+                   notification_type: str = "general", **extra) -> str:
+        """One notification to one user; returns its id"""
+        notification = self.build(user_id, user_type, title, message, notification_type, **extra)
+        result = await db.notifications.insert_one(notification)
+        await self._bump(db, {"_id": self.counter_id(user_id, user_type)}, result.inserted_id)
+        await self._notify([notification])
+        return str(result.inserted_id)
+
+    async def send_many(self, db, recipients: Iterable[Recipient], title: str, message: str,
+                        notification_type: str = "general", **extra) -> int:
+        """The same notification to every recipient in a single insert_many"""
+        notifications = [
+            self.build(user_id, user_type, title, message, notification_type, **extra)
+            for user_id, user_type in dict.fromkeys(recipients)
+        ]
+        if not notifications:
+            return 0
+        result = await db.notifications.insert_many(notifications, ordered=False)
+        counter_ids = [self.counter_id(n["user_id"], n["user_type"]) for n in notifications]
+        await self._bump(db, {"_id": {"$in": counter_ids}}, max(result.inserted_ids))
+        await self._notify(notifications)
+        logger.debug(f"Dispatched '{notification_type}' to {len(notifications)} recipients")
+        return len(notifications)
+
+    async def broadcast(self, db, role: str, title: str, message: str,
+                        notification_type: str = "general", **extra) -> int:
+        """Notify every user with the given role"""
+        if settings.notification_topic_broadcasts:
+            topic = self.build(None, None, title, message, notification_type, **extra)
+            topic.update(audience=role, read_by=[], dismissed_by=[])
+            result = await db.notifications.insert_one(topic)
+            await self._bump(db, {"user_type": role}, result.inserted_id)
+            await self._notify([topic])
+            logger.debug(f"Broadcast '{notification_type}' to role {role} as a topic notification")
+            return 1
+        recipients = await self.resolve_recipients(db, role=role)
+        return await self.send_many(db, [(user_id, role) for user_id, _ in recipients], title, message, notification_type, **extra)
+
+    # ==================== PER-USER VIEW ====================
+    def visible_to(self, user_id: str, role: str) -> dict:
+        """Filter for the notifications a user sees: their own plus undismissed topics for their role"""
+        return {"$or": [
+            {"user_id": user_id, "user_type": role},
+            {"audience": role, "dismissed_by": {"$ne": user_id}}
+        ]}
+
+    def for_user(self, notification: dict, user_id: str) -> dict:
+        """Resolve a topic notification's receipts into the user's own read flag"""
+        if "audience" in notification:
+            notification["read"] = user_id in notification.pop("read_by", [])
+            notification.pop("dismissed_by", None)
+        return notification
+
+    async def mark_read(self, db, notification_id: ObjectId, user_id: str, role: str) -> bool:
+        own = {"_id": notification_id, "user_id": user_id, "user_type": role}
+        # readAt starts the read-retention TTL (see retention.py)
+        result = await db.notifications.update_one(
+            {**own, "read": {"$ne": True}},
+            {"$set": {"read": True, "readAt": datetime.utcnow(), "updatedAt": datetime.utcnow()}}
+        )
+        if result.matched_count:
+            await self._adjust(db, user_id, role, -1)
+            return True
+        if await db.notifications.find_one(own, {"_id": 1}):
+            return True  # Already read
+        topic = {"_id": notification_id, "audience": role, "dismissed_by": {"$ne": user_id}}
+        result = await db.notifications.update_one(
+            {**topic, "read_by": {"$ne": user_id}},
+            {"$addToSet": {"read_by": user_id}, "$set": {"updatedAt": datetime.utcnow()}}
+        )
+        if result.matched_count:  # Was unread
+            await self._adjust(db, user_id, role, -1)
+            return True
+        return await db.notifications.find_one(topic, {"_id": 1}) is not None
+
+    async def mark_many_read(self, db, user_id: str, role: str, ids: Optional[List[ObjectId]] = None,
+                             before: Optional[ObjectId] = None) -> int:
+        """Mark a set of notifications (or all up to `before`, or all) read with one update_many per kind"""
+        selection = {}
+        if ids is not None:
+            selection["$in"] = ids
+        if before is not None:
+            selection["$lte"] = before
+        id_filter = {"_id": selection} if selection else {}
+
+        own = await db.notifications.update_many(
+            {**id_filter, "user_id": user_id, "user_type": role, "read": {"$ne": True}},
+            {"$set": {"read": True, "readAt": datetime.utcnow(), "updatedAt": datetime.utcnow()}}
+        )
+        topics = await db.notifications.update_many(
+            {**id_filter, "audience": role, "dismissed_by": {"$ne": user_id}, "read_by": {"$ne": user_id}},
+            {"$addToSet": {"read_by": user_id}, "$set": {"updatedAt": datetime.utcnow()}}
+        )
+        updated = own.modified_count + topics.modified_count
+        if updated:
+            await self._adjust(db, user_id, role, -updated)
+        return updated
+
+    async def delete(self, db, notification_id: ObjectId, user_id: str, role: str) -> bool:
+        deleted = await db.notifications.find_one_and_delete(
+            {"_id": notification_id, "user_id": user_id, "user_type": role}, {"read": 1}
+        )
+        if deleted:
+            await self._adjust(db, user_id, role, 0 if deleted.get("read") else -1)
+            return True
+        # Topics are shared - only hide it for this user
+        topic = await db.notifications.find_one_and_update(
+            {"_id": notification_id, "audience": role, "dismissed_by": {"$ne": user_id}},
+            {"$addToSet": {"dismissed_by": user_id}, "$set": {"updatedAt": datetime.utcnow()}},
+            {"read_by": 1}
+        )
+        if not topic:
+            return False
+        await self._adjust(db, user_id, role, 0 if user_id in topic.get("read_by", []) else -1)
+        return True
+
+    async def clear(self, db, user_id: str, role: str) -> int:
+        result = await db.notifications.delete_many({"user_id": user_id, "user_type": role})
+        topics = await db.notifications.update_many(
+            {"audience": role, "dismissed_by": {"$ne": user_id}},
+            {"$addToSet": {"dismissed_by": user_id}, "$set": {"updatedAt": datetime.utcnow()}}
+        )
+        await db.notification_counters.update_one(
+            {"_id": self.counter_id(user_id, role)},
+            {"$set": {"unread": 0, "updatedAt": datetime.utcnow()}, "$inc": {"version": 1}}
+        )
+        return result.deleted_count + topics.modified_count
+
+    # ==================== UNREAD COUNTERS ====================
+    def counter_id(self, user_id: str, role: str) -> str:
+        return f"{user_id}:{role}"
+
+    async def _bump(self, db, counter_filter: dict, notification_id: ObjectId):
+        """A new unread notification for every existing counter matching the filter"""
+        # Missing counters are not created here - they are counted from scratch on first read
+        await db.notification_counters.update_many(
+            counter_filter,
+            {"$inc": {"unread": 1, "version": 1}, "$max": {"latest": notification_id}, "$set": {"updatedAt": datetime.utcnow()}}
+        )
+
+    async def _adjust(self, db, user_id: str, role: str, unread_delta: int):
+        update = {"$inc": {"version": 1}, "$set": {"updatedAt": datetime.utcnow()}}
+        if unread_delta:
+            update["$inc"]["unread"] = unread_delta
+        await db.notification_counters.update_one({"_id": self.counter_id(user_id, role)}, update)
+
+    async def _recount(self, db, user_id: str, role: str, version: int = 0) -> dict:
+        """
+        Count the user's notifications and store the counter, provided no write bumped
+        it since `version` was read - otherwise that write could be lost, so count again
+        """
+        visible = self.visible_to(user_id, role)
+        unread_query = {"$or": [
+            {"user_id": user_id, "user_type": role, "read": False},
+            {"audience": role, "dismissed_by": {"$ne": user_id}, "read_by": {"$ne": user_id}}
+        ]}
+        counter_id = self.counter_id(user_id, role)
+        for _ in range(RECOUNT_ATTEMPTS):
+            unread = await db.notifications.count_documents(unread_query)
+            latest = await db.notifications.find_one(visible, {"_id": 1}, sort=[("_id", -1)])
+            counter = {
+                "user_id": user_id,
+                "user_type": role,
+                "unread": unread,
+                "latest": latest["_id"] if latest else None,
+                "version": version + 1,
+                "countedAt": datetime.utcnow(),
+                "updatedAt": datetime.utcnow()
+            }
+            try:
+                # A counter at another version makes the upsert insert a duplicate _id
+                await db.notification_counters.replace_one({"_id": counter_id, "version": version}, counter, upsert=True)
+                return counter
+            except DuplicateKeyError:
+                current = await db.notification_counters.find_one({"_id": counter_id})
+                version = current["version"] if current else 0
+        logger.warning(f"Notification counter {counter_id} kept changing during recount")
+        return current or counter
+
+    async def get_counter(self, db, user_id: str, role: str) -> dict:
+        """Unread count, latest notification id and version for one user - two _id lookups when fresh"""
+        counter = await db.notification_counters.find_one({"_id": self.counter_id(user_id, role)})
+        max_age = timedelta(seconds=settings.notification_counter_recount_seconds)
+        if counter is None or counter["unread"] < 0 or datetime.utcnow() - counter["countedAt"] > max_age:
+            return await self._recount(db, user_id, role, counter["version"] if counter else 0)
+        # TTL expiry (retention.py) and other deletes outside this service leave the counter alone -
+        # a vanished latest notification means the list changed under it
+        if counter["latest"] and not await db.notifications.find_one({"_id": counter["latest"]}, {"_id": 1}):
+            counter = await self._recount(db, user_id, role, counter["version"])
+        return counter
+
+    def etag(self, counter: dict) -> str:
+        """Changes whenever the user's notification list changes"""
+        return f'W/"{counter["latest"] or 0}.{counter["version"]}"'
+
+    async def forget_user(self, db, user_id: str):
+        await db.notifications.delete_many({"user_id": user_id})
+        await db.notification_counters.delete_many({"user_id": user_id})
+
+
+# Global notification service instance
+notification_service = NotificationService()
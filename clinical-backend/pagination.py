@@ -0,0 +1,130 @@
+"""
+Keyset (cursor) pagination for admin list endpoints
+
+Instead of skip/limit - which makes Mongo walk every skipped document - each
+page continues from the sort key of the last document it returned. The
+position is handed to the client as an opaque cursor (the sort values plus
+_id, so the order is stable even when sort values repeat).
+
+List bodies stay plain JSON arrays; the cursor and the optional total are
+returned in the X-Next-Cursor and X-Total-Count response headers.
+"""
+import asyncio
+import base64
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+from bson import json_util
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+SortSpec = List[Tuple[str, int]]
+
+
+@dataclass
+class Page:
+    items: List[dict]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+def _with_tiebreaker(sort: SortSpec) -> SortSpec:
+    """Append _id so every document has a unique position"""
+    if sort and sort[-1][0] == "_id":
+        return list(sort)
+    direction = sort[-1][1] if sort else -1
+    return list(sort) + [("_id", direction)]
+
+
+def encode_cursor(document: dict, sort: SortSpec) -> str:
+    values = [document.get(field) for field, _ in _with_tiebreaker(sort)]
+    raw = json_util.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: SortSpec) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(_with_tiebreaker(sort)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _after_value(direction: int, value) -> list:
+    """Conditions matching values sorted after `value` (missing/null sorts first)"""
+    if value is None:
+        return [{"$ne": None}] if direction == 1 else []
+    if direction == 1:
+        return [{"$gt": value}]
+    return [{"$lt": value}, None]
+
+
+def parse_sort(sort: Optional[str], allowed: Sequence[str]) -> SortSpec:
+    """Parse a sort parameter ("createdAt" or "-createdAt") against the allowed fields"""
+    if not sort:
+        return [("_id", 1)]
+    field = sort.lstrip("-")
+    if field != "_id" and field not in allowed:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {field}")
+    return [(field, -1 if sort.startswith("-") else 1)]
+
+
+def keyset_filter(query: dict, sort: SortSpec, cursor: Optional[str]) -> dict:
+    """Combine a list query with the "after this cursor" condition"""
+    if not cursor:
+        return query
+    sort = _with_tiebreaker(sort)
+    values = decode_cursor(cursor, sort)
+
+    # (a > x) or (a == x and b > y) or ...
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        prefix = {sort[j][0]: values[j] for j in range(i)}
+        for condition in _after_value(direction, values[i]):
+            branches.append({**prefix, field: condition})
+    if not branches:
+        return {"_id": {"$exists": False}}
+    after = {"$or": branches}
+    return {"$and": [query, after]} if query else after
+
+
+def mongo_sort(sort: SortSpec) -> List[Tuple[str, int]]:
+    return _with_tiebreaker(sort)
+
+
+def page_from_results(documents: List[dict], sort: SortSpec, limit: int, total: Optional[int] = None) -> Page:
+    """Build a page from up to limit + 1 documents fetched in sort order"""
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    next_cursor = encode_cursor(documents[-1], sort) if has_more and documents else None
+    return Page(items=documents, next_cursor=next_cursor, total=total)
+
+
+async def paginate(
+    collection,
+    query: dict,
+    sort: SortSpec,
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None,
+    include_total: bool = False
+) -> Page:
+    """Fetch one page of a collection in keyset order"""
+    find = collection.find(
+        keyset_filter(query, sort, cursor), projection
+    ).sort(mongo_sort(sort)).limit(limit + 1).to_list(length=limit + 1)
+    if not include_total:
+        return page_from_results(await find, sort, limit)
+    documents, total = await asyncio.gather(find, collection.count_documents(query))
+    return page_from_results(documents, sort, limit, total)
+
+
+def set_page_headers(response: Response, page: Page):
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    if page.total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(page.total)
@@ -0,0 +1,163 @@
+"""
+Password Service for hashing and verifying user passwords
+
+Hashes use a slow KDF through passlib (bcrypt_sha256 by default, scrypt or
+argon2 when configured) and run in a bounded thread pool so login bursts don't block the
+event loop. Legacy "sha256:salt:hex" hashes still verify and are flagged for a
+rehash, which the login route stores transparently. Plain bcrypt only looks at
+the first 72 bytes of a password, so it is kept verify-only for existing hashes,
+which are likewise rehashed on the next login.
+"""
+import asyncio
+import hashlib
+import logging
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+LEGACY_PREFIX = "sha256:"
+
+# passlib setting used as the cost parameter for each scheme, with its calibration range
+COST_SETTINGS = {
+    "bcrypt_sha256": ("rounds", 10, 16),
+    "scrypt": ("rounds", 14, 20),
+    "argon2": ("time_cost", 2, 10),
+}
+
+# Schemes that still verify existing hashes but are never used to hash
+LEGACY_SCHEMES = ("bcrypt",)
+
+# Configured scheme names that hash with another scheme
+SCHEME_ALIASES = {"bcrypt": "bcrypt_sha256"}
+
+
+@lru_cache(maxsize=None)
+def scheme_available(scheme: str) -> bool:
+    """Check whether the backend library for a passlib scheme is installed (without hashing)"""
+    try:
+        handler = get_crypt_handler(scheme)
+        return handler.has_backend() if hasattr(handler, "has_backend") else True
+    except Exception:
+        return False
+
+
+def build_context(scheme: str, cost: int = 0) -> CryptContext:
+    """CryptContext hashing with the given scheme; other known and legacy schemes still verify"""
+    scheme = SCHEME_ALIASES.get(scheme, scheme)
+    if scheme not in COST_SETTINGS:
+        raise ValueError(f"Unsupported password hash scheme '{scheme}'")
+    others = [s for s in (*COST_SETTINGS, *LEGACY_SCHEMES) if s != scheme]
+    schemes = [scheme] + [s for s in others if scheme_available(s)]
+    kwargs = {}
+    if cost:
+        kwargs[f"{scheme}__{COST_SETTINGS[scheme][0]}"] = cost
+    return CryptContext(schemes=schemes, deprecated="auto", **kwargs)
+
+
+def _legacy_hash(password: str, salt: str) -> str:
+    return hashlib.sha256((password + salt).encode()).hexdigest()
+
+
+def calibrate_cost(scheme: Optional[str] = None, budget_ms: Optional[int] = None) -> Tuple[int, float]:
+    """
+    Find the highest cost whose single hash stays within the latency budget.
+    Returns (cost, measured_ms); falls back to the lowest cost if none fit.
+    """
+    scheme = scheme or settings.password_hash_scheme
+    scheme = SCHEME_ALIASES.get(scheme, scheme)
+    budget_ms = budget_ms or settings.password_hash_budget_ms
+    _, low, high = COST_SETTINGS[scheme]
+
+    best = None
+    for cost in range(low, high + 1):
+        context = build_context(scheme, cost)
+        started = time.perf_counter()
+        context.hash(secrets.token_urlsafe(16))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > budget_ms:
+            break
+        best = (cost, elapsed_ms)
+    return best or (low, elapsed_ms)
+
+
+class PasswordService:
+    def __init__(self):
+        scheme = SCHEME_ALIASES.get(settings.password_hash_scheme, settings.password_hash_scheme)
+        if not scheme_available(scheme):
+            logger.warning(f"Password hash scheme '{scheme}' is not available, using bcrypt_sha256")
+            scheme = "bcrypt_sha256"
+        self.scheme = scheme
+        self.context = build_context(scheme, settings.password_hash_cost)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured scheme (blocking)"""
+        return self.context.hash(password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password (blocking). Returns (valid, new_hash) where new_hash is set
+        when the stored hash is legacy or uses outdated parameters and should be replaced.
+        """
+        if not hashed_password:
+            return False, None
+        if hashed_password.startswith(LEGACY_PREFIX):
+            try:
+                _, salt, hash_value = hashed_password.split(":")
+            except ValueError:
+                return False, None
+            if not secrets.compare_digest(_legacy_hash(password, salt), hash_value):
+                return False, None
+            return True, self.hash(password)
+        try:
+            return self.context.verify_and_update(password, hashed_password)
+        except ValueError:
+            # Unknown or malformed hash
+            return False, None
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password (blocking)"""
+        return self.verify_and_update(password, hashed_password)[0]
+
+    async def hash_async(self, password: str) -> str:
+        """Hash a password in the password thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self.hash, password)
+
+    async def verify_and_update_async(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password in the password thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self.verify_and_update, password, hashed_password)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.password_hash_workers),
+                thread_name_prefix="password"
+            )
+        return self._executor
+
+# Global password service instance
+password_service = PasswordService()
+
+
+if __name__ == "__main__":
+    # Capacity planning: python password_service.py
+    for scheme in COST_SETTINGS:
+        if not scheme_available(scheme):
+            print(f"{scheme}: not available")
+            continue
+        cost, elapsed_ms = calibrate_cost(scheme)
+        per_worker = 1000 / elapsed_ms if elapsed_ms else 0
+        print(
+            f"{scheme}: cost={cost} ({elapsed_ms:.0f} ms/hash, budget {settings.password_hash_budget_ms} ms) "
+            f"~{per_worker * max(1, settings.password_hash_workers):.1f} logins/s with "
+            f"{settings.password_hash_workers} workers"
+        )
@@ -0,0 +1,140 @@
+"""
+N+1 query detection and per-request query budgets
+
+Enabled with QUERY_DEBUG=true (tests and staging only). Every Mongo command
+issued by a request is reduced to a "shape" - command, collection and filter
+with all values replaced by "?" - so queries that differ only by _id (the
+classic N+1 loop) collapse onto one shape and are counted.
+
+QUERY_BUDGET_MODE:
+- "warn": log a warning when a route repeats a shape or exceeds its budget
+- "raise": additionally raise QueryBudgetExceeded once the response is sent,
+  which fails the request in TestClient-based tests
+"""
+import json
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Where each command keeps the filter(s) that define its shape
+_FILTER_KEYS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+}
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in "raise" mode when a request exceeds its query budget or repeats a query shape"""
+
+    def __init__(self, report: "QueryReport"):
+        super().__init__(report.summary())
+        self.report = report
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        # Lists of values ($in, $nin, $all ...): ["a", "b"] and ["c"] have the same shape.
+        # Structural lists (pipeline stages, $or/$and/$nor clauses) keep every element.
+        if all(not isinstance(item, (dict, list)) for item in value):
+            return ["?"]
+        return [_normalize(item) for item in value]
+    return "?"
+
+
+def query_shape(command_name: str, command: dict) -> str:
+    """Command, collection and value-free filter of a Mongo command"""
+    collection = command.get(command_name)
+    if command_name in ("update", "delete"):
+        statements = command.get(f"{command_name}s", [])
+        spec = [stmt.get("q") for stmt in statements[:1]]
+    else:
+        spec = command.get(_FILTER_KEYS.get(command_name, ""), None)
+    return f"{command_name} {collection} {json.dumps(_normalize(spec), sort_keys=True)}"
+
+
+def parse_budgets(spec: str) -> Dict[str, int]:
+    """Parse "route=N,route=N" into a dict of per-route budgets"""
+    budgets = {}
+    for entry in spec.split(","):
+        route, _, budget = entry.strip().rpartition("=")
+        if route and budget:
+            budgets[route.strip()] = int(budget)
+    return budgets
+
+
+_route_budgets = parse_budgets(settings.query_budget_overrides)
+
+
+def budget_for(route: str) -> int:
+    return _route_budgets.get(route, settings.query_budget)
+
+
+class QueryReport:
+    def __init__(self, method: str, route: str, shapes: Counter):
+        self.method = method
+        self.route = route
+        self.shapes = shapes
+        self.total = sum(shapes.values())
+        self.budget = budget_for(route)
+        self.repeated = {
+            shape: count for shape, count in shapes.items()
+            if count >= settings.query_repeat_threshold
+        }
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget > 0 and self.total > self.budget
+
+    @property
+    def has_problems(self) -> bool:
+        return self.over_budget or bool(self.repeated)
+
+    def summary(self) -> str:
+        parts = [f"{self.method} {self.route}: {self.total} queries"]
+        if self.over_budget:
+            parts.append(f"budget {self.budget} exceeded")
+        for shape, count in sorted(self.repeated.items(), key=lambda item: -item[1]):
+            parts.append(f"repeated {count}x: {shape}")
+        return "; ".join(parts)
+
+
+# Reports captured by capture_query_reports() (tests)
+_captured: List[List[QueryReport]] = []
+_captured_lock = threading.Lock()
+
+
+@contextmanager
+def capture_query_reports():
+    """Collect the query report of every request made inside the block"""
+    reports: List[QueryReport] = []
+    with _captured_lock:
+        _captured.append(reports)
+    try:
+        yield reports
+    finally:
+        with _captured_lock:
+            _captured.remove(reports)
+
+
+def check_request(method: str, route: str, shapes: Counter) -> Optional[QueryReport]:
+    """Called by the timing middleware once a request has finished"""
+    report = QueryReport(method, route, shapes)
+    with _captured_lock:
+        for reports in _captured:
+            reports.append(report)
+
+    if report.has_problems:
+        logger.warning(f"Query check: {report.summary()}")
+        if settings.query_budget_mode == "raise":
+            raise QueryBudgetExceeded(report)
+    return report
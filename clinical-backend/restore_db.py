@@ -0,0 +1,120 @@
+"""
+MongoDB Point-in-Time Restore Script
+Restores a full export_db.py snapshot, then replays backup_changes.py change logs up to a timestamp
+
+Change entries from the snapshot's start (changes made while the export was
+running may or may not be in its files) up to --until are applied per
+collection in the order they were captured. Every entry is a full-document
+upsert, a delete or a drop, so replaying an entry that the snapshot already
+contains is harmless.
+
+Usage (from clinical-backend/):
+    python restore_db.py --database wellness_restore --drop --until 2026-10-19T12:00:00
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteMany, DeleteOne, ReplaceOne
+from config import settings
+from export_db import DEFAULT_EXPORT_DIR, MANIFEST, decode_value
+from backup_changes import DEFAULT_CHANGES_DIR
+import import_db
+
+_decoder = json.JSONDecoder(object_hook=import_db.convert_mongo_types)
+
+def change_files(changes_dir: str, start: datetime, until: datetime) -> dict:
+    """collection -> change log files between the two days, oldest first"""
+    files = {}
+    if not os.path.isdir(changes_dir):
+        return files
+    days = sorted(
+        d for d in os.listdir(changes_dir)
+        if os.path.isdir(os.path.join(changes_dir, d)) and start.strftime("%Y-%m-%d") <= d <= until.strftime("%Y-%m-%d")
+    )
+    for day in days:
+        for filename in sorted(os.listdir(os.path.join(changes_dir, day))):
+            if filename.endswith(".ndjson"):
+                files.setdefault(filename[:-len(".ndjson")], []).append(os.path.join(changes_dir, day, filename))
+    return files
+
+def iter_changes(paths: list, start: datetime, until: datetime):
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = _decoder.decode(line)
+                if start <= entry["ts"] <= until:
+                    yield entry
+
+def to_operation(entry: dict):
+    if entry["op"] == "upsert":
+        return ReplaceOne({"_id": entry["_id"]}, entry["doc"], upsert=True)
+    if entry["op"] == "delete":
+        return DeleteOne({"_id": entry["_id"]})
+    return DeleteMany({})
+
+async def replay_collection(db, name: str, paths: list, start: datetime, until: datetime, batch_size: int) -> int:
+    changes = iter_changes(paths, start, until)
+    applied = 0
+    while True:
+        batch = await asyncio.to_thread(lambda: [to_operation(e) for e in islice(changes, batch_size)])
+        if not batch:
+            break
+        # Ordered: a later change to the same document must win
+        await db[name].bulk_write(batch, ordered=True)
+        applied += len(batch)
+    print(f"Replayed {applied} changes into '{name}'")
+    return applied
+
+async def restore_database(args):
+    started = time.perf_counter()
+    with open(os.path.join(args.snapshot_dir, MANIFEST), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    snapshot_start = decode_value(manifest.get("started_at") or manifest["exported_at"])
+    until = datetime.fromisoformat(args.until) if args.until else datetime.utcnow()
+    if until < snapshot_start:
+        raise SystemExit(f"--until {until.isoformat()} is before the snapshot started ({snapshot_start.isoformat()})")
+
+    # 1. Full snapshot
+    import_args = ["--mongodb-url", args.mongodb_url, "--database", args.database,
+                   "--input-dir", args.snapshot_dir, "--concurrency", str(args.concurrency)]
+    if args.drop:
+        import_args.append("--drop")
+    await import_db.import_database(import_db.parse_args(import_args))
+
+    # 2. Deltas from the snapshot start up to --until
+    client = AsyncIOMotorClient(args.mongodb_url)
+    db = client[args.database]
+    files = change_files(args.changes_dir, snapshot_start, until)
+    print(f"Replaying changes {snapshot_start.isoformat()} .. {until.isoformat()} for {len(files)} collections")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def replay_one(name: str, paths: list):
+        async with semaphore:
+            return await replay_collection(db, name, paths, snapshot_start, until, args.batch_size)
+
+    counts = await asyncio.gather(*[replay_one(name, paths) for name, paths in files.items()])
+    print(f"\nRestore to {until.isoformat()} complete: {sum(counts)} changes replayed in {time.perf_counter() - started:.1f}s")
+    client.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Restore a snapshot plus change logs up to a point in time")
+    parser.add_argument("--mongodb-url", default=settings.mongodb_url)
+    parser.add_argument("--database", default=settings.database_name, help="Target database")
+    parser.add_argument("--snapshot-dir", default=DEFAULT_EXPORT_DIR)
+    parser.add_argument("--changes-dir", default=DEFAULT_CHANGES_DIR)
+    parser.add_argument("--until", help="ISO timestamp (UTC) to restore to - default: everything captured")
+    parser.add_argument("--drop", action="store_true", help="Drop target collections before loading the snapshot")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(restore_database(parse_args()))
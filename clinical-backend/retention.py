@@ -0,0 +1,163 @@
+"""
+Retention policies for notifications and chat messages
+
+- notifications: a TTL index lets MongoDB expire read notifications
+  NOTIFICATION_READ_RETENTION_DAYS after they were read (readAt). Unread
+  notifications are kept unless NOTIFICATION_MAX_AGE_DAYS (off by default)
+  is set, which expires every notification that long after it was created.
+- chat_messages: a background archiver moves messages older than
+  CHAT_ARCHIVE_AFTER_DAYS into chat_messages_archive, one zlib-compressed
+  BSON bucket of up to CHAT_ARCHIVE_BUCKET_SIZE messages per conversation.
+  Chat history pages back through the archive one bucket per request
+  (archived_before). Legacy messages that only carry an appointment_id are
+  never archived: their conversation is only known through the appointment,
+  so they stay in chat_messages and are served from there.
+
+Keeping the hot collections small keeps their working set and indexes in RAM.
+"""
+import asyncio
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+import bson
+from bson import Binary
+from pymongo.errors import OperationFailure
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_job_task: Optional[asyncio.Task] = None
+_archive_lock = asyncio.Lock()
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+async def _ensure_ttl_index(collection, field: str, expire_after_seconds: int):
+    """Create, retune (collMod) or drop the TTL index on one field to match the setting"""
+    name = f"{field}_ttl"
+    existing = (await collection.index_information()).get(name)
+    if expire_after_seconds <= 0:
+        if existing:
+            await collection.drop_index(name)
+        return
+    if existing is None:
+        await collection.create_index(field, name=name, expireAfterSeconds=expire_after_seconds)
+    elif existing.get("expireAfterSeconds") != expire_after_seconds:
+        await collection.database.command(
+            "collMod", collection.name,
+            index={"name": name, "expireAfterSeconds": expire_after_seconds}
+        )
+
+
+async def ensure_retention_indexes(db):
+    await _ensure_ttl_index(db.notifications, "readAt", settings.notification_read_retention_days * DAY_SECONDS)
+    await _ensure_ttl_index(db.notifications, "createdAt", settings.notification_max_age_days * DAY_SECONDS)
+    await db.chat_messages.create_index([("conversation_id", 1), ("timestamp", 1)])
+    # Legacy messages are matched by appointment_id - without this every $or over both scans the collection
+    await db.chat_messages.create_index([("appointment_id", 1), ("timestamp", 1)])
+    await db.chat_messages_archive.create_index([("conversation_id", 1), ("first_timestamp", 1)])
+
+
+# ==================== CHAT ARCHIVE ====================
+def _pack(messages: List[dict]) -> Binary:
+    return Binary(zlib.compress(bson.encode({"messages": messages}), 6))
+
+
+def _unpack(data: bytes) -> List[dict]:
+    return bson.decode(zlib.decompress(data))["messages"]
+
+
+async def _archive_bucket(db, conversation_id: str, messages: List[dict]):
+    bucket = {
+        "conversation_id": conversation_id,
+        "first_timestamp": messages[0]["timestamp"],
+        "last_timestamp": messages[-1]["timestamp"],
+        "count": len(messages),
+        "data": await asyncio.to_thread(_pack, messages),
+        "archivedAt": datetime.utcnow()
+    }
+    bucket["updatedAt"] = bucket["archivedAt"]  # Picked up by backup_changes.py watermark mode
+    # Keyed on the first message, so re-archiving after a crash before the delete replaces the bucket
+    await db.chat_messages_archive.replace_one(
+        {"_id": f"{conversation_id}:{messages[0]['_id']}"}, bucket, upsert=True
+    )
+    await db.chat_messages.delete_many({"_id": {"$in": [m["_id"] for m in messages]}})
+
+
+async def archive_chat_messages(db) -> dict:
+    """Move chat messages older than the cutoff into compressed archive buckets"""
+    if settings.chat_archive_after_days <= 0:
+        return {"archived": 0, "buckets": 0}
+    async with _archive_lock:
+        # Message timestamps are stored as ISO strings, which sort chronologically
+        cutoff = (datetime.utcnow() - timedelta(days=settings.chat_archive_after_days)).isoformat()
+        cursor = db.chat_messages.find(
+            {"conversation_id": {"$type": "string"}, "timestamp": {"$lt": cutoff}}
+        ).sort([("conversation_id", 1), ("timestamp", 1)]).batch_size(settings.chat_archive_bucket_size)
+
+        archived = buckets = 0
+        conversation_id, bucket = None, []
+        async for message in cursor:
+            if bucket and (message["conversation_id"] != conversation_id or len(bucket) >= settings.chat_archive_bucket_size):
+                await _archive_bucket(db, conversation_id, bucket)
+                archived += len(bucket)
+                buckets += 1
+                bucket = []
+            conversation_id = message["conversation_id"]
+            bucket.append(message)
+        if bucket:
+            await _archive_bucket(db, conversation_id, bucket)
+            archived += len(bucket)
+            buckets += 1
+
+        result = {"archived": archived, "buckets": buckets, "cutoff": cutoff}
+        if archived:
+            logger.info(f"Chat archive: {result}")
+        return result
+
+
+async def load_archived_messages(db, conversation_id: str, before: str) -> List[dict]:
+    """
+    Non-deleted messages of the newest archive bucket with any older than `before`
+    (an ISO timestamp), oldest first - one page of history. Empty when none are left.
+    """
+    cursor = db.chat_messages_archive.find(
+        {"conversation_id": conversation_id, "first_timestamp": {"$lt": before}}, {"data": 1}
+    ).sort("first_timestamp", -1).batch_size(1)
+    try:
+        async for bucket in cursor:
+            messages = await asyncio.to_thread(_unpack, bucket["data"])
+            messages = [m for m in messages if m["timestamp"] < before and not m.get("deleted")]
+            if messages:
+                return messages
+        return []
+    finally:
+        await cursor.close()
+
+
+async def _job_loop(db):
+    try:
+        await ensure_retention_indexes(db)
+    except OperationFailure as e:
+        logger.warning(f"Retention indexes not updated: {e}")
+    while True:
+        try:
+            await archive_chat_messages(db)
+        except Exception as e:
+            logger.warning(f"Chat archive job failed: {e}")
+        await asyncio.sleep(settings.chat_archive_interval_seconds)
+
+
+def start_retention_job(db):
+    """Apply the TTL settings and start the chat archiver (called on app startup)"""
+    global _job_task
+    if _job_task is None or _job_task.done():
+        _job_task = asyncio.create_task(_job_loop(db))
+
+
+def stop_retention_job():
+    global _job_task
+    if _job_task is not None:
+        _job_task.cancel()
+        _job_task = None
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+import asyncio
 from bson import ObjectId
 from datetime import datetime
 from typing import List, Optional
@@ -17,6 +18,10 @@ from schemas import (
     SpecializationCreate, SpecializationUpdate, SpecializationResponse
 )
 from routes.auth import get_current_user, get_current_user_with_role
+from key_rotation import start_key_rotation, pause_key_rotation, get_key_rotation_progress
+from admin_counters import get_admin_counters, request_admin_counters_refresh
+from pagination import paginate, parse_sort, set_page_headers
+from notification_service import notification_service
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -26,26 +31,42 @@ async def require_admin(user_info = Depends(get_current_user_with_role)):
         raise HTTPException(status_code=403, detail="Admin access required")
     return user_info["user_id"]  # Return just the user_id string for backwards compatibility
 
+async def refresh_counters_after():
+    """Dependency for routes that change dashboard counts - refreshes them once the route is done"""
+    yield
+    request_admin_counters_refresh(get_database())
+
+def _object_ids(ids) -> list:
+    return [ObjectId(i) for i in set(ids) if isinstance(i, str) and ObjectId.is_valid(i)]
+
+async def _find_by_ids(collection, ids, projection=None) -> dict:
+    """Resolve a batch of string ids with one $in query"""
+    object_ids = _object_ids(ids)
+    if not object_ids:
+        return {}
+    documents = await collection.find({"_id": {"$in": object_ids}}, projection).to_list(length=len(object_ids))
+    return {str(d["_id"]): d for d in documents}
+
 @router.get("/stats", response_model=AdminStats)
-async def get_admin_stats(user_info = Depends(require_admin)):
+async def get_admin_stats(
+    refresh: bool = Query(False, description="Recount now instead of using the counter snapshot"),
+    user_info = Depends(require_admin)
+):
     db = get_database()
-
-    total_users = await db.users.count_documents({"userType": "user"})
-    total_doctors = await db.doctors.count_documents({})
-    total_hospitals = await db.hospitals.count_documents({})
-    pending_verifications = await db.background_verifications.count_documents({"status": "pending"})
-    total_appointments = await db.appointments.count_documents({})
+    counters = await get_admin_counters(db, refresh=refresh)
+    values = counters["values"]
 
     return AdminStats(
-        total_users=total_users,
-        total_doctors=total_doctors,
-        total_hospitals=total_hospitals,
-        pending_verifications=pending_verifications,
-        total_appointments=total_appointments
+        total_users=values["total_users"],
+        total_doctors=values["total_doctors"],
+        total_hospitals=values["total_hospitals"],
+        pending_verifications=values["pending_verifications"],
+        total_appointments=values["total_appointments"],
+        counters_refreshed_at=counters["refreshedAt"]
     )
 
 # User Management
-@router.post("/users", response_model=UserResponse)
+@router.post("/users", response_model=UserResponse, dependencies=[Depends(refresh_counters_after)])
 async def create_user(user_data: UserCreate, current_user: str = Depends(require_admin)):
     db = get_database()
 
@@ -76,8 +97,11 @@ async def create_user(user_data: UserCreate, current_user: str = Depends(require
 
 @router.get("/users", response_model=List[UserResponse])
 async def list_users(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     limit: int = Query(50, ge=1, le=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix with - for descending"),
+    include_total: bool = Query(False, description="Return the match count in X-Total-Count"),
     user_type: Optional[str] = None,
     current_user: str = Depends(require_admin)
 ):
@@ -87,7 +111,12 @@ async def list_users(
     if user_type:
         query["userType"] = user_type
 
-    users = await db.users.find(query).skip(skip).limit(limit).to_list(length=limit)
+    page = await paginate(
+        db.users, query, parse_sort(sort, ["createdAt", "name", "email"]), limit,
+        cursor=cursor, include_total=include_total
+    )
+    set_page_headers(response, page)
+    users = page.items
 
     for user in users:
         user["_id"] = str(user["_id"])
@@ -105,7 +134,7 @@ async def update_user(
     try:
         result = await db.users.update_one(
             {"_id": ObjectId(user_id)},
-            {"$set": {k: v for k, v in user_data.dict().items() if v is not None}}
+            {"$set": {**{k: v for k, v in user_data.dict().items() if v is not None}, "updatedAt": datetime.utcnow()}}
         )
     except:
         raise HTTPException(status_code=400, detail="Invalid user ID")
@@ -117,7 +146,7 @@ async def update_user(
     user["_id"] = str(user["_id"])
     return UserResponse(**user)
 
-@router.delete("/users/{user_id}")
+@router.delete("/users/{user_id}", dependencies=[Depends(refresh_counters_after)])
 async def delete_user(user_id: str, current_user: str = Depends(require_admin)):
     db = get_database()
 
@@ -132,7 +161,7 @@ async def delete_user(user_id: str, current_user: str = Depends(require_admin)):
     return {"message": "User deleted successfully"}
 
 # Doctor Management
-@router.post("/doctors", response_model=DoctorResponse)
+@router.post("/doctors", response_model=DoctorResponse, dependencies=[Depends(refresh_counters_after)])
 async def create_doctor(doctor_data: DoctorCreate, current_user: str = Depends(require_admin)):
     db = get_database()
 
@@ -157,8 +186,11 @@ async def create_doctor(doctor_data: DoctorCreate, current_user: str = Depends(r
 
 @router.get("/doctors", response_model=List[DoctorResponse])
 async def list_doctors(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     limit: int = Query(50, ge=1, le=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix with - for descending"),
+    include_total: bool = Query(False, description="Return the match count in X-Total-Count"),
     hospital_id: Optional[str] = None,
     current_user: str = Depends(require_admin)
 ):
@@ -168,7 +200,12 @@ async def list_doctors(
     if hospital_id:
         query["hospital_id"] = hospital_id
 
-    doctors = await db.doctors.find(query).skip(skip).limit(limit).to_list(length=limit)
+    page = await paginate(
+        db.doctors, query, parse_sort(sort, ["createdAt", "name", "rating"]), limit,
+        cursor=cursor, include_total=include_total
+    )
+    set_page_headers(response, page)
+    doctors = page.items
 
     for doctor in doctors:
         doctor["_id"] = str(doctor["_id"])
@@ -186,7 +223,7 @@ async def update_doctor(
     try:
         result = await db.doctors.update_one(
             {"_id": ObjectId(doctor_id)},
-            {"$set": {k: v for k, v in doctor_data.dict().items() if v is not None}}
+            {"$set": {**{k: v for k, v in doctor_data.dict().items() if v is not None}, "updatedAt": datetime.utcnow()}}
         )
     except:
         raise HTTPException(status_code=400, detail="Invalid doctor ID")
@@ -198,7 +235,7 @@ async def update_doctor(
     doctor["_id"] = str(doctor["_id"])
     return DoctorResponse(**doctor)
 
-@router.delete("/doctors/{doctor_id}")
+@router.delete("/doctors/{doctor_id}", dependencies=[Depends(refresh_counters_after)])
 async def delete_doctor(doctor_id: str, current_user: str = Depends(require_admin)):
     db = get_database()
 
@@ -213,7 +250,7 @@ async def delete_doctor(doctor_id: str, current_user: str = Depends(require_admi
     return {"message": "Doctor deleted successfully"}
 
 # Hospital Management
-@router.post("/hospitals", response_model=HospitalResponse)
+@router.post("/hospitals", response_model=HospitalResponse, dependencies=[Depends(refresh_counters_after)])
 async def create_hospital(hospital_data: HospitalCreate, current_user: str = Depends(require_admin)):
     db = get_database()
 
@@ -238,8 +275,11 @@ async def create_hospital(hospital_data: HospitalCreate, current_user: str = Dep
 
 @router.get("/hospitals", response_model=List[HospitalResponse])
 async def list_hospitals(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     limit: int = Query(50, ge=1, le=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix with - for descending"),
+    include_total: bool = Query(False, description="Return the match count in X-Total-Count"),
     city: Optional[str] = None,
     current_user: str = Depends(require_admin)
 ):
@@ -249,7 +289,12 @@ async def list_hospitals(
     if city:
         query["city"] = city
 
-    hospitals = await db.hospitals.find(query).skip(skip).limit(limit).to_list(length=limit)
+    page = await paginate(
+        db.hospitals, query, parse_sort(sort, ["createdAt", "name", "city", "rating"]), limit,
+        cursor=cursor, include_total=include_total
+    )
+    set_page_headers(response, page)
+    hospitals = page.items
 
     for hospital in hospitals:
         hospital["_id"] = str(hospital["_id"])
@@ -267,7 +312,7 @@ async def update_hospital(
     try:
         result = await db.hospitals.update_one(
             {"_id": ObjectId(hospital_id)},
-            {"$set": {k: v for k, v in hospital_data.dict().items() if v is not None}}
+            {"$set": {**{k: v for k, v in hospital_data.dict().items() if v is not None}, "updatedAt": datetime.utcnow()}}
         )
     except:
         raise HTTPException(status_code=400, detail="Invalid hospital ID")
@@ -279,7 +324,7 @@ async def update_hospital(
     hospital["_id"] = str(hospital["_id"])
     return HospitalResponse(**hospital)
 
-@router.delete("/hospitals/{hospital_id}")
+@router.delete("/hospitals/{hospital_id}", dependencies=[Depends(refresh_counters_after)])
 async def delete_hospital(hospital_id: str, current_user: str = Depends(require_admin)):
     db = get_database()
 
@@ -296,10 +341,13 @@ async def delete_hospital(hospital_id: str, current_user: str = Depends(require_
 # Background Verification Management
 @router.get("/verifications", response_model=List[BackgroundVerificationResponse])
 async def list_verifications(
+    response: Response,
     status: Optional[VerificationStatus] = None,
     entity_type: Optional[str] = None,
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     limit: int = Query(50, ge=1, le=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix with - for descending"),
+    include_total: bool = Query(False, description="Return the match count in X-Total-Count"),
     current_user: str = Depends(require_admin)
 ):
     db = get_database()
@@ -310,7 +358,12 @@ async def list_verifications(
     if entity_type:
         query["entity_type"] = entity_type
 
-    verifications = await db.background_verifications.find(query).skip(skip).limit(limit).to_list(length=limit)
+    page = await paginate(
+        db.background_verifications, query, parse_sort(sort, ["createdAt", "updatedAt"]), limit,
+        cursor=cursor, include_total=include_total
+    )
+    set_page_headers(response, page)
+    verifications = page.items
 
     for verification in verifications:
         verification["_id"] = str(verification["_id"])
@@ -319,73 +372,78 @@ async def list_verifications(
 
 @router.get("/pending-doctor-verifications")
 async def get_pending_doctor_verifications(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     limit: int = Query(50, ge=1, le=100),
+    include_total: bool = Query(False, description="Return the queue size in X-Total-Count"),
     current_user: str = Depends(require_admin)
 ):
-    """Get all pending doctor verifications with full doctor details"""
+    """Get pending doctor verifications (oldest first) with full doctor details"""
     db = get_database()
 
-    # Get pending doctor verifications
-    verifications = await db.background_verifications.find({
-        "entity_type": "doctor",
-        "status": "pending"
-    }).skip(skip).limit(limit).to_list(length=limit)
+    page = await paginate(
+        db.background_verifications,
+        {"entity_type": "doctor", "status": "pending"},
+        [("_id", 1)],
+        limit,
+        cursor=cursor,
+        include_total=include_total
+    )
+    set_page_headers(response, page)
+
+    # Enrich the whole page with batched $in lookups instead of per-item find_one calls
+    doctors = await _find_by_ids(db.doctors, [v.get("entity_id") for v in page.items])
+    users, hospitals = await asyncio.gather(
+        _find_by_ids(
+            db.users,
+            [d.get("user_id") for d in doctors.values()],
+            {"name": 1, "email": 1, "mobile": 1, "userType": 1, "createdAt": 1}
+        ),
+        _find_by_ids(
+            db.hospitals,
+            [d.get("hospital_id") for d in doctors.values()],
+            {"name": 1, "city": 1, "location": 1}
+        )
+    )
 
     result = []
-    for verification in verifications:
+    for verification in page.items:
         verification["_id"] = str(verification["_id"])
-        
-        # Get doctor details
-        try:
-            doctor = await db.doctors.find_one({"_id": ObjectId(verification["entity_id"])})
-            if doctor:
-                doctor["_id"] = str(doctor["_id"])
-                
-                # Get user details if available
-                user_info = None
-                if doctor.get("user_id"):
-                    user = await db.users.find_one({"_id": ObjectId(doctor["user_id"])})
-                    if user:
-                        user_info = {
-                            "id": str(user["_id"]),
-                            "name": user.get("name"),
-                            "email": user.get("email"),
-                            "mobile": user.get("mobile"),
-                            "userType": user.get("userType"),
-                            "createdAt": user.get("createdAt")
-                        }
-                
-                # Get hospital details if available
-                hospital_info = None
-                if doctor.get("hospital_id"):
-                    hospital = await db.hospitals.find_one({"_id": ObjectId(doctor["hospital_id"])})
-                    if hospital:
-                        hospital_info = {
-                            "id": str(hospital["_id"]),
-                            "name": hospital.get("name"),
-                            "city": hospital.get("city"),
-                            "address": hospital.get("location")
-                        }
-                
-                result.append({
-                    "verification": verification,
-                    "doctor": doctor,
-                    "user": user_info,
-                    "hospital": hospital_info
-                })
-        except:
-            # Doctor might have been deleted
-            result.append({
-                "verification": verification,
-                "doctor": None,
-                "user": None,
-                "hospital": None
-            })
+        doctor = doctors.get(verification.get("entity_id"))
+        user_info = None
+        hospital_info = None
+        if doctor:
+            doctor["_id"] = str(doctor["_id"])
+            user = users.get(doctor.get("user_id"))
+            if user:
+                user_info = {
+                    "id": str(user["_id"]),
+                    "name": user.get("name"),
+                    "email": user.get("email"),
+                    "mobile": user.get("mobile"),
+                    "userType": user.get("userType"),
+                    "createdAt": user.get("createdAt")
+                }
+            hospital = hospitals.get(doctor.get("hospital_id"))
+            if hospital:
+                hospital_info = {
+                    "id": str(hospital["_id"]),
+                    "name": hospital.get("name"),
+                    "city": hospital.get("city"),
+                    "address": hospital.get("location")
+                }
+
+        # Doctor might have been deleted - keep the verification visible
+        result.append({
+            "verification": verification,
+            "doctor": doctor,
+            "user": user_info,
+            "hospital": hospital_info
+        })
 
     return result
 
-@router.put("/verifications/{verification_id}", response_model=BackgroundVerificationResponse)
+@router.put("/verifications/{verification_id}", response_model=BackgroundVerificationResponse, dependencies=[Depends(refresh_counters_after)])
 async def update_verification(
     verification_id: str,
     verification_data: BackgroundVerificationUpdate,
@@ -412,7 +470,7 @@ async def update_verification(
     verification["_id"] = str(verification["_id"])
     return BackgroundVerificationResponse(**verification)
 
-@router.post("/verifications/{verification_id}/approve")
+@router.post("/verifications/{verification_id}/approve", dependencies=[Depends(refresh_counters_after)])
 async def approve_verification(
     verification_id: str, 
     comments: str = Query(None, description="Admin comments for the verification"),
@@ -448,7 +506,7 @@ async def approve_verification(
     if entity_type == "doctor":
         await db.doctors.update_one(
             {"_id": ObjectId(entity_id)},
-            {"$set": {"verified": True, "is_active": True}}
+            {"$set": {"verified": True, "is_active": True, "updatedAt": datetime.utcnow()}}
         )
         # Get the doctor's user_id for notification
         doctor = await db.doctors.find_one({"_id": ObjectId(entity_id)})
@@ -458,39 +516,35 @@ async def approve_verification(
             if user_id_for_notification:
                 await db.users.update_one(
                     {"_id": ObjectId(user_id_for_notification)},
-                    {"$set": {"verified": True, "doctor_verified": True}}
+                    {"$set": {"verified": True, "doctor_verified": True, "updatedAt": datetime.utcnow()}}
                 )
             notification_message = f"🎉 Congratulations! Your doctor profile has been verified by the Clinical Admin. You can now act as a doctor and receive patient appointments. Admin comments: {comments or 'Your credentials have been reviewed and approved.'}"
     elif entity_type == "hospital":
         await db.hospitals.update_one(
             {"_id": ObjectId(entity_id)},
-            {"$set": {"verified": True}}
+            {"$set": {"verified": True, "updatedAt": datetime.utcnow()}}
         )
         notification_message = f"Your hospital has been verified. Admin comments: {comments or 'Verified successfully.'}"
     elif entity_type == "user":
         await db.users.update_one(
             {"_id": ObjectId(entity_id)},
-            {"$set": {"verified": True}}
+            {"$set": {"verified": True, "updatedAt": datetime.utcnow()}}
         )
         user_id_for_notification = entity_id
         notification_message = f"Your account has been verified. Admin comments: {comments or 'Verified successfully.'}"
 
     # Create notification for the entity
     if user_id_for_notification:
-        notification_doc = {
-            "user_id": user_id_for_notification,
-            "user_type": "doctor" if entity_type == "doctor" else "user",
-            "title": f"✅ {entity_type.capitalize()} Verification Approved",
-            "message": notification_message,
-            "type": "verification_approved",
-            "read": False,
-            "createdAt": datetime.utcnow()
-        }
-        await db.notifications.insert_one(notification_doc)
+        await notification_service.send(
+            db, user_id_for_notification, "doctor" if entity_type == "doctor" else "user",
+            f"✅ {entity_type.capitalize()} Verification Approved",
+            notification_message,
+            "verification_approved"
+        )
 
     return {"message": "Verification approved successfully", "notification_sent": bool(user_id_for_notification)}
 
-@router.post("/verifications/{verification_id}/reject")
+@router.post("/verifications/{verification_id}/reject", dependencies=[Depends(refresh_counters_after)])
 async def reject_verification(
     verification_id: str,
     notes: str = Query(..., description="Rejection reason"),
@@ -536,63 +590,38 @@ async def reject_verification(
         user_id_for_notification = entity_id
 
     if user_id_for_notification:
-        notification_doc = {
-            "user_id": user_id_for_notification,
-            "user_type": "doctor" if entity_type == "doctor" else "user",
-            "title": f"❌ {entity_type.capitalize()} Verification Rejected",
-            "message": f"Your {entity_type} verification has been rejected. Reason: {notes}. Please review and resubmit the required documents.",
-            "type": "verification_rejected",
-            "read": False,
-            "createdAt": datetime.utcnow()
-        }
-        await db.notifications.insert_one(notification_doc)
+        await notification_service.send(
+            db, user_id_for_notification, "doctor" if entity_type == "doctor" else "user",
+            f"❌ {entity_type.capitalize()} Verification Rejected",
+            f"Your {entity_type} verification has been rejected. Reason: {notes}. Please review and resubmit the required documents.",
+            "verification_rejected"
+        )
 
     return {"message": "Verification rejected successfully", "notification_sent": bool(user_id_for_notification)}
 
 
 # ==================== EXTENDED ADMIN STATS ====================
 @router.get("/extended-stats", response_model=AdminExtendedStats)
-async def get_extended_admin_stats(current_user: str = Depends(require_admin)):
+async def get_extended_admin_stats(
+    refresh: bool = Query(False, description="Recount now instead of using the counter snapshot"),
+    current_user: str = Depends(require_admin)
+):
     db = get_database()
+    counters = await get_admin_counters(db, refresh=refresh)
 
-    total_users = await db.users.count_documents({"userType": "user"})
-    total_doctors = await db.doctors.count_documents({})
-    total_hospitals = await db.hospitals.count_documents({})
-    pending_verifications = await db.background_verifications.count_documents({"status": "pending"})
-    total_appointments = await db.appointments.count_documents({})
-    
-    # Document stats
-    total_documents = await db.user_documents.count_documents({})
-    pending_documents = await db.user_documents.count_documents({"status": "pending"})
-    
-    # Portfolio stats
-    total_portfolios = await db.doctor_portfolios.count_documents({})
-    pending_portfolios = await db.doctor_portfolios.count_documents({"status": "pending"})
-    
-    # Relationship stats
-    active_relationships = await db.doctor_patient_relationships.count_documents({"status": "active"})
-
-    return AdminExtendedStats(
-        total_users=total_users,
-        total_doctors=total_doctors,
-        total_hospitals=total_hospitals,
-        pending_verifications=pending_verifications,
-        total_appointments=total_appointments,
-        total_documents=total_documents,
-        pending_documents=pending_documents,
-        total_portfolios=total_portfolios,
-        pending_portfolios=pending_portfolios,
-        active_relationships=active_relationships
-    )
+    return AdminExtendedStats(**counters["values"], counters_refreshed_at=counters["refreshedAt"])
 
 
 # ==================== USER DOCUMENTS MANAGEMENT ====================
 @router.get("/documents", response_model=List[UserDocumentResponse])
 async def list_user_documents(
+    response: Response,
     status: Optional[DocumentStatus] = None,
     user_id: Optional[str] = None,
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     limit: int = Query(50, ge=1, le=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix with - for descending"),
+    include_total: bool = Query(False, description="Return the match count in X-Total-Count"),
     current_user: str = Depends(require_admin)
 ):
     db = get_database()
@@ -603,16 +632,19 @@ async def list_user_documents(
     if user_id:
         query["user_id"] = user_id
     
-    documents = await db.user_documents.find(query).skip(skip).limit(limit).to_list(length=limit)
+    page = await paginate(
+        db.user_documents, query, parse_sort(sort, ["createdAt", "updatedAt"]), limit,
+        cursor=cursor, include_total=include_total
+    )
+    set_page_headers(response, page)
+    documents = page.items
     
     # Enrich with user names
+    users = await _find_by_ids(db.users, [d.get("user_id") for d in documents], {"name": 1})
     for doc in documents:
         doc["_id"] = str(doc["_id"])
-        try:
-            user = await db.users.find_one({"_id": ObjectId(doc["user_id"])})
-            doc["user_name"] = user.get("name", "Unknown") if user else "Unknown"
-        except:
-            doc["user_name"] = "Unknown"
+        user = users.get(doc.get("user_id"))
+        doc["user_name"] = user.get("name", "Unknown") if user else "Unknown"
     
     return [UserDocumentResponse(**d) for d in documents]
 
@@ -665,7 +697,7 @@ async def update_user_document(
     
     return UserDocumentResponse(**document)
 
-@router.post("/documents/{document_id}/verify")
+@router.post("/documents/{document_id}/verify", dependencies=[Depends(refresh_counters_after)])
 async def verify_user_document(document_id: str, current_user: str = Depends(require_admin)):
     db = get_database()
     
@@ -686,7 +718,7 @@ async def verify_user_document(document_id: str, current_user: str = Depends(req
     
     return {"message": "Document verified successfully"}
 
-@router.post("/documents/{document_id}/reject")
+@router.post("/documents/{document_id}/reject", dependencies=[Depends(refresh_counters_after)])
 async def reject_user_document(
     document_id: str,
     notes: str = Query(..., description="Rejection reason"),
@@ -712,7 +744,7 @@ async def reject_user_document(
     
     return {"message": "Document rejected successfully"}
 
-@router.delete("/documents/{document_id}")
+@router.delete("/documents/{document_id}", dependencies=[Depends(refresh_counters_after)])
 async def delete_user_document(document_id: str, current_user: str = Depends(require_admin)):
     db = get_database()
     
@@ -730,10 +762,13 @@ async def delete_user_document(document_id: str, current_user: str = Depends(req
 # ==================== DOCTOR PORTFOLIO MANAGEMENT ====================
 @router.get("/portfolios", response_model=List[DoctorPortfolioResponse])
 async def list_doctor_portfolios(
+    response: Response,
     status: Optional[DocumentStatus] = None,
     doctor_id: Optional[str] = None,
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     limit: int = Query(50, ge=1, le=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix with - for descending"),
+    include_total: bool = Query(False, description="Return the match count in X-Total-Count"),
     current_user: str = Depends(require_admin)
 ):
     db = get_database()
@@ -744,16 +779,19 @@ async def list_doctor_portfolios(
     if doctor_id:
         query["doctor_id"] = doctor_id
     
-    portfolios = await db.doctor_portfolios.find(query).skip(skip).limit(limit).to_list(length=limit)
+    page = await paginate(
+        db.doctor_portfolios, query, parse_sort(sort, ["createdAt", "updatedAt"]), limit,
+        cursor=cursor, include_total=include_total
+    )
+    set_page_headers(response, page)
+    portfolios = page.items
     
     # Enrich with doctor names
+    doctors = await _find_by_ids(db.doctors, [p.get("doctor_id") for p in portfolios], {"name": 1})
     for portfolio in portfolios:
         portfolio["_id"] = str(portfolio["_id"])
-        try:
-            doctor = await db.doctors.find_one({"_id": ObjectId(portfolio["doctor_id"])})
-            portfolio["doctor_name"] = doctor.get("name", "Unknown") if doctor else "Unknown"
-        except:
-            portfolio["doctor_name"] = "Unknown"
+        doctor = doctors.get(portfolio.get("doctor_id"))
+        portfolio["doctor_name"] = doctor.get("name", "Unknown") if doctor else "Unknown"
     
     return [DoctorPortfolioResponse(**p) for p in portfolios]
 
@@ -806,7 +844,7 @@ async def update_doctor_portfolio(
     
     return DoctorPortfolioResponse(**portfolio)
 
-@router.post("/portfolios/{portfolio_id}/verify")
+@router.post("/portfolios/{portfolio_id}/verify", dependencies=[Depends(refresh_counters_after)])
 async def verify_doctor_portfolio(portfolio_id: str, current_user: str = Depends(require_admin)):
     db = get_database()
     
@@ -827,7 +865,7 @@ async def verify_doctor_portfolio(portfolio_id: str, current_user: str = Depends
     
     return {"message": "Portfolio item verified successfully"}
 
-@router.post("/portfolios/{portfolio_id}/reject")
+@router.post("/portfolios/{portfolio_id}/reject", dependencies=[Depends(refresh_counters_after)])
 async def reject_doctor_portfolio(
     portfolio_id: str,
     notes: str = Query(..., description="Rejection reason"),
@@ -853,7 +891,7 @@ async def reject_doctor_portfolio(
     
     return {"message": "Portfolio item rejected successfully"}
 
-@router.delete("/portfolios/{portfolio_id}")
+@router.delete("/portfolios/{portfolio_id}", dependencies=[Depends(refresh_counters_after)])
 async def delete_doctor_portfolio(portfolio_id: str, current_user: str = Depends(require_admin)):
     db = get_database()
     
@@ -871,11 +909,14 @@ async def delete_doctor_portfolio(portfolio_id: str, current_user: str = Depends
 # ==================== DOCTOR-PATIENT RELATIONSHIPS ====================
 @router.get("/relationships", response_model=List[DoctorPatientRelationshipResponse])
 async def list_relationships(
+    response: Response,
     status: Optional[RelationshipStatus] = None,
     doctor_id: Optional[str] = None,
     patient_id: Optional[str] = None,
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     limit: int = Query(50, ge=1, le=100),
+    sort: Optional[str] = Query(None, description="Sort field, prefix with - for descending"),
+    include_total: bool = Query(False, description="Return the match count in X-Total-Count"),
     current_user: str = Depends(require_admin)
 ):
     db = get_database()
@@ -888,27 +929,28 @@ async def list_relationships(
     if patient_id:
         query["patient_id"] = patient_id
     
-    relationships = await db.doctor_patient_relationships.find(query).skip(skip).limit(limit).to_list(length=limit)
+    page = await paginate(
+        db.doctor_patient_relationships, query, parse_sort(sort, ["createdAt", "start_date"]), limit,
+        cursor=cursor, include_total=include_total
+    )
+    set_page_headers(response, page)
+    relationships = page.items
     
     # Enrich with names
+    doctors, patients, hospitals = await asyncio.gather(
+        _find_by_ids(db.doctors, [r.get("doctor_id") for r in relationships], {"name": 1}),
+        _find_by_ids(db.users, [r.get("patient_id") for r in relationships], {"name": 1}),
+        _find_by_ids(db.hospitals, [r.get("hospital_id") for r in relationships], {"name": 1})
+    )
     for rel in relationships:
         rel["_id"] = str(rel["_id"])
-        try:
-            doctor = await db.doctors.find_one({"_id": ObjectId(rel["doctor_id"])})
-            rel["doctor_name"] = doctor.get("name", "Unknown") if doctor else "Unknown"
-        except:
-            rel["doctor_name"] = "Unknown"
-        try:
-            patient = await db.users.find_one({"_id": ObjectId(rel["patient_id"])})
-            rel["patient_name"] = patient.get("name", "Unknown") if patient else "Unknown"
-        except:
-            rel["patient_name"] = "Unknown"
+        doctor = doctors.get(rel.get("doctor_id"))
+        rel["doctor_name"] = doctor.get("name", "Unknown") if doctor else "Unknown"
+        patient = patients.get(rel.get("patient_id"))
+        rel["patient_name"] = patient.get("name", "Unknown") if patient else "Unknown"
         if rel.get("hospital_id"):
-            try:
-                hospital = await db.hospitals.find_one({"_id": ObjectId(rel["hospital_id"])})
-                rel["hospital_name"] = hospital.get("name", "Unknown") if hospital else "Unknown"
-            except:
-                rel["hospital_name"] = "Unknown"
+            hospital = hospitals.get(rel["hospital_id"])
+            rel["hospital_name"] = hospital.get("name", "Unknown") if hospital else "Unknown"
     
     return [DoctorPatientRelationshipResponse(**r) for r in relationships]
 
@@ -940,7 +982,7 @@ async def get_relationship(relationship_id: str, current_user: str = Depends(req
     
     return DoctorPatientRelationshipResponse(**relationship)
 
-@router.post("/relationships", response_model=DoctorPatientRelationshipResponse)
+@router.post("/relationships", response_model=DoctorPatientRelationshipResponse, dependencies=[Depends(refresh_counters_after)])
 async def create_relationship(
     relationship_data: DoctorPatientRelationshipCreate,
     current_user: str = Depends(require_admin)
@@ -976,7 +1018,7 @@ async def create_relationship(
     
     return DoctorPatientRelationshipResponse(**relationship)
 
-@router.put("/relationships/{relationship_id}", response_model=DoctorPatientRelationshipResponse)
+@router.put("/relationships/{relationship_id}", response_model=DoctorPatientRelationshipResponse, dependencies=[Depends(refresh_counters_after)])
 async def update_relationship(
     relationship_id: str,
     relationship_data: DoctorPatientRelationshipUpdate,
@@ -1003,7 +1045,7 @@ async def update_relationship(
     
     return DoctorPatientRelationshipResponse(**relationship)
 
-@router.delete("/relationships/{relationship_id}")
+@router.delete("/relationships/{relationship_id}", dependencies=[Depends(refresh_counters_after)])
 async def delete_relationship(relationship_id: str, current_user: str = Depends(require_admin)):
     db = get_database()
     
@@ -1019,139 +1061,134 @@ async def delete_relationship(relationship_id: str, current_user: str = Depends(
 
 
 # ==================== DETAILED USER/DOCTOR/HOSPITAL INFO ====================
+# Fields each detail section needs - ciphertext (appointment notes, record contents) is never loaded
+APPOINTMENT_SUMMARY = {"patient_id": 1, "doctor_id": 1, "hospital_id": 1, "appointment_date": 1, "status": 1, "createdAt": 1}
+DOCUMENT_SUMMARY = {"document_type": 1, "document_name": 1, "status": 1, "file_url": 1, "verified_by": 1, "createdAt": 1}
+PORTFOLIO_SUMMARY = {
+    "item_type": 1, "title": 1, "status": 1, "issue_date": 1, "expiry_date": 1,
+    "issuing_authority": 1, "file_url": 1, "createdAt": 1
+}
+RELATIONSHIP_SUMMARY = {
+    "doctor_id": 1, "patient_id": 1, "hospital_id": 1, "status": 1,
+    "start_date": 1, "end_date": 1, "primary_care": 1
+}
+MEDICAL_RECORD_SUMMARY = {"record_type": 1, "title": 1, "original_filename": 1, "source": 1, "appointment_id": 1, "createdAt": 1}
+DOCTOR_SUMMARY = {"name": 1, "specialization": 1, "user_id": 1, "verified": 1, "is_active": 1, "rating": 1}
+NEWEST_FIRST = [("_id", -1)]
+
+async def _load_details(entity_collection, entity_id: str, label: str, sections: dict,
+                        section: Optional[str], cursor: Optional[str], limit: int, include_total: bool):
+    """
+    Load an entity and its related collections concurrently.
+    sections: name -> (collection, query, projection, sort). Each section is a keyset
+    page; pass section + cursor to fetch the next page of one section only.
+    """
+    if not ObjectId.is_valid(entity_id):
+        raise HTTPException(status_code=400, detail=f"Invalid {label} ID")
+    if section is not None and section not in sections:
+        raise HTTPException(status_code=400, detail=f"Unknown section {section}")
+    if cursor and section is None:
+        raise HTTPException(status_code=400, detail="cursor requires section")
+
+    selected = [section] if section else list(sections)
+    entity, *pages = await asyncio.gather(
+        entity_collection.find_one({"_id": ObjectId(entity_id)}),
+        *[
+            paginate(collection, query, sort, limit, cursor=cursor, projection=projection, include_total=include_total)
+            for collection, query, projection, sort in (sections[name] for name in selected)
+        ]
+    )
+    if not entity:
+        raise HTTPException(status_code=404, detail=f"{label.capitalize()} not found")
+    entity["_id"] = str(entity["_id"])
+
+    results = {}
+    pagination = {}
+    for name, page in zip(selected, pages):
+        for item in page.items:
+            item["_id"] = str(item["_id"])
+        results[name] = page.items
+        pagination[name] = {"next_cursor": page.next_cursor, "total": page.total}
+    return entity, results, pagination
+
 @router.get("/users/{user_id}/details")
-async def get_user_full_details(user_id: str, current_user: str = Depends(require_admin)):
+async def get_user_full_details(
+    user_id: str,
+    section: Optional[str] = Query(None, description="Load only this section (documents, appointments, relationships, medical_records)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the section"),
+    limit: int = Query(20, ge=1, le=100),
+    include_total: bool = Query(False),
+    current_user: str = Depends(require_admin)
+):
     """Get comprehensive user details including documents, appointments, and relationships"""
     db = get_database()
-    
-    try:
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
-    except:
-        raise HTTPException(status_code=400, detail="Invalid user ID")
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    user["_id"] = str(user["_id"])
-    
-    # Get user documents
-    documents = await db.user_documents.find({"user_id": user_id}).to_list(length=100)
-    for doc in documents:
-        doc["_id"] = str(doc["_id"])
-    
-    # Get user appointments
-    appointments = await db.appointments.find({"patient_id": user_id}).to_list(length=100)
-    for apt in appointments:
-        apt["_id"] = str(apt["_id"])
-    
-    # Get doctor relationships
-    relationships = await db.doctor_patient_relationships.find({"patient_id": user_id}).to_list(length=100)
-    for rel in relationships:
-        rel["_id"] = str(rel["_id"])
-    
-    # Get medical records
-    medical_records = await db.medical_records.find({"patient_id": user_id}).to_list(length=100)
-    for rec in medical_records:
-        rec["_id"] = str(rec["_id"])
-    
-    return {
-        "user": user,
-        "documents": documents,
-        "appointments": appointments,
-        "relationships": relationships,
-        "medical_records": medical_records
-    }
+
+    user, results, pagination = await _load_details(db.users, user_id, "user", {
+        "documents": (db.user_documents, {"user_id": user_id}, DOCUMENT_SUMMARY, NEWEST_FIRST),
+        "appointments": (db.appointments, {"patient_id": user_id}, APPOINTMENT_SUMMARY, [("appointment_date", -1)]),
+        "relationships": (db.doctor_patient_relationships, {"patient_id": user_id}, RELATIONSHIP_SUMMARY, NEWEST_FIRST),
+        "medical_records": (db.medical_records, {"patient_id": user_id}, MEDICAL_RECORD_SUMMARY, NEWEST_FIRST)
+    }, section, cursor, limit, include_total)
+    user.pop("password", None)
+
+    return {"user": user, **results, "pagination": pagination}
 
 @router.get("/doctors/{doctor_id}/details")
-async def get_doctor_full_details(doctor_id: str, current_user: str = Depends(require_admin)):
+async def get_doctor_full_details(
+    doctor_id: str,
+    section: Optional[str] = Query(None, description="Load only this section (portfolios, appointments, relationships)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the section"),
+    limit: int = Query(20, ge=1, le=100),
+    include_total: bool = Query(False),
+    current_user: str = Depends(require_admin)
+):
     """Get comprehensive doctor details including portfolio, appointments, and patient relationships"""
     db = get_database()
-    
-    try:
-        doctor = await db.doctors.find_one({"_id": ObjectId(doctor_id)})
-    except:
-        raise HTTPException(status_code=400, detail="Invalid doctor ID")
-    
-    if not doctor:
-        raise HTTPException(status_code=404, detail="Doctor not found")
-    
-    doctor["_id"] = str(doctor["_id"])
-    
-    # Get doctor portfolio
-    portfolios = await db.doctor_portfolios.find({"doctor_id": doctor_id}).to_list(length=100)
-    for portfolio in portfolios:
-        portfolio["_id"] = str(portfolio["_id"])
-    
-    # Get doctor appointments
-    appointments = await db.appointments.find({"doctor_id": doctor_id}).to_list(length=100)
-    for apt in appointments:
-        apt["_id"] = str(apt["_id"])
-    
-    # Get patient relationships
-    relationships = await db.doctor_patient_relationships.find({"doctor_id": doctor_id}).to_list(length=100)
-    for rel in relationships:
-        rel["_id"] = str(rel["_id"])
-        try:
-            patient = await db.users.find_one({"_id": ObjectId(rel["patient_id"])})
+
+    (doctor, results, pagination), verification = await asyncio.gather(
+        _load_details(db.doctors, doctor_id, "doctor", {
+            "portfolios": (db.doctor_portfolios, {"doctor_id": doctor_id}, PORTFOLIO_SUMMARY, NEWEST_FIRST),
+            "appointments": (db.appointments, {"doctor_id": doctor_id}, APPOINTMENT_SUMMARY, [("appointment_date", -1)]),
+            "relationships": (db.doctor_patient_relationships, {"doctor_id": doctor_id}, RELATIONSHIP_SUMMARY, NEWEST_FIRST)
+        }, section, cursor, limit, include_total),
+        db.background_verifications.find_one({"entity_type": "doctor", "entity_id": doctor_id})
+    )
+
+    if "relationships" in results:
+        patients = await _find_by_ids(db.users, [r.get("patient_id") for r in results["relationships"]], {"name": 1})
+        for rel in results["relationships"]:
+            patient = patients.get(rel.get("patient_id"))
             rel["patient_name"] = patient.get("name", "Unknown") if patient else "Unknown"
-        except:
-            rel["patient_name"] = "Unknown"
-    
-    # Get verification status
-    verification = await db.background_verifications.find_one({
-        "entity_type": "doctor",
-        "entity_id": doctor_id
-    })
+
     if verification:
         verification["_id"] = str(verification["_id"])
-    
-    return {
-        "doctor": doctor,
-        "portfolios": portfolios,
-        "appointments": appointments,
-        "relationships": relationships,
-        "verification": verification
-    }
+
+    return {"doctor": doctor, **results, "verification": verification, "pagination": pagination}
 
 @router.get("/hospitals/{hospital_id}/details")
-async def get_hospital_full_details(hospital_id: str, current_user: str = Depends(require_admin)):
+async def get_hospital_full_details(
+    hospital_id: str,
+    section: Optional[str] = Query(None, description="Load only this section (doctors, appointments)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the section"),
+    limit: int = Query(20, ge=1, le=100),
+    include_total: bool = Query(False),
+    current_user: str = Depends(require_admin)
+):
     """Get comprehensive hospital details including doctors and appointments"""
     db = get_database()
-    
-    try:
-        hospital = await db.hospitals.find_one({"_id": ObjectId(hospital_id)})
-    except:
-        raise HTTPException(status_code=400, detail="Invalid hospital ID")
-    
-    if not hospital:
-        raise HTTPException(status_code=404, detail="Hospital not found")
-    
-    hospital["_id"] = str(hospital["_id"])
-    
-    # Get hospital doctors
-    doctors = await db.doctors.find({"hospital_ids": hospital_id}).to_list(length=100)
-    for doc in doctors:
-        doc["_id"] = str(doc["_id"])
-    
-    # Get hospital appointments
-    appointments = await db.appointments.find({"hospital_id": hospital_id}).to_list(length=100)
-    for apt in appointments:
-        apt["_id"] = str(apt["_id"])
-    
-    # Get verification status
-    verification = await db.background_verifications.find_one({
-        "entity_type": "hospital",
-        "entity_id": hospital_id
-    })
+
+    (hospital, results, pagination), verification = await asyncio.gather(
+        _load_details(db.hospitals, hospital_id, "hospital", {
+            "doctors": (db.doctors, {"hospital_ids": hospital_id}, DOCTOR_SUMMARY, NEWEST_FIRST),
+            "appointments": (db.appointments, {"hospital_id": hospital_id}, APPOINTMENT_SUMMARY, [("appointment_date", -1)])
+        }, section, cursor, limit, include_total),
+        db.background_verifications.find_one({"entity_type": "hospital", "entity_id": hospital_id})
+    )
+
     if verification:
         verification["_id"] = str(verification["_id"])
-    
-    return {
-        "hospital": hospital,
-        "doctors": doctors,
-        "appointments": appointments,
-        "verification": verification
-    }
+
+    return {"hospital": hospital, **results, "verification": verification, "pagination": pagination}
 
 
 # ==================== HOSPITAL TYPES MANAGEMENT ====================
@@ -1317,3 +1354,32 @@ async def delete_specialization(spec_id: str, current_user: str = Depends(requir
         raise HTTPException(status_code=404, detail="Specialization not found")
     
     return {"message": "Specialization deleted successfully"}
+
+
+# ==================== ENCRYPTION KEY ROTATION ====================
+@router.get("/key-rotation")
+async def get_key_rotation_status(current_user: str = Depends(require_admin)):
+    """Progress of the latest re-encryption job"""
+    db = get_database()
+
+    progress = await get_key_rotation_progress(db)
+    if not progress:
+        return {"status": "idle"}
+    return progress
+
+@router.post("/key-rotation")
+async def start_key_rotation_job(current_user: str = Depends(require_admin)):
+    """Re-encrypt appointment notes and medical records under the current primary key (resumes an unfinished job)"""
+    db = get_database()
+
+    if not await start_key_rotation(db):
+        raise HTTPException(status_code=409, detail="A key rotation job is already running")
+    return await get_key_rotation_progress(db)
+
+@router.post("/key-rotation/pause")
+async def pause_key_rotation_job(current_user: str = Depends(require_admin)):
+    db = get_database()
+
+    if not await pause_key_rotation(db):
+        raise HTTPException(status_code=404, detail="No running key rotation job")
+    return await get_key_rotation_progress(db)
@@ -0,0 +1,196 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from bson import ObjectId
+from datetime import date, datetime, timedelta
+from typing import Optional
+from database import get_database
+from routes.admin import require_admin
+from analytics_rollups import run_rollups, get_rollup_state
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/analytics", tags=["admin-analytics"])
+
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "week": "%G-W%V"}
+GROUP_FIELDS = {"status": "status", "hospital": "hospital_id", "specialization": "specialization"}
+
+
+def _period_range(start: Optional[date], end: Optional[date]):
+    """Inclusive date range -> [start, end) datetimes, defaulting to the last 90 days"""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=89)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return datetime.combine(start, datetime.min.time()), datetime.combine(end + timedelta(days=1), datetime.min.time())
+
+
+def _period(granularity: str) -> dict:
+    return {"$dateToString": {"format": PERIOD_FORMATS[granularity], "date": "$day"}}
+
+
+async def _hospital_names(db, hospital_ids) -> dict:
+    object_ids = [ObjectId(h) for h in hospital_ids if h and ObjectId.is_valid(h)]
+    if not object_ids:
+        return {}
+    hospitals = await db.hospitals.find({"_id": {"$in": object_ids}}, {"name": 1}).to_list(length=None)
+    return {str(h["_id"]): h.get("name") for h in hospitals}
+
+
+@router.get("/appointments")
+async def get_appointment_analytics(
+    granularity: str = Query("day", pattern="^(day|week)$"),
+    group_by: str = Query("status", pattern="^(status|hospital|specialization)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    hospital_id: Optional[str] = None,
+    specialization: Optional[str] = None,
+    status: Optional[str] = None,
+    user_info = Depends(require_admin)
+):
+    """Appointments per day/week, split by status, hospital or specialization"""
+    db = get_database()
+    range_start, range_end = _period_range(start, end)
+
+    match = {"day": {"$gte": range_start, "$lt": range_end}}
+    if hospital_id:
+        match["hospital_id"] = hospital_id
+    if specialization:
+        match["specialization"] = specialization
+    if status:
+        match["status"] = status
+
+    key = GROUP_FIELDS[group_by]
+    rows = await db.appointment_rollups.aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"period": _period(granularity), "key": f"${key}"}, "count": {"$sum": "$count"}}},
+        {"$sort": {"_id.period": 1, "_id.key": 1}}
+    ]).to_list(length=None)
+
+    names = await _hospital_names(db, {r["_id"]["key"] for r in rows}) if group_by == "hospital" else {}
+    series = []
+    for row in rows:
+        point = {"period": row["_id"]["period"], group_by: row["_id"]["key"], "count": row["count"]}
+        if group_by == "hospital":
+            point["hospital_name"] = names.get(row["_id"]["key"])
+        series.append(point)
+
+    return {
+        "granularity": granularity,
+        "group_by": group_by,
+        "start": range_start,
+        "end": range_end,
+        "total": sum(point["count"] for point in series),
+        "series": series
+    }
+
+
+@router.get("/no-show-rate")
+async def get_no_show_rate(
+    granularity: str = Query("week", pattern="^(day|week)$"),
+    group_by: Optional[str] = Query(None, pattern="^(hospital|specialization)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    user_info = Depends(require_admin)
+):
+    """Missed appointments as a share of appointments that took place (completed + missed)"""
+    db = get_database()
+    range_start, range_end = _period_range(start, end)
+
+    group_id = {"period": _period(granularity)}
+    if group_by:
+        group_id["key"] = f"${GROUP_FIELDS[group_by]}"
+
+    rows = await db.appointment_rollups.aggregate([
+        {"$match": {"day": {"$gte": range_start, "$lt": range_end}, "status": {"$in": ["completed", "missed"]}}},
+        {"$group": {
+            "_id": group_id,
+            "total": {"$sum": "$count"},
+            "missed": {"$sum": {"$cond": [{"$eq": ["$status", "missed"]}, "$count", 0]}}
+        }},
+        {"$sort": {"_id.period": 1}}
+    ]).to_list(length=None)
+
+    series = []
+    for row in rows:
+        point = {
+            "period": row["_id"]["period"],
+            "missed": row["missed"],
+            "total": row["total"],
+            "no_show_rate": round(row["missed"] / row["total"], 4) if row["total"] else 0.0
+        }
+        if group_by:
+            point[group_by] = row["_id"].get("key")
+        series.append(point)
+
+    missed = sum(point["missed"] for point in series)
+    total = sum(point["total"] for point in series)
+    return {
+        "granularity": granularity,
+        "group_by": group_by,
+        "start": range_start,
+        "end": range_end,
+        "no_show_rate": round(missed / total, 4) if total else 0.0,
+        "series": series
+    }
+
+
+@router.get("/ratings")
+async def get_rating_trends(
+    granularity: str = Query("week", pattern="^(day|week)$"),
+    doctor_id: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    user_info = Depends(require_admin)
+):
+    """Average feedback rating per day/week, overall or for one doctor"""
+    db = get_database()
+    range_start, range_end = _period_range(start, end)
+
+    match = {"day": {"$gte": range_start, "$lt": range_end}}
+    if doctor_id:
+        match["doctor_id"] = doctor_id
+
+    rows = await db.feedback_rollups.aggregate([
+        {"$match": match},
+        {"$group": {"_id": _period(granularity), "count": {"$sum": "$count"}, "rating_sum": {"$sum": "$rating_sum"}}},
+        {"$sort": {"_id": 1}}
+    ]).to_list(length=None)
+
+    series = [{
+        "period": row["_id"],
+        "feedback_count": row["count"],
+        "average_rating": round(row["rating_sum"] / row["count"], 2) if row["count"] else None
+    } for row in rows]
+
+    count = sum(row["count"] for row in rows)
+    rating_sum = sum(row["rating_sum"] for row in rows)
+    return {
+        "granularity": granularity,
+        "doctor_id": doctor_id,
+        "start": range_start,
+        "end": range_end,
+        "feedback_count": count,
+        "average_rating": round(rating_sum / count, 2) if count else None,
+        "series": series
+    }
+
+
+@router.get("/rollups")
+async def get_rollup_status(user_info = Depends(require_admin)):
+    """When the rollups were last built"""
+    db = get_database()
+    return await get_rollup_state(db) or {}
+
+
+@router.post("/rollups/rebuild")
+async def rebuild_rollups(
+    full: bool = Query(True, description="Rebuild all history instead of the recent window"),
+    user_info = Depends(require_admin)
+):
+    """Rebuild the analytics rollups now"""
+    db = get_database()
+    try:
+        return await run_rollups(db, full=full)
+    except Exception as e:
+        logger.exception(f"Analytics rollup rebuild failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to rebuild analytics rollups")
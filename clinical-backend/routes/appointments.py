@@ -1,13 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from bson import ObjectId
 from datetime import datetime
 from typing import List
 from database import get_database
 from schemas import AppointmentCreate, AppointmentUpdate, AppointmentResponse
 from routes.auth import get_current_user, get_current_user_with_role
-from auth import encrypt_data, decrypt_data
+from auth import encrypt_data
+from crypto_service import crypto_service, encrypted_fields, read_projection
 from routes.notifications import create_notification
 from routes.chat import get_conversation_id, send_system_message
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
@@ -33,8 +37,8 @@ async def create_appointment(appointment_data: AppointmentCreate, user_info = De
     # they are correctly recorded as the patient
     appointment_data.patient_id = user_info["user_id"]
 
-    print(f"DEBUG: Creating appointment - patient_id: {appointment_data.patient_id}, doctor_id: {appointment_data.doctor_id}, user_id: {user_info['user_id']}, role: {user_info['role']}")
-    print(f"DEBUG: user_info: {user_info}")
+    logger.debug(f"Creating appointment - patient_id: {appointment_data.patient_id}, doctor_id: {appointment_data.doctor_id}, user_id: {user_info['user_id']}, role: {user_info['role']}")
+    logger.debug("user_info: %s", user_info)
 
     # Validate doctor exists
     # NOTE: Frontend sends doctor USER ID (from hospitals.py), so we need to find doctor by user_id
@@ -121,7 +125,7 @@ async def create_appointment(appointment_data: AppointmentCreate, user_info = De
             # Notification for patient - use their current role so they see it
             # Get patient's current role from user_info (the one making the request)
             patient_notification_role = user_info.get("role", "user")
-            print(f"DEBUG: Creating patient notification with role: {patient_notification_role}")
+            logger.debug(f"Creating patient notification with role: {patient_notification_role}")
             
             await create_notification(
                 db,
@@ -144,13 +148,9 @@ async def create_appointment(appointment_data: AppointmentCreate, user_info = De
             )
 
     except Exception as e:
-        print(f"Warning: Failed to create notifications: {e}")
+        logger.warning(f"Failed to create notifications: {e}")
         # Don't fail the appointment creation if notifications fail
 
-    # Decrypt notes for response
-    if appointment_doc.get("notes"):
-        appointment_doc["notes"] = decrypt_data(appointment_doc["notes"])
-
     # Add dynamic fields for response (doctor and hospital info)
     appointment_doc["doctorName"] = doctor.get("name", "Unknown Doctor")
     appointment_doc["specialty"] = doctor.get("specialization", "General")
@@ -185,8 +185,12 @@ async def create_appointment(appointment_data: AppointmentCreate, user_info = De
     return AppointmentResponse(**appointment_doc)
 
 @router.get("/", response_model=List[AppointmentResponse])
-async def list_appointments(user_info = Depends(get_current_user_with_role)):
+async def list_appointments(
+    include_encrypted: bool = Query(True, description="Include encrypted notes - set false for views that don't show them"),
+    user_info = Depends(get_current_user_with_role)
+):
     db = get_database()
+    projection = read_projection(AppointmentResponse, include_encrypted)
 
     if user_info["role"] == "doctor":
         # Doctors can see:
@@ -195,10 +199,10 @@ async def list_appointments(user_info = Depends(get_current_user_with_role)):
         doctor_ids = await get_doctor_ids_for_user(db, user_info["user_id"])
         
         # Get appointments where doctor is receiving (as doctor)
-        doctor_appointments = await db.appointments.find({"doctor_id": {"$in": doctor_ids}}).to_list(length=100)
+        doctor_appointments = await db.appointments.find({"doctor_id": {"$in": doctor_ids}}, projection).to_list(length=100)
         
         # Get appointments where doctor is booking (as patient)
-        patient_appointments = await db.appointments.find({"patient_id": user_info["user_id"]}).to_list(length=100)
+        patient_appointments = await db.appointments.find({"patient_id": user_info["user_id"]}, projection).to_list(length=100)
         
         # Combine and deduplicate (in case same appointment appears in both)
         appointment_ids = set()
@@ -209,7 +213,7 @@ async def list_appointments(user_info = Depends(get_current_user_with_role)):
                 appointment_ids.add(apt_id)
                 appointments.append(apt)
         
-        print(f"[DEBUG] Doctor {user_info['user_id']} - As doctor: {len(doctor_appointments)}, As patient: {len(patient_appointments)}, Total unique: {len(appointments)}")
+        logger.debug(f"Doctor {user_info['user_id']} - As doctor: {len(doctor_appointments)}, As patient: {len(patient_appointments)}, Total unique: {len(appointments)}")
 
         # For doctors, add patient information to each appointment
         for appointment in appointments:
@@ -225,13 +229,14 @@ async def list_appointments(user_info = Depends(get_current_user_with_role)):
                     }
     else:
         # Users can only see their own appointments
-        appointments = await db.appointments.find({"patient_id": user_info["user_id"]}).to_list(length=100)
+        appointments = await db.appointments.find({"patient_id": user_info["user_id"]}, projection).to_list(length=100)
+
+    # Decrypt notes for the whole page at once (skipped when notes were projected out)
+    if include_encrypted:
+        await crypto_service.decrypt_records(appointments, encrypted_fields(AppointmentResponse))
 
     for appointment in appointments:
         appointment["_id"] = str(appointment["_id"])
-        # Decrypt notes
-        if appointment.get("notes"):
-            appointment["notes"] = decrypt_data(appointment["notes"])
         # Add doctor name, specialty/department, hospital name, and extra info
         doctor_id = appointment.get("doctor_id")
         hospital_id = appointment.get("hospital_id")  # Get hospital_id from appointment directly
@@ -317,10 +322,8 @@ async def list_appointments(user_info = Depends(get_current_user_with_role)):
             appointment["department"] = "General"
             appointment["is_available"] = True
 
-    # Debug: print all appointment statuses being returned
-    print("[DEBUG] Returning appointments with statuses:", [a.get("status") for a in appointments])
-    # Debug: print patient_id for each appointment
-    print("[DEBUG] Appointment patient_ids:", [(a.get("_id"), a.get("patient_id")) for a in appointments])
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Returning appointments with statuses: {[a.get('status') for a in appointments]}")
 
     return [AppointmentResponse(**a) for a in appointments]
 
@@ -362,9 +365,7 @@ async def get_appointment(appointment_id: str, user_info = Depends(get_current_u
         appointment["patient_id"] = str(appointment["patient_id"])
     if isinstance(appointment.get("hospital_id"), ObjectId):
         appointment["hospital_id"] = str(appointment["hospital_id"])
-    # Decrypt notes
-    if appointment.get("notes"):
-        appointment["notes"] = decrypt_data(appointment["notes"])
+    # Notes are decrypted by AppointmentResponse when serialized
 
     # Add doctor information
     try:
@@ -419,6 +420,7 @@ async def update_appointment(appointment_id: str, appointment_data: AppointmentU
         # Encrypt notes if present
         if "notes" in update_dict and update_dict["notes"]:
             update_dict["notes"] = encrypt_data(update_dict["notes"])
+        update_dict["updatedAt"] = datetime.utcnow()
 
         result = await db.appointments.update_one(
             {"_id": ObjectId(appointment_id)},
@@ -432,10 +434,6 @@ async def update_appointment(appointment_id: str, appointment_data: AppointmentU
 
     appointment = await db.appointments.find_one({"_id": ObjectId(appointment_id)})
     appointment["_id"] = str(appointment["_id"])
-    # Decrypt notes for response
-    if appointment.get("notes"):
-        appointment["notes"] = decrypt_data(appointment["notes"])
-
     return AppointmentResponse(**appointment)
 
 @router.delete("/{appointment_id}")
@@ -501,7 +499,7 @@ async def approve_appointment(appointment_id: str, user_info = Depends(get_curre
     # Update appointment status
     result = await db.appointments.update_one(
         {"_id": ObjectId(appointment_id)},
-        {"$set": {"status": "approved"}}
+        {"$set": {"status": "approved", "updatedAt": datetime.utcnow()}}
     )
 
     if result.modified_count == 0:
@@ -509,19 +507,19 @@ async def approve_appointment(appointment_id: str, user_info = Depends(get_curre
 
     # Create notification for patient
     try:
-        print(f"[APPROVE] Looking up doctor with user_id: {appointment['doctor_id']}")
+        logger.debug(f"[APPROVE] Looking up doctor with user_id: {appointment['doctor_id']}")
         doctor = await find_doctor_by_user_id(db, appointment["doctor_id"])
-        print(f"[APPROVE] Doctor found: {doctor.get('name') if doctor else 'None'}")
+        logger.debug(f"[APPROVE] Doctor found: {doctor.get('name') if doctor else 'None'}")
         
-        print(f"[APPROVE] Looking up patient with _id: {appointment['patient_id']}")
+        logger.debug(f"[APPROVE] Looking up patient with _id: {appointment['patient_id']}")
         patient_user = await db.users.find_one({"_id": ObjectId(appointment["patient_id"])})
-        print(f"[APPROVE] Patient found: {patient_user.get('name') if patient_user else 'None'}")
+        logger.debug(f"[APPROVE] Patient found: {patient_user.get('name') if patient_user else 'None'}")
 
         if doctor and patient_user:
             appointment_date = appointment["appointment_date"].strftime("%B %d, %Y at %I:%M %p")
             # Use patient's actual currentRole (they might be a doctor booking with another doctor)
             patient_role = patient_user.get("currentRole", "user")
-            print(f"[APPROVE] Creating notification for patient {patient_user['name']} with role {patient_role}")
+            logger.debug(f"[APPROVE] Creating notification for patient {patient_user['name']} with role {patient_role}")
             
             await create_notification(
                 db,
@@ -531,7 +529,7 @@ async def approve_appointment(appointment_id: str, user_info = Depends(get_curre
                 f"Your appointment with Dr. {doctor['name']} on {appointment_date} has been approved.",
                 "appointment"
             )
-            print(f"[APPROVE] ✅ Notification created successfully!")
+            logger.debug("[APPROVE] Notification created successfully!")
             
             # Send chat notification about approval
             conversation_id = get_conversation_id(str(appointment["patient_id"]), str(doctor["user_id"]))
@@ -542,11 +540,9 @@ async def approve_appointment(appointment_id: str, user_info = Depends(get_curre
                 appointment_id
             )
         else:
-            print(f"[APPROVE] ❌ Doctor or patient not found - doctor: {doctor}, patient: {patient_user}")
+            logger.warning(f"[APPROVE] Doctor or patient not found - doctor: {doctor}, patient: {patient_user}")
     except Exception as e:
-        import traceback
-        print(f"[APPROVE] ❌ Failed to create approval notification: {e}")
-        traceback.print_exc()
+        logger.exception(f"[APPROVE] Failed to create approval notification: {e}")
 
     return {"message": "Appointment approved successfully"}
 
@@ -587,6 +583,7 @@ async def reject_appointment(appointment_id: str, reason: str = None, user_info
     if reason:
         update_data["rejection_reason"] = reason
         update_data["is_last_minute"] = True  # Flag for last minute cancellations
+    update_data["updatedAt"] = datetime.utcnow()
     
     result = await db.appointments.update_one(
         {"_id": ObjectId(appointment_id)},
@@ -648,7 +645,7 @@ async def reject_appointment(appointment_id: str, reason: str = None, user_info
                 appointment_id
             )
     except Exception as e:
-        print(f"Warning: Failed to create rejection notification: {e}")
+        logger.warning(f"Failed to create rejection notification: {e}")
 
     return {"message": "Appointment cancelled successfully"}
 
@@ -682,7 +679,7 @@ async def complete_appointment(appointment_id: str, user_info = Depends(get_curr
     # Update appointment status
     result = await db.appointments.update_one(
         {"_id": ObjectId(appointment_id)},
-        {"$set": {"status": "completed"}}
+        {"$set": {"status": "completed", "updatedAt": datetime.utcnow()}}
     )
 
     if result.modified_count == 0:
@@ -715,7 +712,7 @@ async def complete_appointment(appointment_id: str, user_info = Depends(get_curr
                 appointment_id
             )
     except Exception as e:
-        print(f"Warning: Failed to create completion notification: {e}")
+        logger.warning(f"Failed to create completion notification: {e}")
 
     return {"message": "Appointment marked as complete"}
 
@@ -751,7 +748,7 @@ async def mark_appointment_missed(appointment_id: str, user_info = Depends(get_c
     # Update appointment status
     result = await db.appointments.update_one(
         {"_id": ObjectId(appointment_id)},
-        {"$set": {"status": "missed", "missed_at": datetime.utcnow()}}
+        {"$set": {"status": "missed", "missed_at": datetime.utcnow(), "updatedAt": datetime.utcnow()}}
     )
 
     if result.modified_count == 0:
@@ -788,7 +785,7 @@ async def mark_appointment_missed(appointment_id: str, user_info = Depends(get_c
                 "appointment"
             )
     except Exception as e:
-        print(f"Warning: Failed to create missed notification: {e}")
+        logger.warning(f"Failed to create missed notification: {e}")
 
 @router.post("/check-missed")
 async def check_missed_appointments(user_info = Depends(get_current_user_with_role)):
@@ -818,7 +815,7 @@ async def check_missed_appointments(user_info = Depends(get_current_user_with_ro
         # Mark as missed
         await db.appointments.update_one(
             {"_id": appointment["_id"]},
-            {"$set": {"status": "missed", "missed_at": now}}
+            {"$set": {"status": "missed", "missed_at": now, "updatedAt": now}}
         )
         
         # Create notification for patient
@@ -839,7 +836,7 @@ async def check_missed_appointments(user_info = Depends(get_current_user_with_ro
                     "appointment"
                 )
         except Exception as e:
-            print(f"Warning: Failed to create missed notification: {e}")
+            logger.warning(f"Failed to create missed notification: {e}")
             
         marked_missed.append(str(appointment["_id"]))
     
@@ -876,7 +873,8 @@ async def reschedule_appointment(appointment_id: str, new_date: datetime, user_i
         {"$set": {
             "status": "rescheduled",
             "rescheduled_at": datetime.utcnow(),
-            "rescheduled_to": new_date
+            "rescheduled_to": new_date,
+            "updatedAt": datetime.utcnow()
         }}
     )
 
@@ -929,7 +927,7 @@ async def reschedule_appointment(appointment_id: str, new_date: datetime, user_i
                 "appointment"
             )
     except Exception as e:
-        print(f"Warning: Failed to create reschedule notification: {e}")
+        logger.warning(f"Failed to create reschedule notification: {e}")
 
     return {
         "message": "Appointment rescheduled successfully",
@@ -957,16 +955,14 @@ async def check_and_mark_missed_appointments(user_info = Depends(get_current_use
         # Update all matching appointments to missed
         result = await db.appointments.update_many(
             query,
-            {"$set": {"status": "missed", "auto_missed_at": now}}
+            {"$set": {"status": "missed", "auto_missed_at": now, "updatedAt": now}}
         )
         return {
             "message": f"Marked {result.modified_count} appointments as missed",
             "count": result.modified_count
         }
     except Exception as e:
-        import traceback
-        print("[ERROR] check_and_mark_missed_appointments exception:", e)
-        traceback.print_exc()
+        logger.exception(f"check_and_mark_missed_appointments failed: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
 
@@ -1031,7 +1027,7 @@ async def submit_appointment_feedback(
         # Update appointment with feedback flag
         await db.appointments.update_one(
             {"_id": ObjectId(appointment_id)},
-            {"$set": {"has_feedback": True, "feedback_rating": feedback_data.get("rating", 0)}}
+            {"$set": {"has_feedback": True, "feedback_rating": feedback_data.get("rating", 0), "updatedAt": datetime.utcnow()}}
         )
         
         # Update doctor's average rating
@@ -1050,7 +1046,7 @@ async def submit_appointment_feedback(
                 # Update doctor profile with new rating
                 await db.doctors.update_one(
                     {"user_id": doctor_id},
-                    {"$set": {"rating": avg_rating, "review_count": review_count}}
+                    {"$set": {"rating": avg_rating, "review_count": review_count, "updatedAt": datetime.utcnow()}}
                 )
         
         # Send thank you email to the patient
@@ -1062,9 +1058,9 @@ async def submit_appointment_feedback(
                     doctor_name=doctor_name,
                     rating=feedback_data.get("rating", 0)
                 )
-                print(f"✅ Thank you email sent to {patient_email}")
+                logger.info(f"Thank you email sent to {patient_email}")
             except Exception as email_error:
-                print(f"⚠️ Failed to send thank you email: {email_error}")
+                logger.warning(f"Failed to send thank you email: {email_error}")
                 # Don't fail the request if email fails
         
         return {
@@ -1076,7 +1072,5 @@ async def submit_appointment_feedback(
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        print("[ERROR] submit_appointment_feedback exception:", e)
-        traceback.print_exc()
+        logger.exception(f"submit_appointment_feedback failed: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
\ No newline at end of file
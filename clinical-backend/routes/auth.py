@@ -2,39 +2,41 @@ from fastapi import APIRouter, HTTPException, Depends, status, Header
 from datetime import timedelta, datetime
 from bson import ObjectId
 from database import get_database
-from schemas import LoginRequest, UserCreate, UserCreateWithOTP, UserResponse, TokenResponse, UserUpdate, SwitchRoleRequest, OTPSendRequest, OTPVerifyRequest, OTPResponse
-from auth import hash_password, verify_password, create_access_token, decode_token
+from schemas import LoginRequest, UserCreate, UserCreateWithOTP, UserResponse, TokenResponse, UserUpdate, SwitchRoleRequest, OTPSendRequest, OTPVerifyRequest, OTPResponse, RefreshTokenRequest, RefreshTokenResponse
+from auth import create_access_token, create_refresh_token, decode_token
+from password_service import password_service
 from config import settings
 from typing import Optional
+import secrets
 from pymongo.errors import ServerSelectionTimeoutError, ConnectionFailure
 from email_service import email_service
+from notification_service import notification_service
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 async def get_current_user(authorization: Optional[str] = Header(None)):
-    print(f"🔐 AUTH: Received authorization header: {authorization[:20] if authorization else 'None'}...")
     if not authorization:
-        print("❌ AUTH: Missing authorization header")
+        logger.debug("AUTH: Missing authorization header")
         raise HTTPException(status_code=401, detail="Missing authorization header")
 
     try:
         scheme, token = authorization.split()
-        print(f"🔐 AUTH: Scheme: {scheme}, Token length: {len(token) if token else 0}")
         if scheme.lower() != "bearer":
-            print(f"❌ AUTH: Invalid scheme: {scheme}")
+            logger.debug(f"AUTH: Invalid scheme: {scheme}")
             raise HTTPException(status_code=401, detail="Invalid auth scheme")
     except ValueError as e:
-        print(f"❌ AUTH: Invalid header format: {e}")
+        logger.debug(f"AUTH: Invalid header format: {e}")
         raise HTTPException(status_code=401, detail="Invalid authorization header")
 
     payload = decode_token(token)
     if payload is None:
-        print("❌ AUTH: Token decode failed - invalid token")
+        logger.debug("AUTH: Token decode failed - invalid token")
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user_id = payload.get("sub")
-    print(f"✅ AUTH: Successfully authenticated user: {user_id}")
-    return user_id
+    return payload.get("sub")
 
 async def get_current_user_with_role(authorization: Optional[str] = Header(None)):
     """Get current user with role information"""
@@ -75,7 +77,7 @@ async def register(user_data: UserCreate):
             "mobile": user_data.mobile,
             "userType": user_data.userType,
             "currentRole": user_data.userType,
-            "password": hash_password(user_data.password),
+            "password": await password_service.hash_async(user_data.password),
             "createdAt": None
         }
         
@@ -94,14 +96,14 @@ async def register(user_data: UserCreate):
                 "createdAt": datetime.utcnow()
             }
             await db.doctors.insert_one(doctor_doc)
-            print(f"Created doctor profile for user {user_id}")
+            logger.info(f"Created doctor profile for user {user_id}")
 
         # Send welcome email for doctors
         if user_data.userType == "doctor":
             try:
                 email_service.send_welcome_email(user_data.email, user_data.name, "doctor")
             except Exception as e:
-                print(f"Warning: Failed to send doctor welcome email: {e}")
+                logger.warning(f"Failed to send doctor welcome email: {e}")
                 # Don't fail registration if email fails
 
         # Create token
@@ -116,6 +118,7 @@ async def register(user_data: UserCreate):
 
         return {
             "access_token": access_token,
+            "refresh_token": await issue_refresh_token(db, user_id),
             "token_type": "bearer",
             "user": user_response
         }
@@ -138,8 +141,19 @@ async def login(login_data: LoginRequest):
     
     # Find user
     user = await db.users.find_one({"email": login_data.email})
-    if not user or not verify_password(login_data.password, user["password"]):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    valid, new_hash = await password_service.verify_and_update_async(login_data.password, user.get("password"))
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    if new_hash:
+        # Upgrade legacy/outdated hashes, unless the password changed meanwhile
+        await db.users.update_one(
+            {"_id": user["_id"], "password": user["password"]},
+            {"$set": {"password": new_hash, "updatedAt": datetime.utcnow()}}
+        )
     
     user_id = str(user["_id"])
     
@@ -155,10 +169,79 @@ async def login(login_data: LoginRequest):
     
     return {
         "access_token": access_token,
+        "refresh_token": await issue_refresh_token(db, user_id),
         "token_type": "bearer",
         "user": user_response
     }
 
+# ==================== REFRESH TOKENS ====================
+# Every refresh token issued is recorded in refresh_tokens (_id = jti) until it
+# expires (TTL on expiresAt). Refreshing marks the presented token used and
+# issues a new one. Presenting a used or revoked (logged out) token again looks
+# like a stolen token being replayed, so every refresh token of that user is
+# revoked - except within REFRESH_REUSE_GRACE_SECONDS of its first use, which is
+# two browser tabs refreshing with the same stored token at once.
+
+async def ensure_refresh_token_indexes(db):
+    await db.refresh_tokens.create_index("expiresAt", expireAfterSeconds=0)
+    await db.refresh_tokens.create_index("user_id")
+
+async def issue_refresh_token(db, user_id: str) -> str:
+    jti = secrets.token_hex(16)
+    expire = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
+    await db.refresh_tokens.insert_one({"_id": jti, "user_id": user_id, "expiresAt": expire, "createdAt": datetime.utcnow()})
+    return create_refresh_token(data={"sub": user_id, "jti": jti}, expire=expire)
+
+def _refresh_payload(refresh_token: str) -> dict:
+    payload = decode_token(refresh_token, token_type="refresh")
+    if payload is None or not ObjectId.is_valid(payload.get("sub")) or not payload.get("jti"):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return payload
+
+@router.post("/refresh", response_model=RefreshTokenResponse)
+async def refresh_access_token(refresh_data: RefreshTokenRequest):
+    """Exchange a refresh token for a new access token; the refresh token is rotated (single use)"""
+    payload = _refresh_payload(refresh_data.refresh_token)
+
+    user_id = payload["sub"]
+    db = get_database()
+    # Atomic, so two concurrent refreshes with the same token cannot both succeed
+    consumed = await db.refresh_tokens.find_one_and_update(
+        {"_id": payload["jti"], "user_id": user_id, "usedAt": None},
+        {"$set": {"usedAt": datetime.utcnow()}}
+    )
+    if not consumed:
+        used = await db.refresh_tokens.find_one({"_id": payload["jti"], "user_id": user_id}, {"usedAt": 1})
+        if used and datetime.utcnow() - used["usedAt"] < timedelta(seconds=settings.refresh_reuse_grace_seconds):
+            raise HTTPException(status_code=401, detail="Refresh token has already been used")
+        revoked = await db.refresh_tokens.delete_many({"user_id": user_id})
+        logger.warning(f"Refresh token reuse for user {user_id} - revoked {revoked.deleted_count} refresh tokens")
+        raise HTTPException(status_code=401, detail="Refresh token has already been used or revoked")
+
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, {"email": 1})
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
+    access_token = create_access_token(
+        data={"sub": user_id, "email": user.get("email")},
+        expires_delta=access_token_expires
+    )
+
+    return {
+        "access_token": access_token,
+        "refresh_token": await issue_refresh_token(db, user_id),
+        "token_type": "bearer"
+    }
+
+@router.post("/logout")
+async def logout(refresh_data: RefreshTokenRequest):
+    """Revoke a refresh token (this device's session)"""
+    payload = _refresh_payload(refresh_data.refresh_token)
+    db = get_database()
+    await db.refresh_tokens.delete_one({"_id": payload["jti"], "user_id": payload["sub"]})
+    return {"message": "Logged out"}
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(user_id: str = Depends(get_current_user)):
     db = get_database()
@@ -176,7 +259,7 @@ async def switch_role(role_data: SwitchRoleRequest, user_id: str = Depends(get_c
 
     result = await db.users.update_one(
         {"_id": ObjectId(user_id)},
-        {"$set": {"currentRole": new_role}}
+        {"$set": {"currentRole": new_role, "updatedAt": datetime.utcnow()}}
     )
 
     if result.matched_count == 0:
@@ -214,7 +297,10 @@ async def delete_account(user_id: str = Depends(get_current_user)):
         await db.medical_records.delete_many({"patient_id": user_id})
 
         # Delete notifications
-        await db.notifications.delete_many({"user_id": user_id})
+        await notification_service.forget_user(db, user_id)
+
+        # Revoke refresh tokens
+        await db.refresh_tokens.delete_many({"user_id": user_id})
 
         # Delete settings
         await db.settings.delete_many({"user_id": user_id})
@@ -286,7 +372,7 @@ async def send_otp(otp_data: OTPSendRequest):
 @router.post("/verify-otp", response_model=TokenResponse)
 async def verify_otp(verify_data: OTPVerifyRequest):
     """Verify OTP and authenticate user"""
-    print(f"DEBUG: verify_otp called with data: email={verify_data.email}, userType={verify_data.userType}, name={verify_data.name}")
+    logger.debug(f"verify_otp called with data: email={verify_data.email}, userType={verify_data.userType}, name={verify_data.name}")
     db = get_database()
 
     # Find the OTP record
@@ -350,7 +436,7 @@ async def verify_otp(verify_data: OTPVerifyRequest):
                 "createdAt": datetime.utcnow()
             }
             await db.doctors.insert_one(doctor_doc)
-            print(f"Created doctor profile for user {result.inserted_id}")
+            logger.info(f"Created doctor profile for user {result.inserted_id}")
 
     # Mark OTP as used
     await db.otp.update_one(
@@ -364,13 +450,13 @@ async def verify_otp(verify_data: OTPVerifyRequest):
         try:
             email_service.send_welcome_email(verify_data.email, user.get("name", verify_data.email.split("@")[0]), "doctor")
         except Exception as e:
-            print(f"Warning: Failed to send doctor welcome email: {e}")
+            logger.warning(f"Failed to send doctor welcome email: {e}")
     else:
         # Send welcome email for regular users too
         try:
             email_service.send_welcome_email(verify_data.email, user.get("name", verify_data.email.split("@")[0]), "user")
         except Exception as e:
-            print(f"Warning: Failed to send welcome email: {e}")
+            logger.warning(f"Failed to send welcome email: {e}")
 
     # Create access token
     user_id = str(user["_id"])
@@ -385,6 +471,7 @@ async def verify_otp(verify_data: OTPVerifyRequest):
 
     return {
         "access_token": access_token,
+        "refresh_token": await issue_refresh_token(db, user_id),
         "token_type": "bearer",
         "user": user_response
     }
@@ -437,7 +524,7 @@ async def register_with_otp(user_data: UserCreateWithOTP):
             "mobile": user_data.mobile,
             "userType": user_data.userType,
             "currentRole": user_data.userType,
-            "password": hash_password(random_password),  # Random password (user uses OTP to login)
+            "password": await password_service.hash_async(random_password),  # Random password (user uses OTP to login)
             "createdAt": datetime.utcnow(),
             "email_verified": True,  # Email is verified via OTP
             "date_of_birth": user_data.dob,
@@ -460,7 +547,7 @@ async def register_with_otp(user_data: UserCreateWithOTP):
                 "createdAt": datetime.utcnow()
             }
             await db.doctors.insert_one(doctor_doc)
-            print(f"Created doctor profile for user {user_id} with registration number: {user_data.registration_number}")
+            logger.info(f"Created doctor profile for user {user_id} with registration number: {user_data.registration_number}")
 
         # Generate access token for the new user
         access_token = create_access_token(data={"sub": user_id})
@@ -471,6 +558,7 @@ async def register_with_otp(user_data: UserCreateWithOTP):
 
         return {
             "access_token": access_token,
+            "refresh_token": await issue_refresh_token(db, user_id),
             "token_type": "bearer",
             "user": user_response,
             "message": "Registration successful!"
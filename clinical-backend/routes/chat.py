@@ -1,45 +1,239 @@
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException, Query, status
 from fastapi.responses import FileResponse
+import asyncio
 import json
 import os
+import time
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Dict, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
+from bson.errors import InvalidId
 
 from database import get_database
 from routes.auth import get_current_user_with_role
+from retention import load_archived_messages
+from notification_service import notification_service
+from auth import decode_token
+from config import settings
+from instrumentation import Counter, Gauge, register
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# WebSocket connection manager - now uses conversation_id (doctor-patient pair)
+websocket_connections = register(Gauge(
+    "chat_websocket_connections", "Open chat WebSocket connections", ()
+))
+websocket_reaped = register(Counter(
+    "chat_websocket_reaped_total", "Chat WebSockets closed by the server", ("reason",)
+))
+
+
+# WebSocket connection manager - conversation sockets and multiplexed per-user sockets
 class ConnectionManager:
+    """Open sockets and the conversations they receive.
+
+    A legacy socket (/chat/ws/{conversation_id}) is bound to one conversation
+    and receives bare message dicts. A multiplexed socket (/chat/ws) belongs to
+    a user, subscribes to any number of their conversations and receives typed
+    events: message, typing, presence and notification.
+
+    A single heartbeat task pings every socket and reaps the ones that stopped
+    answering, so half-open connections do not pile up and slow down broadcasts."""
+
     def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+        self.active_connections: Dict[str, List[WebSocket]] = {}  # conversation_id -> subscribed sockets
+        self.user_connections: Dict[str, List[WebSocket]] = {}  # user_id -> multiplexed sockets
+        self.sockets: Dict[WebSocket, dict] = {}  # socket -> {user_id, role, multiplexed, conversations}
+        self.last_seen: Dict[WebSocket, float] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
 
-    async def connect(self, conversation_id: str, websocket: WebSocket):
+    def _register(self, websocket: WebSocket, user_id: Optional[str], role: Optional[str], multiplexed: bool):
+        self.sockets[websocket] = {"user_id": user_id, "role": role, "multiplexed": multiplexed, "conversations": set()}
+        self.last_seen[websocket] = time.monotonic()
+        websocket_connections.set(len(self.sockets))
+
+    async def connect(self, conversation_id: str, websocket: WebSocket, user_id: Optional[str] = None):
         await websocket.accept()
-        if conversation_id not in self.active_connections:
-            self.active_connections[conversation_id] = []
-        self.active_connections[conversation_id].append(websocket)
+        self._register(websocket, user_id, None, multiplexed=False)
+        self.subscribe(websocket, conversation_id)
 
-    def disconnect(self, conversation_id: str, websocket: WebSocket):
+    async def connect_user(self, user_id: str, role: str, websocket: WebSocket):
+        await websocket.accept()
+        self._register(websocket, user_id, role, multiplexed=True)
+        self.user_connections.setdefault(user_id, []).append(websocket)
+
+    def subscribe(self, websocket: WebSocket, conversation_id: str):
+        connections = self.active_connections.setdefault(conversation_id, [])
+        if websocket not in connections:
+            connections.append(websocket)
+        self.sockets[websocket]["conversations"].add(conversation_id)
+
+    def unsubscribe(self, websocket: WebSocket, conversation_id: str):
         if conversation_id in self.active_connections:
             if websocket in self.active_connections[conversation_id]:
                 self.active_connections[conversation_id].remove(websocket)
             if len(self.active_connections[conversation_id]) == 0:
                 del self.active_connections[conversation_id]
+        if websocket in self.sockets:
+            self.sockets[websocket]["conversations"].discard(conversation_id)
+
+    def is_online(self, user_id: str) -> bool:
+        return bool(self.user_connections.get(user_id))
+
+    def touch(self, websocket: WebSocket):
+        """Record activity - any frame from the client counts as a pong"""
+        self.last_seen[websocket] = time.monotonic()
+
+    def remove(self, websocket: WebSocket) -> Optional[dict]:
+        """Forget a socket; returns its info if this was the user's last multiplexed socket (now offline)"""
+        info = self.sockets.pop(websocket, None)
+        self.last_seen.pop(websocket, None)
+        websocket_connections.set(len(self.sockets))
+        if info is None:
+            return None
+        for conversation_id in list(info["conversations"]):
+            self.unsubscribe(websocket, conversation_id)
+        if not info["multiplexed"]:
+            return None
+        user_sockets = self.user_connections.get(info["user_id"], [])
+        if websocket in user_sockets:
+            user_sockets.remove(websocket)
+        if user_sockets:
+            return None
+        self.user_connections.pop(info["user_id"], None)
+        return info
+
+    def disconnect(self, conversation_id: str, websocket: WebSocket):
+        self.remove(websocket)
+
+    async def disconnect_user(self, websocket: WebSocket):
+        offline = self.remove(websocket)
+        if offline:
+            await asyncio.gather(*[
+                self.publish(conversation_id, {"type": "presence", "user_id": offline["user_id"], "online": False})
+                for conversation_id in offline["conversations"]
+            ])
+
+    async def _drop(self, websocket: WebSocket, reason: str):
+        info = self.sockets.get(websocket)
+        if info and info["multiplexed"]:
+            await self.disconnect_user(websocket)
+        else:
+            self.remove(websocket)
+        websocket_reaped.inc(reason)
+        try:
+            await asyncio.wait_for(websocket.close(code=status.WS_1001_GOING_AWAY), timeout=settings.ws_send_timeout_seconds)
+        except Exception:
+            pass  # Already gone
+
+    async def _send(self, websocket: WebSocket, data: dict):
+        try:
+            await asyncio.wait_for(websocket.send_json(data), timeout=settings.ws_send_timeout_seconds)
+        except Exception as e:
+            logger.warning(f"Dropping chat websocket after failed send: {e!r}")
+            await self._drop(websocket, "send_failed")
 
     async def broadcast(self, conversation_id: str, data: dict):
-        if conversation_id in self.active_connections:
-            for connection in self.active_connections[conversation_id]:
-                try:
-                    await connection.send_json(data)
-                except Exception as e:
-                    print(f"Error broadcasting to websocket: {e}")
+        """Deliver a chat message to every socket subscribed to the conversation"""
+        # Concurrent sends with a timeout - one slow or dead socket cannot hold up the others
+        event = {"type": "message", "conversation_id": conversation_id, "message": data}
+        await asyncio.gather(*[
+            self._send(connection, event if self.sockets[connection]["multiplexed"] else data)
+            for connection in list(self.active_connections.get(conversation_id, []))
+            if connection in self.sockets
+        ])
+
+    async def publish(self, conversation_id: str, event: dict, exclude_user: Optional[str] = None):
+        """Typing/presence/read events - multiplexed sockets only, legacy clients would show them as messages"""
+        event = {**event, "conversation_id": conversation_id}
+        await asyncio.gather(*[
+            self._send(connection, event)
+            for connection in list(self.active_connections.get(conversation_id, []))
+            if connection in self.sockets and self.sockets[connection]["multiplexed"]
+            and self.sockets[connection]["user_id"] != exclude_user
+        ])
+
+    async def _refresh_roles(self, user_ids: List[str]):
+        """Re-read currentRole of connected users - it changes with /auth/switch-role, possibly on another worker"""
+        ids = [ObjectId(user_id) for user_id in user_ids if ObjectId.is_valid(user_id)]
+        if not ids:
+            return
+        users = await get_database().users.find({"_id": {"$in": ids}}, {"currentRole": 1}).to_list(length=None)
+        roles = {str(user["_id"]): user.get("currentRole", "user") for user in users}
+        for info in self.sockets.values():
+            if info["multiplexed"] and info["user_id"] in roles:
+                info["role"] = roles[info["user_id"]]
+
+    async def push_notifications(self, notifications: List[dict]):
+        """notification_service listener: deliver new notifications to the recipients' sockets in the matching role"""
+        if any(notification.get("audience") for notification in notifications):
+            recipients = list(self.user_connections)
+        else:
+            recipients = [n.get("user_id") for n in notifications if n.get("user_id") in self.user_connections]
+        if not recipients:
+            return
+        await self._refresh_roles(recipients)
+
+        sends = []
+        for notification in notifications:
+            if notification.get("audience"):
+                role = notification["audience"]
+                targets = [ws for ws, info in self.sockets.items() if info["multiplexed"] and info["role"] == role]
+            else:
+                role = notification.get("user_type")
+                targets = [ws for ws in self.user_connections.get(notification.get("user_id"), []) if self.sockets[ws]["role"] == role]
+            for websocket in list(targets):
+                # Per recipient: topic receipts hold other users' ids
+                view = notification_service.for_user(dict(notification), self.sockets[websocket]["user_id"])
+                sends.append(self._send(websocket, {"type": "notification", "notification": _jsonable(view)}))
+        await asyncio.gather(*sends)
+
+    async def heartbeat(self):
+        """Reap sockets idle past the timeout, ping the rest"""
+        deadline = time.monotonic() - settings.ws_idle_timeout_seconds
+        await asyncio.gather(*[
+            self._drop(websocket, "idle") if self.last_seen.get(websocket, 0) < deadline
+            else self._send(websocket, {"type": "ping"})
+            for websocket in list(self.sockets)
+        ])
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(settings.ws_ping_interval_seconds)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.warning(f"Chat websocket heartbeat failed: {e}")
+
+    def start_heartbeat(self):
+        """Start the ping/reap task (called on app startup)"""
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    def stop_heartbeat(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+
+
+def _jsonable(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(v) for v in value]
+    return value
+
 
 manager = ConnectionManager()
+notification_service.add_listener(manager.push_notifications)
 
 # Create uploads directory
 os.makedirs("./uploads/chat", exist_ok=True)
@@ -52,6 +246,40 @@ def get_conversation_id(user1_id: str, user2_id: str) -> str:
     return f"{sorted_ids[0]}_{sorted_ids[1]}"
 
 
+# ==================== READ CURSORS ====================
+# Read state lives on the conversation (chat_conversations._id = conversation_id):
+# read_cursors.<user_id> = timestamp of the newest message the user has read.
+# Marking read is one small write and unread counts are a range count on
+# (conversation_id, timestamp). Messages read before cursors existed still
+# carry the old read_by arrays, which are used until a user's first cursor.
+
+async def get_read_cursors(db, conversation_ids: List[str]) -> Dict[str, Dict[str, str]]:
+    """conversation_id -> {user_id: read-through timestamp}, in one query"""
+    docs = await db.chat_conversations.find(
+        {"_id": {"$in": conversation_ids}}, {"read_cursors": 1}
+    ).to_list(length=None)
+    return {doc["_id"]: doc.get("read_cursors", {}) for doc in docs}
+
+
+def unread_filter(conversation_filter: dict, user_id: str, read_through: Optional[str]) -> dict:
+    query = {**conversation_filter, "deleted": False, "sender_id": {"$ne": user_id}}
+    if read_through is None:
+        query["read_by"] = {"$ne": user_id}
+    else:
+        query["timestamp"] = {"$gt": read_through}
+    return query
+
+
+def read_receipts(message: dict, read_cursors: Dict[str, str]) -> List[str]:
+    """Users who have read a message: its sender, legacy read_by entries and every cursor at or past it"""
+    readers = list(message.get("read_by") or [])
+    timestamp = message.get("timestamp") or ""
+    for reader, read_through in read_cursors.items():
+        if read_through >= timestamp and reader not in readers:
+            readers.append(reader)
+    return readers
+
+
 async def send_system_message(db, conversation_id: str, message: str, appointment_id: str = None):
     """Send a system message to a conversation (for notifications)"""
     system_msg = {
@@ -74,47 +302,157 @@ async def send_system_message(db, conversation_id: str, message: str, appointmen
     return system_msg
 
 
+def websocket_user(websocket: WebSocket, token: Optional[str]) -> Optional[str]:
+    """User id from the ?token= access token (browsers cannot set headers) or a Bearer header"""
+    if not token:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    payload = decode_token(token) if token else None
+    return payload.get("sub") if payload else None
+
+
+async def is_participant(db, conversation_id: str, user_id: str) -> bool:
+    parts = conversation_id.split("_")
+    if len(parts) == 2:
+        return user_id in parts
+    # Legacy per-appointment chat rooms are keyed by the appointment id
+    try:
+        appointment = await db.appointments.find_one({"_id": ObjectId(conversation_id)}, {"patient_id": 1, "doctor_id": 1})
+    except InvalidId:
+        return False
+    return bool(appointment) and user_id in (str(appointment.get("patient_id")), str(appointment.get("doctor_id")))
+
+
+async def store_socket_message(db, conversation_id: str, user_id: str, sender_role: Optional[str], message_data: dict):
+    """Save a message sent over a WebSocket and broadcast it to the conversation"""
+    # The sender is the authenticated user, not whatever the client claims
+    message = {
+        "conversation_id": conversation_id,
+        "appointment_id": message_data.get("appointment_id"),  # Optional - for context
+        "sender_id": user_id,
+        "sender_role": sender_role,
+        "message": message_data.get("message"),
+        "message_type": message_data.get("message_type", "text"),
+        "file_url": message_data.get("file_url"),
+        "read_by": [user_id],
+        "timestamp": datetime.utcnow().isoformat(),
+        "deleted": False
+    }
+
+    # Store in database
+    await db.chat_messages.insert_one(message)
+    message["_id"] = str(message.get("_id"))
+    message["id"] = message["_id"]
+
+    # Broadcast to all connected clients
+    await manager.broadcast(conversation_id, message)
+
+
 @router.websocket("/ws/{conversation_id}")
-async def websocket_endpoint(websocket: WebSocket, conversation_id: str):
+async def websocket_endpoint(websocket: WebSocket, conversation_id: str, token: Optional[str] = None):
     """WebSocket endpoint for live chat using conversation_id (doctor-patient pair)"""
     db = get_database()
-    await manager.connect(conversation_id, websocket)
+    user_id = websocket_user(websocket, token)
+    if not user_id or not await is_participant(db, conversation_id, user_id):
+        logger.debug(f"[CHAT] Rejected websocket for {conversation_id} (user: {user_id})")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await manager.connect(conversation_id, websocket, user_id)
     try:
         while True:
             data = await websocket.receive_text()
+            manager.touch(websocket)
             message_data = json.loads(data)
+            if message_data.get("type") == "pong":
+                continue
+            if message_data.get("type") == "ping":
+                await websocket.send_json({"type": "pong"})
+                continue
             
-            # Create message record
-            message = {
-                "conversation_id": conversation_id,
-                "appointment_id": message_data.get("appointment_id"),  # Optional - for context
-                "sender_id": message_data.get("sender_id"),
-                "sender_role": message_data.get("sender_role"),
-                "message": message_data.get("message"),
-                "message_type": message_data.get("message_type", "text"),
-                "file_url": message_data.get("file_url"),
-                "read_by": [message_data.get("sender_id")],
-                "timestamp": datetime.utcnow().isoformat(),
-                "deleted": False
-            }
-            
-            # Store in database
-            await db.chat_messages.insert_one(message)
-            message["_id"] = str(message.get("_id"))
-            
-            # Broadcast to all connected clients
-            await manager.broadcast(conversation_id, message)
+            await store_socket_message(db, conversation_id, user_id, message_data.get("sender_role"), message_data)
             
     except WebSocketDisconnect:
         manager.disconnect(conversation_id, websocket)
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        logger.error(f"WebSocket error: {e}")
         manager.disconnect(conversation_id, websocket)
 
 
+@router.websocket("/ws")
+async def user_websocket_endpoint(websocket: WebSocket, token: Optional[str] = None):
+    """One multiplexed socket per client: chat messages for every subscribed
+    conversation, typing and presence events, and notifications.
+
+    Client frames: {"type": "subscribe" | "unsubscribe", "conversation_id"},
+    {"type": "message", "conversation_id", "message", ...},
+    {"type": "typing", "conversation_id", "is_typing"}, {"type": "ping" | "pong"}.
+    """
+    db = get_database()
+    user_id = websocket_user(websocket, token)
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, {"currentRole": 1}) if user_id and ObjectId.is_valid(user_id) else None
+    if not user:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    role = user.get("currentRole", "user")
+
+    await manager.connect_user(user_id, role, websocket)
+    subscribed = manager.sockets[websocket]["conversations"]
+    try:
+        while True:
+            frame = json.loads(await websocket.receive_text())
+            manager.touch(websocket)
+            frame_type = frame.get("type")
+            conversation_id = frame.get("conversation_id")
+            if frame_type == "pong":
+                continue
+            if frame_type == "ping":
+                await websocket.send_json({"type": "pong"})
+                continue
+            if not isinstance(conversation_id, str):
+                await websocket.send_json({"type": "error", "detail": f"{frame_type} needs a conversation_id"})
+                continue
+
+            if frame_type == "unsubscribe":
+                manager.unsubscribe(websocket, conversation_id)
+                continue
+            if conversation_id not in subscribed:
+                if frame_type not in ("subscribe", "message"):
+                    await websocket.send_json({"type": "error", "conversation_id": conversation_id, "detail": "Not subscribed to this conversation"})
+                    continue
+                if not await is_participant(db, conversation_id, user_id):
+                    await websocket.send_json({"type": "error", "conversation_id": conversation_id, "detail": "Not a participant in this conversation"})
+                    continue
+                manager.subscribe(websocket, conversation_id)
+                others = [p for p in conversation_id.split("_") if p != user_id]
+                await websocket.send_json({
+                    "type": "subscribed", "conversation_id": conversation_id,
+                    "online": [p for p in others if manager.is_online(p)]
+                })
+                await manager.publish(conversation_id, {"type": "presence", "user_id": user_id, "online": True}, exclude_user=user_id)
+
+            if frame_type == "message":
+                await store_socket_message(db, conversation_id, user_id, role, frame)
+            elif frame_type == "typing":
+                await manager.publish(
+                    conversation_id,
+                    {"type": "typing", "user_id": user_id, "is_typing": bool(frame.get("is_typing", True))},
+                    exclude_user=user_id
+                )
+
+    except WebSocketDisconnect:
+        await manager.disconnect_user(websocket)
+    except Exception as e:
+        logger.error(f"WebSocket error: {e}")
+        await manager.disconnect_user(websocket)
+
+
 @router.get("/messages/{conversation_id}")
 async def get_chat_history(
     conversation_id: str,
+    archived_before: Optional[str] = Query(
+        None, description="Return one page of archived messages older than this timestamp instead of the live ones"
+    ),
     current_user = Depends(get_current_user_with_role)
 ):
     """Get chat history for a conversation (doctor-patient pair)"""
@@ -131,33 +469,37 @@ async def get_chat_history(
     if user_id not in parts:
         raise HTTPException(status_code=403, detail="Access denied: You're not part of this conversation")
     
-    # Get messages - check both old appointment_id based and new conversation_id based
-    messages = await db.chat_messages.find({
-        "$or": [
-            {"conversation_id": conversation_id},
-            {"appointment_id": {"$exists": True}}  # Legacy messages
-        ],
-        "deleted": False
-    }).sort("timestamp", 1).to_list(None)
-    
-    # Filter legacy messages to only include those between these two users
-    filtered_messages = []
-    for msg in messages:
-        if msg.get("conversation_id") == conversation_id:
-            filtered_messages.append(msg)
-        elif msg.get("appointment_id"):
-            # Check if this legacy message belongs to this conversation
-            apt = await db.appointments.find_one({"_id": ObjectId(msg.get("appointment_id"))})
-            if apt:
-                apt_conv_id = get_conversation_id(str(apt.get("patient_id")), str(apt.get("doctor_id")))
-                if apt_conv_id == conversation_id:
-                    filtered_messages.append(msg)
+    if archived_before is not None:
+        filtered_messages = await load_archived_messages(db, conversation_id, archived_before)
+    else:
+        # Get messages - check both old appointment_id based and new conversation_id based
+        messages = await db.chat_messages.find({
+            "$or": [
+                {"conversation_id": conversation_id},
+                {"appointment_id": {"$exists": True}}  # Legacy messages
+            ],
+            "deleted": False
+        }).sort("timestamp", 1).to_list(None)
+    
+        # Filter legacy messages to only include those between these two users
+        filtered_messages = []
+        for msg in messages:
+            if msg.get("conversation_id") == conversation_id:
+                filtered_messages.append(msg)
+            elif msg.get("appointment_id"):
+                # Check if this legacy message belongs to this conversation
+                apt = await db.appointments.find_one({"_id": ObjectId(msg.get("appointment_id"))})
+                if apt:
+                    apt_conv_id = get_conversation_id(str(apt.get("patient_id")), str(apt.get("doctor_id")))
+                    if apt_conv_id == conversation_id:
+                        filtered_messages.append(msg)
     
     # Sort by timestamp
     filtered_messages.sort(key=lambda x: x.get("timestamp", ""))
     
     # Cache for sender names to avoid repeated DB queries
     sender_names = {"system": "System"}
+    read_cursors = (await get_read_cursors(db, [conversation_id])).get(conversation_id, {})
     
     result = []
     for msg in filtered_messages:
@@ -186,7 +528,7 @@ async def get_chat_history(
             "message": msg.get("message"),
             "message_type": msg.get("message_type", "text"),
             "file_url": msg.get("file_url"),
-            "read_by": msg.get("read_by", []),
+            "read_by": read_receipts(msg, read_cursors),
             "timestamp": msg.get("timestamp"),
             "deleted": msg.get("deleted", False)
         })
@@ -203,7 +545,7 @@ async def get_conversations(
     user_id = current_user.get("user_id")
     user_role = current_user.get("role", "user")
     
-    print(f"[CHAT] Getting consolidated conversations for user_id={user_id}, role={user_role}")
+    logger.debug(f"[CHAT] Getting consolidated conversations for user_id={user_id}, role={user_role}")
     
     try:
         # Find all appointments where user is patient or doctor
@@ -242,7 +584,7 @@ async def get_conversations(
                 ]
             }).to_list(length=None)
         
-        print(f"[CHAT] Found {len(appointments)} total appointments")
+        logger.debug(f"[CHAT] Found {len(appointments)} total appointments")
         
         # Group appointments by partner (doctor-patient pair)
         partner_appointments = {}  # partner_id -> list of appointments
@@ -266,9 +608,12 @@ async def get_conversations(
                 partner_appointments[partner_id] = []
             partner_appointments[partner_id].append(apt)
         
-        print(f"[CHAT] Grouped into {len(partner_appointments)} unique partners")
+        logger.debug(f"[CHAT] Grouped into {len(partner_appointments)} unique partners")
         
         conversations = []
+        read_cursors = await get_read_cursors(
+            db, [get_conversation_id(user_id, partner_id) for partner_id in partner_appointments]
+        )
         
         for partner_id, apts in partner_appointments.items():
             # Generate conversation_id for this pair
@@ -300,16 +645,15 @@ async def get_conversations(
                 sort=[("timestamp", -1)]
             )
             
-            # Count unread messages
-            unread = await db.chat_messages.count_documents({
-                "$or": [
+            # Count unread messages - newer than the user's read cursor
+            unread = await db.chat_messages.count_documents(unread_filter(
+                {"$or": [
                     {"conversation_id": conversation_id},
                     {"appointment_id": {"$in": [str(apt["_id"]) for apt in apts]}}
-                ],
-                "deleted": False,
-                "sender_id": {"$ne": user_id},
-                "read_by": {"$ne": user_id}
-            })
+                ]},
+                user_id,
+                read_cursors.get(conversation_id, {}).get(user_id)
+            ))
             
             # Get all appointment info for this conversation
             appointment_summaries = []
@@ -375,13 +719,11 @@ async def get_conversations(
         # Sort by timestamp (most recent first)
         conversations.sort(key=lambda x: x["last_message_time"] or "", reverse=True)
         
-        print(f"[CHAT] Returning {len(conversations)} consolidated conversations")
+        logger.debug(f"[CHAT] Returning {len(conversations)} consolidated conversations")
         return conversations
         
     except Exception as e:
-        print(f"Error in get_conversations: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error in get_conversations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -453,9 +795,9 @@ async def upload_file(
                 "createdAt": datetime.utcnow()
             }
             await db.medical_records.insert_one(medical_record)
-            print(f"[CHAT] Also saved file to medical records for patient {patient_id}")
+            logger.debug(f"[CHAT] Also saved file to medical records for patient {patient_id}")
         except Exception as e:
-            print(f"[CHAT] Warning: Could not save to medical records: {e}")
+            logger.warning(f"[CHAT] Could not save to medical records: {e}")
     
     # Get sender name
     try:
@@ -561,26 +903,49 @@ async def send_message(
 @router.put("/messages/{conversation_id}/read")
 async def mark_all_as_read(
     conversation_id: str,
+    through: Optional[str] = Query(None, description="Timestamp of the newest message seen (default: newest message)"),
     current_user = Depends(get_current_user_with_role)
 ):
-    """Mark all messages in a conversation as read"""
+    """Mark all messages in a conversation as read by moving the user's read cursor"""
     db = get_database()
     user_id = current_user.get("user_id")
     
-    # Update messages with conversation_id
-    result = await db.chat_messages.update_many(
-        {
-            "$or": [
-                {"conversation_id": conversation_id},
-                # Also support legacy appointment_id format
-                {"appointment_id": conversation_id}
-            ],
-            "read_by": {"$ne": user_id}
-        },
-        {"$addToSet": {"read_by": user_id}}
+    if not await is_participant(db, conversation_id, user_id):
+        raise HTTPException(status_code=403, detail="Access denied: You're not part of this conversation")
+    
+    if through is not None:
+        # Cursors are compared with message timestamps as strings - store them in the same naive UTC ISO format
+        try:
+            parsed = datetime.fromisoformat(through)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="through must be an ISO 8601 timestamp")
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        through = parsed.isoformat()
+    else:
+        latest = await db.chat_messages.find_one(
+            {
+                "$or": [
+                    {"conversation_id": conversation_id},
+                    # Also support legacy appointment_id format
+                    {"appointment_id": conversation_id}
+                ]
+            },
+            {"timestamp": 1},
+            sort=[("timestamp", -1)]
+        )
+        if not latest:
+            return {"modified_count": 0, "read_through": None}
+        through = latest["timestamp"]
+    
+    # One document write however long the conversation is; $max never moves a cursor back
+    result = await db.chat_conversations.update_one(
+        {"_id": conversation_id},
+        {"$max": {f"read_cursors.{user_id}": through}, "$set": {"updatedAt": datetime.utcnow()}},
+        upsert=True
     )
     
-    return {"modified_count": result.modified_count}
+    return {"modified_count": result.modified_count + (1 if result.upserted_id else 0), "read_through": through}
 
 
 # WhatsApp Integration (Twilio)
@@ -590,7 +955,7 @@ try:
     
     twilio_client = Client(settings.twilio_account_sid, settings.twilio_auth_token)
 except ImportError:
-    print("Twilio not installed. WhatsApp features will not work.")
+    logger.warning("Twilio not installed. WhatsApp features will not work.")
     twilio_client = None
 
 
@@ -795,5 +1160,5 @@ async def notify_chat_on_appointment_change(db, appointment_id: str, notificatio
         
         return await send_system_message(db, conversation_id, message_text, appointment_id)
     except Exception as e:
-        print(f"Error sending chat notification: {e}")
+        logger.error(f"Error sending chat notification: {e}")
         return None
@@ -5,6 +5,10 @@ from typing import List
 from database import get_database
 from schemas import DoctorCreate, DoctorUpdate, DoctorResponse
 from routes.auth import get_current_user, get_current_user_with_role
+from notification_service import notification_service
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/doctors", tags=["doctors"])
 
@@ -88,32 +92,30 @@ async def get_enrollment_status(current_user: str = Depends(get_current_user)):
 @router.put("/enroll-debug")
 async def enroll_debug(request: Request):
     """Debug endpoint without auth dependency"""
-    print(f"\n🧪 ENROLL DEBUG ENDPOINT CALLED", flush=True)
+    logger.debug("ENROLL DEBUG ENDPOINT CALLED")
     try:
         body = await request.body()
-        print(f"📦 Raw body length: {len(body)} bytes", flush=True)
-        print(f"📦 Raw body: {body[:500] if body else 'EMPTY'}", flush=True)
+        logger.debug(f"Raw body length: {len(body)} bytes")
+        logger.debug("Raw body: %s", body[:500] if body else "EMPTY")
         return {"status": "ok", "body_length": len(body), "body_preview": body[:200].decode() if body else "EMPTY"}
     except Exception as e:
-        print(f"❌ Debug endpoint error: {e}", flush=True)
+        logger.error(f"Debug endpoint error: {e}")
         return {"error": str(e)}
 
 @router.put("/enroll")
 async def enroll_doctor_profile(request: Request, current_user_info: dict = Depends(get_current_user_with_role)):
-    import sys
-    
-    print(f"\n🔄 DOCTOR ENROLLMENT API CALL STARTED", flush=True)
+    logger.debug("DOCTOR ENROLLMENT API CALL STARTED")
     
     user_id = current_user_info["user_id"]
     user_role = current_user_info["role"]
 
-    print(f"📋 User ID: {user_id} (Role: {user_role})", flush=True)
+    logger.debug(f"User ID: {user_id} (Role: {user_role})")
 
     try:
         # Get raw body first for debugging
         raw_body = await request.body()
-        print(f"📦 Raw body length: {len(raw_body)} bytes", flush=True)
-        print(f"📦 Raw body preview: {raw_body[:500] if raw_body else 'EMPTY'}", flush=True)
+        logger.debug("Raw body length: %d bytes", len(raw_body))
+        logger.debug("Raw body preview: %s", raw_body[:500] if raw_body else 'EMPTY')
         
         if not raw_body:
             raise HTTPException(status_code=400, detail="Request body is empty")
@@ -121,16 +123,16 @@ async def enroll_doctor_profile(request: Request, current_user_info: dict = Depe
         # Parse JSON
         import json
         doctor_data = json.loads(raw_body)
-        print(f"📝 Received Data Keys: {list(doctor_data.keys()) if doctor_data else 'None'}", flush=True)
-        print(f"📝 Received Data: {doctor_data}", flush=True)
-        sys.stdout.flush()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received Data Keys: %s", list(doctor_data.keys()) if doctor_data else 'None')
+            logger.debug("Received Data: %s", doctor_data)
     except json.JSONDecodeError as e:
-        print(f"❌ JSON DECODE ERROR: {e}", flush=True)
+        logger.error(f"JSON DECODE ERROR: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ FAILED TO PARSE REQUEST BODY: {e}", flush=True)
+        logger.error(f"FAILED TO PARSE REQUEST BODY: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid request body: {str(e)}")
 
     db = get_database()
@@ -138,10 +140,10 @@ async def enroll_doctor_profile(request: Request, current_user_info: dict = Depe
     # Get user info to populate name if creating new profile
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
-        print(f"❌ USER NOT FOUND: {user_id}")
+        logger.error(f"USER NOT FOUND: {user_id}")
         raise HTTPException(status_code=404, detail="User not found")
 
-    print(f"✅ USER FOUND: {user.get('name', 'Unknown')} ({user.get('userType', 'unknown')}")
+    logger.debug(f"USER FOUND: {user.get('name', 'Unknown')} ({user.get('userType', 'unknown')}")
 
     # Add the user's name to the data if not provided
     if "name" not in doctor_data or not doctor_data["name"]:
@@ -150,18 +152,19 @@ async def enroll_doctor_profile(request: Request, current_user_info: dict = Depe
     # Validate the data with our schema
     try:
         validated_data = DoctorUpdate(**doctor_data)
-        print(f"✅ DoctorUpdate validation PASSED")
+        logger.debug("DoctorUpdate validation PASSED")
     except Exception as e:
-        print(f"❌ DoctorUpdate validation FAILED: {e}")
+        logger.error(f"DoctorUpdate validation FAILED: {e}")
         raise HTTPException(status_code=422, detail=str(e))
 
     # Check if doctor profile exists
     existing_doctor = await db.doctors.find_one({"user_id": user_id})
-    print(f"🔍 EXISTING DOCTOR PROFILE: {'Found' if existing_doctor else 'Not Found'}")
+    logger.debug(f"EXISTING DOCTOR PROFILE: {'Found' if existing_doctor else 'Not Found'}")
 
     update_dict = {k: v for k, v in doctor_data.items() if v is not None}
-    print(f"🔧 PROCESSED UPDATE DATA: {update_dict}")
-    print(f"📋 ALL FIELDS FROM REQUEST: {list(update_dict.keys())}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("PROCESSED UPDATE DATA: %s", update_dict)
+        logger.debug("ALL FIELDS FROM REQUEST: %s", list(update_dict.keys()))
 
     # Convert string numbers to integers
     if "experience_years" in update_dict and isinstance(update_dict["experience_years"], str):
@@ -197,7 +200,7 @@ async def enroll_doctor_profile(request: Request, current_user_info: dict = Depe
             update_dict["available_days"] = days
 
     hospital_id = update_dict.get("hospital_id")
-    print(f"🏥 HOSPITAL ID: {hospital_id}")
+    logger.debug(f"HOSPITAL ID: {hospital_id}")
 
     # Check if doctor is switching hospitals
     previous_hospital = None
@@ -209,60 +212,51 @@ async def enroll_doctor_profile(request: Request, current_user_info: dict = Depe
             is_switching_hospitals = True
             previous_hospital = await db.hospitals.find_one({"_id": ObjectId(existing_doctor.get("hospital_id"))})
             previous_hospital_name = previous_hospital.get("name") if previous_hospital else "Previous Hospital"
-            print(f"🔄 HOSPITAL SWITCH DETECTED: {previous_hospital_name} -> new hospital")
+            logger.debug(f"HOSPITAL SWITCH DETECTED: {previous_hospital_name} -> new hospital")
 
     if hospital_id:
         # Validate hospital exists
         hospital = await db.hospitals.find_one({"_id": ObjectId(hospital_id)})
         if not hospital:
-            print(f"❌ HOSPITAL NOT FOUND: {hospital_id}")
+            logger.error(f"HOSPITAL NOT FOUND: {hospital_id}")
             raise HTTPException(status_code=404, detail="Hospital not found")
-        print(f"✅ HOSPITAL FOUND: {hospital.get('name', 'Unknown')}")
+        logger.debug(f"HOSPITAL FOUND: {hospital.get('name', 'Unknown')}")
 
     # Set enrollment timestamp and status
     update_dict["enrolledAt"] = datetime.utcnow()
     update_dict["verified"] = False  # Requires admin verification
     update_dict["is_active"] = False  # Not active until verified
     update_dict["user_id"] = user_id
+    update_dict["updatedAt"] = datetime.utcnow()
 
     # If switching hospitals, send unenrollment notifications BEFORE updating
     if is_switching_hospitals:
-        print(f"📨 SENDING UNENROLLMENT NOTIFICATIONS for hospital switch")
+        logger.debug("SENDING UNENROLLMENT NOTIFICATIONS for hospital switch")
         
         # Send unenrollment notification to doctor
-        unenroll_doctor_notification = {
-            "user_id": user_id,
-            "user_type": "doctor",
-            "type": "hospital_unenrollment",
-            "title": "🏥 Hospital Unenrollment",
-            "message": f"You have been unenrolled from {previous_hospital_name}. Your enrollment at {hospital.get('name', 'the new hospital')} is now pending verification.",
-            "read": False,
-            "createdAt": datetime.utcnow()
-        }
-        await db.notifications.insert_one(unenroll_doctor_notification)
-        print(f"📨 UNENROLLMENT NOTIFICATION SENT TO DOCTOR")
-        
-        # Send unenrollment notification to all clinical admins
-        admin_users = await db.users.find({"userType": "clinical_admin"}).to_list(length=100)
-        for admin in admin_users:
-            unenroll_admin_notification = {
-                "user_id": str(admin["_id"]),
-                "user_type": "clinical_admin",
-                "type": "doctor_hospital_switch",
-                "title": "🔄 Doctor Hospital Switch",
-                "message": f"Dr. {user.get('name', 'Unknown')} has unenrolled from {previous_hospital_name} and is now enrolling at {hospital.get('name', 'a new hospital')}. New verification required.",
-                "read": False,
-                "createdAt": datetime.utcnow(),
-                "doctor_id": str(existing_doctor["_id"]),
-                "previous_hospital_id": existing_doctor.get("hospital_id"),
-                "new_hospital_id": hospital_id
-            }
-            await db.notifications.insert_one(unenroll_admin_notification)
-            print(f"📨 UNENROLLMENT NOTIFICATION SENT TO ADMIN: {admin.get('name', 'Unknown')}")
+        await notification_service.send(
+            db, user_id, "doctor",
+            "🏥 Hospital Unenrollment",
+            f"You have been unenrolled from {previous_hospital_name}. Your enrollment at {hospital.get('name', 'the new hospital')} is now pending verification.",
+            "hospital_unenrollment"
+        )
+        logger.debug("UNENROLLMENT NOTIFICATION SENT TO DOCTOR")
+
+        # Send unenrollment notification to all clinical admins in one write
+        admins_notified = await notification_service.broadcast(
+            db, "clinical_admin",
+            "🔄 Doctor Hospital Switch",
+            f"Dr. {user.get('name', 'Unknown')} has unenrolled from {previous_hospital_name} and is now enrolling at {hospital.get('name', 'a new hospital')}. New verification required.",
+            "doctor_hospital_switch",
+            doctor_id=str(existing_doctor["_id"]),
+            previous_hospital_id=existing_doctor.get("hospital_id"),
+            new_hospital_id=hospital_id
+        )
+        logger.debug(f"UNENROLLMENT NOTIFICATION SENT TO {admins_notified} ADMINS")
 
     if existing_doctor:
         # Update existing profile
-        print(f"🔄 UPDATING EXISTING DOCTOR PROFILE")
+        logger.debug("UPDATING EXISTING DOCTOR PROFILE")
         result = await db.doctors.update_one(
             {"_id": existing_doctor["_id"]},
             {"$set": update_dict}
@@ -270,46 +264,36 @@ async def enroll_doctor_profile(request: Request, current_user_info: dict = Depe
         doctor = await db.doctors.find_one({"_id": existing_doctor["_id"]})
     else:
         # Create new profile
-        print(f"✨ CREATING NEW DOCTOR PROFILE")
+        logger.debug("CREATING NEW DOCTOR PROFILE")
         result = await db.doctors.insert_one(update_dict)
         doctor = await db.doctors.find_one({"_id": result.inserted_id})
 
     # Also update user's type to doctor and set verified status
     await db.users.update_one(
         {"_id": ObjectId(user_id)},
-        {"$set": {"userType": "doctor", "doctorVerified": False}}
+        {"$set": {"userType": "doctor", "doctorVerified": False, "updatedAt": datetime.utcnow()}}
     )
-    print(f"✅ USER TYPE UPDATED TO DOCTOR")
+    logger.debug("USER TYPE UPDATED TO DOCTOR")
 
     # Send notification to doctor about pending verification
-    doctor_notification = {
-        "user_id": user_id,
-        "user_type": "doctor",
-        "type": "verification_pending",
-        "title": "⏳ Profile Pending Verification",
-        "message": f"Your doctor profile at {hospital.get('name', 'the hospital') if hospital_id else 'the platform'} is pending verification by our Clinical Admin team. You'll receive a notification once approved.",
-        "read": False,
-        "createdAt": datetime.utcnow()
-    }
-    await db.notifications.insert_one(doctor_notification)
-    print(f"📨 NOTIFICATION SENT TO DOCTOR: Pending Verification")
-
-    # Send notification to all clinical admins
-    admin_users = await db.users.find({"userType": "clinical_admin"}).to_list(length=100)
-    for admin in admin_users:
-        admin_notification = {
-            "user_id": str(admin["_id"]),
-            "user_type": "clinical_admin",
-            "type": "new_doctor_enrollment",
-            "title": "🩺 New Doctor Enrollment",
-            "message": f"Dr. {user.get('name', 'Unknown')} has enrolled at {hospital.get('name', 'a hospital') if hospital_id else 'the platform'} and is awaiting verification.",
-            "read": False,
-            "createdAt": datetime.utcnow(),
-            "doctor_id": str(doctor["_id"]),
-            "hospital_id": hospital_id
-        }
-        await db.notifications.insert_one(admin_notification)
-        print(f"📨 NOTIFICATION SENT TO ADMIN: {admin.get('name', 'Unknown')}")
+    await notification_service.send(
+        db, user_id, "doctor",
+        "⏳ Profile Pending Verification",
+        f"Your doctor profile at {hospital.get('name', 'the hospital') if hospital_id else 'the platform'} is pending verification by our Clinical Admin team. You'll receive a notification once approved.",
+        "verification_pending"
+    )
+    logger.debug("NOTIFICATION SENT TO DOCTOR: Pending Verification")
+
+    # Send notification to all clinical admins in one write
+    admins_notified = await notification_service.broadcast(
+        db, "clinical_admin",
+        "🩺 New Doctor Enrollment",
+        f"Dr. {user.get('name', 'Unknown')} has enrolled at {hospital.get('name', 'a hospital') if hospital_id else 'the platform'} and is awaiting verification.",
+        "new_doctor_enrollment",
+        doctor_id=str(doctor["_id"]),
+        hospital_id=hospital_id
+    )
+    logger.debug(f"NOTIFICATION SENT TO {admins_notified} ADMINS")
 
     # Create a verification record in doctor_verifications collection
     verification_record = {
@@ -323,7 +307,7 @@ async def enroll_doctor_profile(request: Request, current_user_info: dict = Depe
         "license_number": update_dict.get("license_number", "")
     }
     await db.doctor_verifications.insert_one(verification_record)
-    print(f"📋 VERIFICATION RECORD CREATED in doctor_verifications")
+    logger.debug("VERIFICATION RECORD CREATED in doctor_verifications")
 
     # Also create a record in background_verifications (used by admin panel)
     background_verification = {
@@ -337,7 +321,7 @@ async def enroll_doctor_profile(request: Request, current_user_info: dict = Depe
         "updatedAt": datetime.utcnow()
     }
     await db.background_verifications.insert_one(background_verification)
-    print(f"📋 BACKGROUND VERIFICATION RECORD CREATED")
+    logger.debug("BACKGROUND VERIFICATION RECORD CREATED")
 
     doctor["_id"] = str(doctor["_id"])
 
@@ -345,10 +329,10 @@ async def enroll_doctor_profile(request: Request, current_user_info: dict = Depe
     if doctor and "qualifications" in doctor and isinstance(doctor["qualifications"], str):
         doctor["qualifications"] = [q.strip() for q in doctor["qualifications"].replace("\n", ",").split(",") if q.strip()]
 
-    print(f"✅ DOCTOR ENROLLMENT COMPLETE!")
+    logger.info("DOCTOR ENROLLMENT COMPLETE!")
 
     response = DoctorResponse(**doctor)
-    print(f"📤 Returning response: {response}")
+    logger.debug("Returning response: %s", response)
 
     return response
 
@@ -379,7 +363,7 @@ async def update_doctor(doctor_id: str, doctor_data: DoctorCreate, current_user:
     try:
         result = await db.doctors.update_one(
             {"_id": ObjectId(doctor_id)},
-            {"$set": {k: v for k, v in doctor_data.dict().items() if v is not None}}
+            {"$set": {**{k: v for k, v in doctor_data.dict().items() if v is not None}, "updatedAt": datetime.utcnow()}}
         )
     except:
         raise HTTPException(status_code=400, detail="Invalid doctor ID")
@@ -466,14 +450,14 @@ async def test_enroll_endpoint(request: Request):
     """Simple test endpoint to debug enrollment issues"""
     try:
         body = await request.body()
-        print(f"\n🧪 TEST ENDPOINT CALLED", flush=True)
-        print(f"📦 Raw body: {body}", flush=True)
+        logger.debug("TEST ENDPOINT CALLED")
+        logger.debug("Raw body: %s", body)
 
         data = await request.json()
-        print(f"📝 Parsed JSON: {data}", flush=True)
-        print(f"📋 Data keys: {list(data.keys()) if data else 'None'}", flush=True)
+        logger.debug("Parsed JSON: %s", data)
+        logger.debug("Data keys: %s", list(data.keys()) if data else 'None')
 
         return {"status": "received", "data_keys": list(data.keys()) if data else [], "data": data}
     except Exception as e:
-        print(f"❌ Test endpoint error: {e}", flush=True)
+        logger.error(f"Test endpoint error: {e}")
         return {"error": str(e)}
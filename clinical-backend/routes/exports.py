@@ -0,0 +1,198 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from bson import ObjectId
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional
+from database import get_database
+from schemas import UserResponse, DoctorResponse, AppointmentResponse
+from routes.admin import require_admin
+from crypto_service import crypto_service, encrypted_fields
+from config import settings
+import csv
+import io
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/exports", tags=["admin-exports"])
+
+
+@dataclass
+class ExportSpec:
+    collection: str
+    fields: List[str]  # Exportable fields, in default column order
+    date_field: str  # Field filtered by start/end
+    filters: Dict[str, str] = field(default_factory=dict)  # query parameter -> document field
+    encrypted: List[str] = field(default_factory=list)
+
+
+def _model_fields(model) -> List[str]:
+    """Exportable document fields of a response model (id alias -> _id)"""
+    return [info.alias or name for name, info in model.model_fields.items()]
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    "users": ExportSpec(
+        collection="users",
+        fields=_model_fields(UserResponse),
+        date_field="createdAt",
+        filters={"user_type": "userType"}
+    ),
+    "doctors": ExportSpec(
+        collection="doctors",
+        fields=_model_fields(DoctorResponse),
+        date_field="createdAt",
+        filters={"hospital_id": "hospital_id", "verified": "verified"}
+    ),
+    "appointments": ExportSpec(
+        collection="appointments",
+        fields=[f for f in _model_fields(AppointmentResponse) if f in (
+            "_id", "patient_id", "doctor_id", "hospital_id", "appointment_date", "status", "notes", "createdAt"
+        )] + ["has_feedback", "feedback_rating"],
+        date_field="appointment_date",
+        filters={"status": "status", "hospital_id": "hospital_id", "doctor_id": "doctor_id", "patient_id": "patient_id"},
+        encrypted=encrypted_fields(AppointmentResponse)
+    ),
+    "feedback": ExportSpec(
+        collection="feedbacks",
+        fields=["_id", "appointment_id", "patient_id", "patient_name", "doctor_id", "doctor_name",
+                "rating", "feedback", "created_at"],
+        date_field="created_at",
+        filters={"doctor_id": "doctor_id", "patient_id": "patient_id"}
+    ),
+}
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Leading characters spreadsheets evaluate as a formula (CSV injection)
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _plain(value):
+    """Mongo value -> JSON-compatible value"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _csv_cell(value):
+    """CSV cell value; text a spreadsheet would run as a formula is quoted with '"""
+    value = _plain(value)
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return "" if value is None else value
+
+
+def _encode(documents: List[dict], fields: List[str], export_format: str) -> str:
+    if export_format == "ndjson":
+        return "".join(json.dumps({f: _plain(doc.get(f)) for f in fields}) + "\n" for doc in documents)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_cell(doc.get(f)) for f in fields] for doc in documents)
+    return buffer.getvalue()
+
+
+async def _stream_export(cursor, spec: ExportSpec, fields: List[str], export_format: str, label: str) -> AsyncIterator[str]:
+    """Encode the cursor batch by batch - at most one batch is held in memory"""
+    if export_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(fields)
+        yield buffer.getvalue()
+
+    decrypt = [f for f in spec.encrypted if f in fields]
+    batch_size = settings.export_batch_size
+    batch = []
+    exported = 0
+    try:
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                if decrypt:
+                    await crypto_service.decrypt_records(batch, decrypt)
+                yield _encode(batch, fields, export_format)
+                exported += len(batch)
+                batch = []
+        if batch:
+            if decrypt:
+                await crypto_service.decrypt_records(batch, decrypt)
+            yield _encode(batch, fields, export_format)
+            exported += len(batch)
+    except Exception:
+        # Headers are already sent - the truncated file is the only signal the client gets
+        logger.exception(f"Export {label} failed after {exported} documents")
+        raise
+    finally:
+        await cursor.close()
+    logger.info(f"Export {label} finished: {exported} documents")
+
+
+@router.get("/{entity}")
+async def export_entity(
+    entity: str,
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields (default: all exportable fields)"),
+    start: Optional[date] = Query(None, description="Only documents on/after this date"),
+    end: Optional[date] = Query(None, description="Only documents on/before this date"),
+    user_type: Optional[str] = None,
+    hospital_id: Optional[str] = None,
+    doctor_id: Optional[str] = None,
+    patient_id: Optional[str] = None,
+    status: Optional[str] = None,
+    verified: Optional[bool] = None,
+    current_user: str = Depends(require_admin)
+):
+    """Stream users, doctors, appointments or feedback as CSV or NDJSON"""
+    spec = EXPORTS.get(entity)
+    if not spec:
+        raise HTTPException(status_code=404, detail=f"Unknown export {entity}. Available: {', '.join(EXPORTS)}")
+
+    selected = spec.fields
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in spec.fields]
+        if unknown or not selected:
+            raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}. Exportable: {', '.join(spec.fields)}")
+
+    values = {
+        "user_type": user_type, "hospital_id": hospital_id, "doctor_id": doctor_id,
+        "patient_id": patient_id, "status": status, "verified": verified
+    }
+    query = {}
+    for param, value in values.items():
+        if value is None:
+            continue
+        if param not in spec.filters:
+            raise HTTPException(status_code=400, detail=f"{entity} export cannot be filtered by {param}")
+        query[spec.filters[param]] = value
+    if start or end:
+        date_range = {}
+        if start:
+            date_range["$gte"] = datetime.combine(start, datetime.min.time())
+        if end:
+            date_range["$lt"] = datetime.combine(end + timedelta(days=1), datetime.min.time())
+        query[spec.date_field] = date_range
+
+    db = get_database()
+    projection = {f: 1 for f in selected}
+    if "_id" not in selected:
+        projection["_id"] = 0
+    cursor = db[spec.collection].find(query, projection).sort("_id", 1).batch_size(settings.export_batch_size)
+
+    label = f"{entity}.{export_format} by {current_user}"
+    logger.info(f"Export {label} started (filters: {query}, fields: {selected})")
+    filename = f"{entity}-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+    return StreamingResponse(
+        _stream_export(cursor, spec, selected, export_format, label),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
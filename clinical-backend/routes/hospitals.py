@@ -5,6 +5,9 @@ from typing import List
 from database import get_database
 from schemas import HospitalCreate, HospitalResponse
 from routes.auth import get_current_user
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/hospitals", tags=["hospitals"])
 
@@ -37,7 +40,7 @@ async def list_hospitals():
             "verified": True,
             "is_active": True
         }).to_list(length=50)
-        print(f"DEBUG: Found {len(doctors)} verified doctors for hospital {hospital_id}")
+        logger.debug(f"Found {len(doctors)} verified doctors for hospital {hospital_id}")
         hospital["doctors"] = []
 
         for doctor in doctors:
@@ -48,12 +51,9 @@ async def list_hospitals():
                 "status": "Available",  # Default status
                 "specialization": doctor.get("specialization", "")
             })
-            print(f"DEBUG: Added doctor {doctor['name']} (user_id: {doctor.get('user_id')}) to hospital {hospital['name']}")
 
     result = [HospitalResponse(**h) for h in hospitals]
-    print(f"DEBUG: Returning {len(result)} hospitals")
-    for i, h in enumerate(result):
-        print(f"DEBUG: Hospital {i}: {h.name}, doctors: {len(h.doctors) if hasattr(h, 'doctors') and h.doctors else 0}")
+    logger.debug(f"Returning {len(result)} hospitals")
 
     return result
 
@@ -79,7 +79,7 @@ async def update_hospital(hospital_id: str, hospital_data: HospitalCreate, curre
     try:
         result = await db.hospitals.update_one(
             {"_id": ObjectId(hospital_id)},
-            {"$set": hospital_data.dict()}
+            {"$set": {**hospital_data.dict(), "updatedAt": datetime.utcnow()}}
         )
     except:
         raise HTTPException(status_code=400, detail="Invalid hospital ID")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query
 from fastapi.responses import FileResponse
 from bson import ObjectId
 from datetime import datetime
@@ -9,9 +9,16 @@ from database import get_database
 from schemas import MedicalRecordCreate, MedicalRecordResponse
 from routes.auth import get_current_user, get_current_user_with_role
 from auth import encrypt_data, decrypt_data
+from crypto_service import crypto_service, encrypted_fields, read_projection
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/medical-records", tags=["medical-records"])
 
+# Fields stored encrypted in medical_records (marked in schemas.py)
+ENCRYPTED_FIELDS = encrypted_fields(MedicalRecordResponse)
+
 # Create uploads directory for medical records
 UPLOAD_DIR = "./uploads/medical_records"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -95,7 +102,11 @@ async def download_medical_file(patient_id: str, file_name: str, current_user =
     return FileResponse(file_path)
 
 @router.get("/by-appointment/{appointment_id}")
-async def get_medical_records_by_appointment(appointment_id: str, current_user = Depends(get_current_user_with_role)):
+async def get_medical_records_by_appointment(
+    appointment_id: str,
+    include_encrypted: bool = Query(True, description="Include encrypted description/notes"),
+    current_user = Depends(get_current_user_with_role)
+):
     """Get medical records attached to a specific appointment - for doctors to view patient documents"""
     db = get_database()
     user_id = current_user.get("user_id")
@@ -118,18 +129,19 @@ async def get_medical_records_by_appointment(appointment_id: str, current_user =
         raise HTTPException(status_code=403, detail="Access denied - not authorized for this appointment")
     
     # Find medical records linked to this appointment
-    records = await db.medical_records.find({"appointment_id": appointment_id}).to_list(length=100)
+    records = await db.medical_records.find(
+        {"appointment_id": appointment_id},
+        read_projection(MedicalRecordResponse, include_encrypted)
+    ).to_list(length=100)
     
+    # Decrypt sensitive data for the whole page at once
+    if include_encrypted:
+        await crypto_service.decrypt_records(records, ENCRYPTED_FIELDS)
+
     result = []
     for record in records:
         record["_id"] = str(record["_id"])
         record["id"] = record["_id"]
-        # Decrypt sensitive data
-        if record.get("description"):
-            try:
-                record["description"] = decrypt_data(record["description"])
-            except:
-                pass
         result.append(record)
     
     return result
@@ -154,17 +166,16 @@ async def create_medical_record(record_data: MedicalRecordCreate, user_info = De
     result = await db.medical_records.insert_one(record_doc)
     record_doc["_id"] = str(result.inserted_id)
 
-    # Decrypt for response
-    if record_doc.get("description"):
-        record_doc["description"] = decrypt_data(record_doc["description"])
-    if record_doc.get("doctor_notes"):
-        record_doc["doctor_notes"] = decrypt_data(record_doc["doctor_notes"])
-
+    # Encrypted fields are decrypted by MedicalRecordResponse when serialized
     return MedicalRecordResponse(**record_doc)
 
 @router.get("/", response_model=List[MedicalRecordResponse])
-async def list_medical_records(user_info = Depends(get_current_user_with_role)):
+async def list_medical_records(
+    include_encrypted: bool = Query(True, description="Include encrypted description/notes - set false for views that don't show them"),
+    user_info = Depends(get_current_user_with_role)
+):
     db = get_database()
+    projection = read_projection(MedicalRecordResponse, include_encrypted)
 
     if user_info["role"] == "doctor":
         # Doctors can see all medical records for patients they have appointments with
@@ -173,7 +184,7 @@ async def list_medical_records(user_info = Depends(get_current_user_with_role)):
         appointments = await db.appointments.find({"doctor_id": {"$in": doctor_ids}}).to_list(length=1000)
         patient_ids = list(set([str(appt["patient_id"]) for appt in appointments]))
 
-        records = await db.medical_records.find({"patient_id": {"$in": patient_ids}}).to_list(length=100)
+        records = await db.medical_records.find({"patient_id": {"$in": patient_ids}}, projection).to_list(length=100)
         
         # Get patient names for doctors view
         patient_names = {}
@@ -189,21 +200,14 @@ async def list_medical_records(user_info = Depends(get_current_user_with_role)):
             record["patient_name"] = patient_names.get(record.get("patient_id"), "Unknown Patient")
     else:
         # Users can only see their own medical records
-        records = await db.medical_records.find({"patient_id": user_info["user_id"]}).to_list(length=100)
+        records = await db.medical_records.find({"patient_id": user_info["user_id"]}, projection).to_list(length=100)
+
+    # Decrypt sensitive data for the whole page at once (skipped when projected out)
+    if include_encrypted:
+        await crypto_service.decrypt_records(records, ENCRYPTED_FIELDS)
 
     for record in records:
         record["_id"] = str(record["_id"])
-        # Decrypt sensitive data
-        if record.get("description"):
-            try:
-                record["description"] = decrypt_data(record["description"])
-            except:
-                pass
-        if record.get("doctor_notes"):
-            try:
-                record["doctor_notes"] = decrypt_data(record["doctor_notes"])
-            except:
-                pass
 
     return [MedicalRecordResponse(**r) for r in records]
 
@@ -240,12 +244,7 @@ async def get_medical_record(record_id: str, user_info = Depends(get_current_use
             raise HTTPException(status_code=403, detail="Cannot access this medical record")
 
     record["_id"] = str(record["_id"])
-    # Decrypt sensitive data
-    if record.get("description"):
-        record["description"] = decrypt_data(record["description"])
-    if record.get("doctor_notes"):
-        record["doctor_notes"] = decrypt_data(record["doctor_notes"])
-
+    # Encrypted fields are decrypted by MedicalRecordResponse when serialized
     return MedicalRecordResponse(**record)
 
 @router.put("/{record_id}", response_model=MedicalRecordResponse)
@@ -281,6 +280,7 @@ async def update_medical_record(record_id: str, record_data: MedicalRecordCreate
             update_dict["description"] = encrypt_data(update_dict["description"])
         if "doctor_notes" in update_dict and update_dict["doctor_notes"]:
             update_dict["doctor_notes"] = encrypt_data(update_dict["doctor_notes"])
+        update_dict["updatedAt"] = datetime.utcnow()
 
         result = await db.medical_records.update_one(
             {"_id": ObjectId(record_id)},
@@ -294,12 +294,6 @@ async def update_medical_record(record_id: str, record_data: MedicalRecordCreate
 
     record = await db.medical_records.find_one({"_id": ObjectId(record_id)})
     record["_id"] = str(record["_id"])
-    # Decrypt for response
-    if record.get("description"):
-        record["description"] = decrypt_data(record["description"])
-    if record.get("doctor_notes"):
-        record["doctor_notes"] = decrypt_data(record["doctor_notes"])
-
     return MedicalRecordResponse(**record)
 
 @router.delete("/{record_id}")
@@ -342,7 +336,7 @@ async def delete_medical_record(record_id: str, user_info = Depends(get_current_
                 if os.path.exists(file_full_path):
                     os.remove(file_full_path)
         except Exception as e:
-            print(f"Warning: Could not delete file: {e}")
+            logger.warning(f"Could not delete file: {e}")
 
     try:
         result = await db.medical_records.delete_one({"_id": ObjectId(record_id)})
@@ -1,33 +1,75 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from bson import ObjectId
-from datetime import datetime
 from typing import List
 from database import get_database
 from routes.auth import get_current_user_with_role
+from schemas import NotificationBulkReadRequest, NotificationCounts
+from notification_service import notification_service
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
+def _counts(counter: dict, **extra) -> NotificationCounts:
+    return NotificationCounts(
+        unread=max(counter["unread"], 0),
+        latest_id=str(counter["latest"]) if counter["latest"] else None,
+        version=counter["version"],
+        **extra
+    )
+
+@router.get("/unread-count", response_model=NotificationCounts)
+async def get_unread_count(user_info = Depends(get_current_user_with_role)):
+    """Badge count for the current user - a single counter lookup"""
+    db = get_database()
+
+    counter = await notification_service.get_counter(db, user_info["user_id"], user_info["role"])
+
+    return _counts(counter)
+
+@router.put("/read", response_model=NotificationCounts)
+async def mark_notifications_read(request: NotificationBulkReadRequest, user_info = Depends(get_current_user_with_role)):
+    """Mark several notifications read in one request: by ids, everything up to `before`, or all"""
+    db = get_database()
+
+    try:
+        ids = [ObjectId(i) for i in request.ids] if request.ids is not None else None
+        before = ObjectId(request.before) if request.before else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid notification ID")
+
+    updated = await notification_service.mark_many_read(db, user_info["user_id"], user_info["role"], ids, before)
+    counter = await notification_service.get_counter(db, user_info["user_id"], user_info["role"])
+
+    return _counts(counter, updated=updated)
+
 @router.get("/", response_model=List[dict])
-async def get_notifications(user_info = Depends(get_current_user_with_role)):
-    """Get notifications for the current user"""
+async def get_notifications(request: Request, response: Response, user_info = Depends(get_current_user_with_role)):
+    """Get notifications for the current user (304 when unchanged since If-None-Match)"""
     db = get_database()
 
-    print(f"🔔 FETCHING NOTIFICATIONS for user_id: {user_info['user_id']}, role: {user_info['role']}")
-    
-    # Get notifications for this user
-    notifications = await db.notifications.find({
-        "user_id": user_info["user_id"],
-        "user_type": user_info["role"]
-    }).sort("createdAt", -1).to_list(length=50)
+    counter = await notification_service.get_counter(db, user_info["user_id"], user_info["role"])
+    etag = notification_service.etag(counter)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+
+    logger.debug(f"FETCHING NOTIFICATIONS for user_id: {user_info['user_id']}, role: {user_info['role']}")
+
+    # Get notifications for this user, including broadcasts to their role
+    notifications = await db.notifications.find(
+        notification_service.visible_to(user_info["user_id"], user_info["role"])
+    ).sort("createdAt", -1).to_list(length=50)
+
+    logger.debug(f"FOUND {len(notifications)} notifications")
 
-    print(f"🔔 FOUND {len(notifications)} notifications")
-    
     # Convert ObjectId to string for JSON response
     for notification in notifications:
+        notification_service.for_user(notification, user_info["user_id"])
         notification["_id"] = str(notification["_id"])
         notification["id"] = str(notification["_id"])
-        # Log each notification including appointmentId for debugging
-        print(f"   📌 Notification: title={notification.get('title')}, appointmentId={notification.get('appointmentId', 'NONE')}")
 
     return notifications
 
@@ -37,16 +79,11 @@ async def mark_notification_read(notification_id: str, user_info = Depends(get_c
     db = get_database()
 
     try:
-        result = await db.notifications.update_one(
-            {
-                "_id": ObjectId(notification_id),
-                "user_id": user_info["user_id"],
-                "user_type": user_info["role"]
-            },
-            {"$set": {"read": True}}
+        found = await notification_service.mark_read(
+            db, ObjectId(notification_id), user_info["user_id"], user_info["role"]
         )
 
-        if result.matched_count == 0:
+        if not found:
             raise HTTPException(status_code=404, detail="Notification not found")
 
         return {"message": "Notification marked as read"}
@@ -60,13 +97,11 @@ async def delete_notification(notification_id: str, user_info = Depends(get_curr
     db = get_database()
 
     try:
-        result = await db.notifications.delete_one({
-            "_id": ObjectId(notification_id),
-            "user_id": user_info["user_id"],
-            "user_type": user_info["role"]
-        })
+        found = await notification_service.delete(
+            db, ObjectId(notification_id), user_info["user_id"], user_info["role"]
+        )
 
-        if result.deleted_count == 0:
+        if not found:
             raise HTTPException(status_code=404, detail="Notification not found")
 
         return {"message": "Notification deleted"}
@@ -79,27 +114,12 @@ async def clear_all_notifications(user_info = Depends(get_current_user_with_role
     """Clear all notifications for the current user"""
     db = get_database()
 
-    result = await db.notifications.delete_many({
-        "user_id": user_info["user_id"],
-        "user_type": user_info["role"]
-    })
+    cleared = await notification_service.clear(db, user_info["user_id"], user_info["role"])
 
-    return {"message": f"Cleared {result.deleted_count} notifications"}
+    return {"message": f"Cleared {cleared} notifications"}
 
 async def create_notification(db, user_id: str, user_type: str, title: str, message: str, notification_type: str = "general", appointment_id: str = None):
     """Helper function to create a notification"""
-    notification = {
-        "user_id": user_id,
-        "user_type": user_type,
-        "title": title,
-        "message": message,
-        "type": notification_type,
-        "read": False,
-        "createdAt": datetime.utcnow()
-    }
-    
-    if appointment_id:
-        notification["appointmentId"] = appointment_id
-
-    result = await db.notifications.insert_one(notification)
-    return str(result.inserted_id)
+    return await notification_service.send(
+        db, user_id, user_type, title, message, notification_type, appointmentId=appointment_id
+    )
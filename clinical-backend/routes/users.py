@@ -4,6 +4,10 @@ from datetime import datetime
 from database import get_database
 from schemas import UserResponse, UserUpdate
 from routes.auth import get_current_user
+from password_service import password_service
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -26,7 +30,7 @@ async def get_current_user_profile(current_user: str = Depends(get_current_user)
     if user.get("userType") == "doctor":
         doctor = await db.doctors.find_one({"user_id": current_user})
         if doctor:
-            print(f"[DEBUG] Found doctor profile: {doctor}")
+            logger.debug("Found doctor profile: %s", doctor)
             # Merge doctor fields into user response
             user["specialization"] = doctor.get("specialization")
             # Ensure qualification is always a string (convert array to comma-separated)
@@ -55,7 +59,7 @@ async def get_current_user_profile(current_user: str = Depends(get_current_user)
                     hospital = await db.hospitals.find_one({"_id": ObjectId(hospital_id)})
                     if hospital:
                         user["hospital_name"] = hospital.get("name")
-                        print(f"[DEBUG] Found hospital: {hospital.get('name')}")
+                        logger.debug(f"Found hospital: {hospital.get('name')}")
                     else:
                         user["hospital_name"] = None
                 except:
@@ -63,7 +67,7 @@ async def get_current_user_profile(current_user: str = Depends(get_current_user)
             else:
                 user["hospital_name"] = None
     
-    print(f"[DEBUG] GET /me - Returning user: {user}")
+    logger.debug("GET /me - Returning user: %s", user)
     return user
 
 @router.put("/me")
@@ -71,7 +75,8 @@ async def update_current_user_profile(user_data: UserUpdate, current_user: str =
     """Update the current logged-in user's profile"""
     db = get_database()
     
-    print(f"[DEBUG] Updating user {current_user} with data: {user_data.model_dump()}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Updating user %s with data: %s", current_user, user_data.model_dump())
     
     # Use model_dump to get all fields, then filter out None values
     data = user_data.model_dump(exclude_none=True)
@@ -88,8 +93,7 @@ async def update_current_user_profile(user_data: UserUpdate, current_user: str =
     for field in user_fields:
         if field in data and data[field] is not None:
             if field == 'password':
-                from auth import hash_password
-                user_update['password'] = hash_password(data[field])
+                user_update['password'] = await password_service.hash_async(data[field])
             else:
                 user_update[field] = data[field]
     
@@ -100,7 +104,7 @@ async def update_current_user_profile(user_data: UserUpdate, current_user: str =
             {"_id": ObjectId(current_user)},
             {"$set": user_update}
         )
-        print(f"[DEBUG] User update result - matched: {result.matched_count}, modified: {result.modified_count}")
+        logger.debug(f"User update result - matched: {result.matched_count}, modified: {result.modified_count}")
     
     # Check if user is a doctor and update doctor collection
     user = await db.users.find_one({"_id": ObjectId(current_user)})
@@ -118,7 +122,7 @@ async def update_current_user_profile(user_data: UserUpdate, current_user: str =
                 {"$set": doctor_update},
                 upsert=True
             )
-            print(f"[DEBUG] Doctor update result - matched: {doctor_result.matched_count}, modified: {doctor_result.modified_count}")
+            logger.debug(f"Doctor update result - matched: {doctor_result.matched_count}, modified: {doctor_result.modified_count}")
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -148,7 +152,7 @@ async def update_current_user_profile(user_data: UserUpdate, current_user: str =
             user["available_time_end"] = doctor.get("available_time_end")
             user["languages"] = doctor.get("languages")
     
-    print(f"[DEBUG] Returning user after update: {user}")
+    logger.debug("Returning user after update: %s", user)
     return user
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -181,11 +185,11 @@ async def update_user(user_id: str, user_data: UserUpdate, current_user: str = D
     if user_data.mobile:
         update_dict["mobile"] = user_data.mobile
     if user_data.password:
-        from auth import hash_password
-        update_dict["password"] = hash_password(user_data.password)
+        update_dict["password"] = await password_service.hash_async(user_data.password)
     
     if not update_dict:
         raise HTTPException(status_code=400, detail="No fields to update")
+    update_dict["updatedAt"] = datetime.utcnow()
     
     result = await db.users.update_one(
         {"_id": ObjectId(user_id)},
@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field, EmailStr, field_validator, ConfigDict
 from typing import Optional, List, Union
 from datetime import datetime
 from enum import Enum
+from crypto_service import EncryptedStr
 
 class UserRole(str, Enum):
     user = "user"
@@ -111,9 +112,18 @@ class SwitchRoleRequest(BaseModel):
 
 class TokenResponse(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
     user: UserResponse
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class RefreshTokenResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str = "bearer"
+
 class HospitalBase(BaseModel):
     name: str
     location: str
@@ -260,14 +270,14 @@ class AppointmentBase(BaseModel):
     hospital_id: str
     appointment_date: datetime
     status: AppointmentStatus = AppointmentStatus.pending
-    notes: Optional[str] = None
+    notes: EncryptedStr = None
 
 class AppointmentCreate(AppointmentBase):
     pass
 
 class AppointmentUpdate(BaseModel):
     status: Optional[AppointmentStatus] = None
-    notes: Optional[str] = None
+    notes: EncryptedStr = None
 
 class PatientInfo(BaseModel):
     id: str
@@ -296,9 +306,9 @@ class MedicalRecordBase(BaseModel):
     patient_id: str
     record_type: str
     title: str
-    description: Optional[str] = None
+    description: EncryptedStr = None
     file_path: Optional[str] = None
-    doctor_notes: Optional[str] = None
+    doctor_notes: EncryptedStr = None
 
 class MedicalRecordCreate(MedicalRecordBase):
     pass
@@ -370,6 +380,18 @@ class AdminStats(BaseModel):
     total_hospitals: int
     pending_verifications: int
     total_appointments: int
+    counters_refreshed_at: Optional[datetime] = None
+
+# Notifications
+class NotificationBulkReadRequest(BaseModel):
+    ids: Optional[List[str]] = None  # These notifications
+    before: Optional[str] = None  # This notification id and everything older (neither = all)
+
+class NotificationCounts(BaseModel):
+    unread: int
+    latest_id: Optional[str] = None
+    version: int
+    updated: Optional[int] = None
 
 # Document Tracking Schemas
 class DocumentType(str, Enum):
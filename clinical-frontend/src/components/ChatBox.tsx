@@ -1,5 +1,6 @@
 import React, { useEffect, useRef, useState } from "react";
 import { apiClient } from "../services/api";
+import { realtime, CATCH_UP_POLL_MS } from "../services/realtime";
 
 const API_BASE_URL = "https://wellnessdev.onrender.com";
 
@@ -25,11 +26,6 @@ interface ChatBoxProps {
   appointmentDetails?: any;  // Doctor/patient info for access validation
 }
 
-const WS_URL =
-  window.location.protocol === "https:"
-    ? `wss://${window.location.hostname}:8000/chat/ws/`
-    : `ws://${window.location.hostname}:8000/chat/ws/`;
-
 export default function ChatBox({ appointmentId, userId, userRole, userName = "You", partnerName = "Doctor", appointmentDetails }: ChatBoxProps) {
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [input, setInput] = useState("");
@@ -38,8 +34,11 @@ export default function ChatBox({ appointmentId, userId, userRole, userName = "Y
   const [sending, setSending] = useState(false);
   const [accessDenied, setAccessDenied] = useState(false);
   const fileInputRef = useRef<HTMLInputElement>(null);
-  const ws = useRef<WebSocket | null>(null);
   const messagesEndRef = useRef<HTMLDivElement | null>(null);
+  // Texts sent over the socket and not yet echoed back (null for file messages), oldest first
+  const pendingRef = useRef<(string | null)[]>([]);
+  // Timestamp of the newest message already marked read
+  const readThroughRef = useRef("");
 
   // Check if user has access to this appointment
   useEffect(() => {
@@ -82,16 +81,37 @@ export default function ChatBox({ appointmentId, userId, userRole, userName = "Y
 
   // Fetch chat history on mount
   useEffect(() => {
+    readThroughRef.current = "";
     loadChatHistory();
   }, [appointmentId]);
 
-  // WebSocket connection for live messages
+  // Live messages over the shared realtime socket
   useEffect(() => {
-    connectWebSocket();
-    return () => {
-      ws.current?.close();
-    };
-  }, [appointmentId]);
+    return realtime.subscribe(appointmentId, (event) => {
+      if (event.type === "error") {
+        // The server refused our oldest pending frame - send that message over HTTP instead
+        const text = pendingRef.current.shift();
+        console.warn("[ChatBox] Realtime error:", event.detail);
+        if (text) {
+          apiClient.sendChatMessage(appointmentId, text).catch((error) => {
+            console.error("Failed to send message:", error);
+            alert("Failed to send message");
+          });
+        }
+        return;
+      }
+      if (event.type !== "message") return;
+      const msg = event.message;
+      if (msg.sender_id === userId) pendingRef.current.shift();
+      console.log('[ChatBox] Realtime message:', msg);
+      // Only add if message doesn't already exist
+      setMessages(prev => {
+        const exists = prev.some(m => (m._id === msg._id) || (m._id === msg.id));
+        if (exists) return prev;
+        return [...prev, msg];
+      });
+    });
+  }, [appointmentId, userId]);
 
   // Scroll to bottom on new message
   useEffect(() => {
@@ -111,9 +131,13 @@ export default function ChatBox({ appointmentId, userId, userRole, userName = "Y
     }
   }
 
-  // Poll for new messages every 3 seconds as fallback
+  // Poll for new messages every 3 seconds while the realtime socket is down (every
+  // CATCH_UP_POLL_MS while it is open, for messages written through other API workers)
   useEffect(() => {
+    let lastPoll = Date.now();
     const pollInterval = setInterval(async () => {
+      if (realtime.isOpen() && Date.now() - lastPoll < CATCH_UP_POLL_MS) return;
+      lastPoll = Date.now();
       try {
         const history = await apiClient.getChatHistory(appointmentId);
         const newMessages = Array.isArray(history) ? history.filter((msg: any) => !msg.deleted) : [];
@@ -132,42 +156,6 @@ export default function ChatBox({ appointmentId, userId, userRole, userName = "Y
     return () => clearInterval(pollInterval);
   }, [appointmentId]);
 
-  function connectWebSocket() {
-    try {
-      const token = localStorage.getItem('authToken');
-      ws.current = new WebSocket(`${WS_URL}${appointmentId}?token=${token}`);
-
-      ws.current.onopen = () => {
-        console.log("WebSocket connected");
-      };
-
-      ws.current.onmessage = (event) => {
-        try {
-          const msg = JSON.parse(event.data);
-          console.log('[ChatBox] WebSocket received:', msg);
-          // Only add if message doesn't already exist
-          setMessages(prev => {
-            const exists = prev.some(m => (m._id === msg._id) || (m._id === msg.id));
-            if (exists) return prev;
-            return [...prev, msg];
-          });
-        } catch (error) {
-          console.error("Failed to parse WebSocket message:", error);
-        }
-      };
-
-      ws.current.onerror = (error) => {
-        console.error("WebSocket error:", error);
-      };
-
-      ws.current.onclose = () => {
-        console.log("WebSocket disconnected");
-      };
-    } catch (error) {
-      console.error("Failed to connect WebSocket:", error);
-    }
-  }
-
   async function sendMessage() {
     if (!input.trim() && !uploading) return;
 
@@ -176,15 +164,14 @@ export default function ChatBox({ appointmentId, userId, userRole, userName = "Y
       if (useWhatsApp) {
         await apiClient.sendWhatsAppMessage(appointmentId, input);
       } else {
-        if (ws.current?.readyState === 1) {
-          ws.current.send(
-            JSON.stringify({
-              sender_id: userId,
-              sender_role: userRole,
-              message: input,
-              message_type: "text",
-            })
-          );
+        const sent = realtime.send({
+          type: "message",
+          conversation_id: appointmentId,
+          message: input,
+          message_type: "text",
+        });
+        if (sent) {
+          pendingRef.current.push(input);
         } else {
           // Fallback to HTTP if WebSocket not available
           await apiClient.sendChatMessage(appointmentId, input);
@@ -210,17 +197,14 @@ export default function ChatBox({ appointmentId, userId, userRole, userName = "Y
       const response = await apiClient.uploadChatFile(appointmentId, file);
       
       // Send message with file
-      if (ws.current?.readyState === 1) {
-        ws.current.send(
-          JSON.stringify({
-            sender_id: userId,
-            sender_role: userRole,
-            message: file.name,
-            message_type: file.type.startsWith("image/") ? "image" : "document",
-            file_url: response.file_url,
-          })
-        );
-      }
+      const sent = realtime.send({
+        type: "message",
+        conversation_id: appointmentId,
+        message: file.name,
+        message_type: file.type.startsWith("image/") ? "image" : "document",
+        file_url: response.file_url,
+      });
+      if (sent) pendingRef.current.push(null);
     } catch (error) {
       console.error("File upload failed:", error);
       alert("Failed to upload file");
@@ -232,9 +216,11 @@ export default function ChatBox({ appointmentId, userId, userRole, userName = "Y
     }
   }
 
-  async function markMessageRead(messageId: string) {
+  async function markMessageRead(msg: ChatMessage) {
+    if (msg.sender_id === userId || msg.timestamp <= readThroughRef.current) return;
+    readThroughRef.current = msg.timestamp;
     try {
-      await apiClient.markChatMessageRead(messageId);
+      await apiClient.markChatRead(appointmentId, msg.timestamp);
     } catch (error) {
       // Silently fail - read status is optional
       // console.error("Failed to mark message as read:", error);
@@ -272,7 +258,7 @@ export default function ChatBox({ appointmentId, userId, userRole, userName = "Y
             <div
               key={msg._id || idx}
               className={`flex flex-col ${msg.sender_id === userId ? "items-end" : "items-start"}`}
-              onMouseEnter={() => msg._id && markMessageRead(msg._id)}
+              onMouseEnter={() => markMessageRead(msg)}
             >
               {/* Sender Name */}
               <span className={`text-xs font-bold mb-1 ${
@@ -3,12 +3,13 @@ import { useUser } from "../context/UserContext";
 import { useAppointment } from "../context/AppointmentContext";
 import { useNavigate } from "react-router-dom";
 import { apiClient } from "../services/api";
+import { realtime } from "../services/realtime";
 
 import ThemeToggle from "./ThemeToggle";
 
 export default function Header() {
     const { user, logout, switchRole } = useUser();
-    const { getNotifications, approveAppointment, rejectAppointment, markNotificationAsRead } = useAppointment();
+    const { getNotifications, approveAppointment, rejectAppointment, markNotificationAsRead, markNotificationsAsRead } = useAppointment();
     const navigate = useNavigate();
     const [isDropdownOpen, setIsDropdownOpen] = useState(false);
     const [showNotifications, setShowNotifications] = useState(false);
@@ -64,14 +65,36 @@ export default function Header() {
         }
     }, [user?.id, effectiveRole, getNotifications]);
 
-    // Initial fetch + Auto-refresh notifications every 30 seconds
+    // Initial fetch, then poll the unread count every 30 seconds and
+    // reload the list only when the count endpoint reports a change
+    const notificationsVersion = useRef<number | null>(null);
     useEffect(() => {
         fetchNotifications();
-        
-        // Set up polling interval (30 seconds)
-        const interval = setInterval(fetchNotifications, 30000);
-        return () => clearInterval(interval);
-    }, [fetchNotifications]);
+
+        const pollUnreadCount = async () => {
+            if (!user?.id) return;
+            try {
+                const { unread, version } = await apiClient.getUnreadNotificationCount();
+                setUnreadCount(unread);
+                if (notificationsVersion.current !== null && notificationsVersion.current !== version) {
+                    fetchNotifications();
+                }
+                notificationsVersion.current = version;
+            } catch (error) {
+                console.error("Failed to fetch unread notification count:", error);
+            }
+        };
+        pollUnreadCount();
+
+        // New notifications are pushed over the realtime socket at once; keep polling (30 seconds)
+        // for those written through other API workers, which this socket does not hear about
+        const stopListening = realtime.on("notification", pollUnreadCount);
+        const interval = setInterval(pollUnreadCount, 30000);
+        return () => {
+            clearInterval(interval);
+            stopListening();
+        };
+    }, [fetchNotifications, user?.id]);
 
     // Also refresh when notification panel is opened
     useEffect(() => {
@@ -119,6 +142,16 @@ export default function Header() {
         }
     };
 
+    // One request for everything shown - notifications that arrived since stay unread
+    const handleMarkAllRead = async () => {
+        if (userNotifications.length === 0) return;
+        const unread = await markNotificationsAsRead({ before: userNotifications[0].id });
+        if (unread !== null) {
+            setUserNotifications(prev => prev.map(n => ({ ...n, read: true })));
+            setUnreadCount(unread);
+        }
+    };
+
     const handleApprove = async (appointmentId: string) => {
         setActionLoading(appointmentId);
         try {
@@ -384,9 +417,17 @@ export default function Header() {
                                 </svg>
                             </button>
                             {unreadCount > 0 && (
-                                <span className="ml-auto bg-gradient-to-r from-red-500 to-pink-500 text-white text-xs font-bold rounded-full px-3 py-1 shadow animate-pulse">
-                                    {unreadCount} unread
-                                </span>
+                                <>
+                                    <span className="ml-auto bg-gradient-to-r from-red-500 to-pink-500 text-white text-xs font-bold rounded-full px-3 py-1 shadow animate-pulse">
+                                        {unreadCount} unread
+                                    </span>
+                                    <button
+                                        onClick={handleMarkAllRead}
+                                        className="ml-2 text-xs font-medium text-blue-600 hover:text-blue-800 hover:underline"
+                                    >
+                                        Mark all read
+                                    </button>
+                                </>
                             )}
                         </div>
                         {/* Debug: Show current role */}
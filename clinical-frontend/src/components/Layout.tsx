@@ -4,6 +4,7 @@ import { useUser } from "../context/UserContext";
 import { useTheme } from "../context/ThemeContext";
 import { useAppointment } from "../context/AppointmentContext";
 import { apiClient, fhirApi } from "../services/api";
+import { realtime } from "../services/realtime";
 import Sidebar from "./Sidebar";
 import NotificationsPanel from "./NotificationsPanel";
  
@@ -115,9 +116,30 @@ const [fhirResults, setFhirResults] = useState<any[]>([]);
     };
     fetchNotifications();
    
-    // Poll for new notifications every 30 seconds
-    const interval = setInterval(fetchNotifications, 30000);
-    return () => clearInterval(interval);
+    // Refresh the unread count when a notification is pushed over the realtime socket and every
+    // 30 seconds; reload the list only when it reports a change
+    let version: number | null = null;
+    const pollUnreadCount = async () => {
+      if (!user?.id) return;
+      try {
+        const counts = await apiClient.getUnreadNotificationCount();
+        setUnreadCount(counts.unread);
+        if (version !== null && version !== counts.version) {
+          fetchNotifications();
+        }
+        version = counts.version;
+      } catch (error) {
+        console.error("Failed to fetch unread notification count:", error);
+      }
+    };
+    pollUnreadCount();
+    const stopListening = realtime.on("notification", pollUnreadCount);
+    // Pushes only come from this API worker - the poll catches notifications written through others
+    const interval = setInterval(pollUnreadCount, 30000);
+    return () => {
+      clearInterval(interval);
+      stopListening();
+    };
   }, [user?.id, user?.currentRole, effectiveRole, isDoctor, getNotifications]);
  
   const refreshNotifications = async () => {
@@ -22,6 +22,7 @@ export default function NotificationsPanel({
   const {
     getNotifications,
     markNotificationAsRead,
+    markNotificationsAsRead,
     clearNotifications,
     approveAppointment,
     rejectAppointment,
@@ -94,6 +95,14 @@ export default function NotificationsPanel({
   };
 
 
+  const handleMarkAllRead = async () => {
+    if (notifications.length === 0) return;
+    const unread = await markNotificationsAsRead({ before: notifications[0].id });
+    if (unread !== null) {
+      setNotifications((prev) => prev.map((n) => ({ ...n, read: true })));
+    }
+  };
+
   const handleClearAll = () => {
     clearNotifications(userId, userType);
   };
@@ -227,7 +236,17 @@ export default function NotificationsPanel({
             {/* Text */}
             <div>
               <h2 className="text-xl font-bold text-gray-900">Notifications</h2>
-              <p className="text-sm text-gray-600">{unreadCount} unread</p>
+              <p className="text-sm text-gray-600">
+                {unreadCount} unread
+                {unreadCount > 0 && (
+                  <button
+                    onClick={handleMarkAllRead}
+                    className="ml-2 text-blue-600 hover:text-blue-800 hover:underline"
+                  >
+                    Mark all read
+                  </button>
+                )}
+              </p>
             </div>
           </div>
           <button onClick={onClose} className="text-gray-400 hover:text-gray-600">
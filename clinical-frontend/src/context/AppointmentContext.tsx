@@ -56,6 +56,7 @@ interface AppointmentContextType {
   cancelAppointment: (appointmentId: string) => void;
   getNotifications: (userId: string, userType: "user" | "doctor") => Promise<Notification[]>;
   markNotificationAsRead: (notificationId: string) => Promise<void>;
+  markNotificationsAsRead: (selection?: { ids?: string[]; before?: string }) => Promise<number | null>;
   clearNotifications: (userId: string, userType: "user" | "doctor") => void;
 }
 
@@ -373,6 +374,22 @@ export function AppointmentProvider({
     }
   };
 
+  // Batch mark-as-read; resolves to the new unread count (null if the request failed)
+  const markNotificationsAsRead = async (selection: { ids?: string[]; before?: string } = {}) => {
+    try {
+      const counts = await apiClient.markNotificationsRead(selection);
+      setNotifications((prev) =>
+        prev.map((notif) =>
+          !selection.ids || selection.ids.includes(notif.id) ? { ...notif, read: true } : notif
+        )
+      );
+      return counts.unread;
+    } catch (error) {
+      console.error("Failed to mark notifications as read:", error);
+      return null;
+    }
+  };
+
   const clearNotifications = (userId: string, userType: "user" | "doctor") => {
     setNotifications((prev) =>
       prev.filter(
@@ -399,6 +416,7 @@ export function AppointmentProvider({
         cancelAppointment,
         getNotifications,
         markNotificationAsRead,
+        markNotificationsAsRead,
         clearNotifications,
       }}
     >
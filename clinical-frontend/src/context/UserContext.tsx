@@ -1,4 +1,6 @@
 import React, { createContext, useState, useContext, useEffect } from "react";
+import { apiClient } from "../services/api";
+import { realtime } from "../services/realtime";
 
 interface User {
   id?: string;
@@ -198,6 +200,11 @@ export function UserProvider({ children }: { children: React.ReactNode }) {
   };
 
   const logout = () => {
+    const refreshToken = localStorage.getItem("refreshToken");
+    if (refreshToken) {
+      apiClient.logout(refreshToken).catch(() => {}); // Best effort - the token expires anyway
+    }
+    realtime.close(); // The shared socket is authenticated as this user
     setUser(null);
     setSession(null);
     localStorage.removeItem("userType");
@@ -209,6 +216,7 @@ export function UserProvider({ children }: { children: React.ReactNode }) {
     localStorage.removeItem("userAvatar");
     localStorage.removeItem("sessionData");
     localStorage.removeItem("authToken"); // Also clear auth token
+    localStorage.removeItem("refreshToken");
   };
 
   return (
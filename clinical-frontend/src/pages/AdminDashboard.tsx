@@ -583,7 +583,7 @@ export default function AdminDashboard() {
 
   const viewDetails = async (type: string, id: string) => {
     try {
-      const details = await fetchAPI(`/admin/${type}/${id}/details`);
+      const details = await fetchAPI(`/admin/${type}/${id}/details?include_total=true`);
       setSelectedItem(details);
       setModalType(type);
       setShowModal(true);
@@ -1916,7 +1916,7 @@ function DetailsModal({ type, data, isDark, onClose }: { type: string; data: any
           {data.appointments?.length > 0 && (
             <div className={`mb-6 p-4 rounded-lg ${isDark ? "bg-gray-700" : "bg-gray-50"}`}>
               <h3 className={`font-semibold mb-3 ${isDark ? "text-white" : "text-gray-900"}`}>
-                📅 Appointments ({data.appointments.length})
+                📅 Appointments ({data.pagination?.appointments?.total ?? data.appointments.length})
               </h3>
               <div className="space-y-2 max-h-40 overflow-y-auto">
                 {data.appointments.slice(0, 5).map((apt: any, idx: number) => (
@@ -1937,7 +1937,7 @@ function DetailsModal({ type, data, isDark, onClose }: { type: string; data: any
           {data.relationships?.length > 0 && (
             <div className={`p-4 rounded-lg ${isDark ? "bg-gray-700" : "bg-gray-50"}`}>
               <h3 className={`font-semibold mb-3 ${isDark ? "text-white" : "text-gray-900"}`}>
-                🔗 Relationships ({data.relationships.length})
+                🔗 Relationships ({data.pagination?.relationships?.total ?? data.relationships.length})
               </h3>
               <div className="space-y-2">
                 {data.relationships.map((rel: any, idx: number) => (
@@ -2,6 +2,7 @@ import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useUser } from '../context/UserContext';
 import { fetchAPI } from '../services/api';
+import { realtime, RealtimeEvent, CATCH_UP_POLL_MS } from '../services/realtime';
 
 // Types
 interface Message {
@@ -67,6 +68,7 @@ const ChatPage: React.FC = () => {
   const [newMessage, setNewMessage] = useState('');
   const [loading, setLoading] = useState(true);
   const [messagesLoading, setMessagesLoading] = useState(false);
+  const [archiveExhausted, setArchiveExhausted] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const [showSidebar, setShowSidebar] = useState(true);
   const [currentConversationData, setCurrentConversationData] = useState<Conversation | null>(null);
@@ -74,11 +76,15 @@ const ChatPage: React.FC = () => {
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [uploading, setUploading] = useState(false);
   const [showEmojiPicker, setShowEmojiPicker] = useState(false);
+  const [typingIn, setTypingIn] = useState<Record<string, boolean>>({});
+  const [onlineUsers, setOnlineUsers] = useState<Set<string>>(new Set());
   
   // Refs
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
-  const wsRef = useRef<WebSocket | null>(null);
+  const selectedRef = useRef<string | null>(selectedConversation);
+  const typingSentRef = useRef(0);
+  const typingTimersRef = useRef<Record<string, ReturnType<typeof setTimeout>>>({});
   const messageInputRef = useRef<HTMLTextAreaElement>(null);
 
   // Common emojis for quick access
@@ -104,13 +110,17 @@ const ChatPage: React.FC = () => {
   // Load messages for selected conversation
   const loadMessages = useCallback(async (conversationId: string) => {
     setMessagesLoading(true);
+    setArchiveExhausted(false);
     try {
       const data = await fetchAPI<Message[]>(`/chat/messages/${conversationId}`);
       setMessages(data);
       setTimeout(scrollToBottom, 100);
       
-      // Mark messages as read
-      await fetchAPI(`/chat/messages/${conversationId}/read`, { method: 'PUT' });
+      // Mark messages as read - only up to the newest one rendered
+      if (data.length > 0) {
+        const through = encodeURIComponent(data[data.length - 1].timestamp);
+        await fetchAPI(`/chat/messages/${conversationId}/read?through=${through}`, { method: 'PUT' });
+      }
       
       // Update unread count in conversations
       setConversations(prev => 
@@ -137,55 +147,69 @@ const ChatPage: React.FC = () => {
     }
   }, [selectedConversation, conversations]);
 
-  // Setup WebSocket connection
-  const setupWebSocket = useCallback((conversationId: string) => {
-    if (wsRef.current) {
-      wsRef.current.close();
-    }
-
-    const token = localStorage.getItem('authToken');
-    const wsUrl = `ws://localhost:8000/chat/ws/${conversationId}?token=${token}`;
-    
-    const ws = new WebSocket(wsUrl);
-    
-    ws.onopen = () => {
-      console.log('WebSocket connected');
-    };
-    
-    ws.onmessage = (event) => {
-      const data = JSON.parse(event.data);
-      console.log('[CHAT] WebSocket received:', data);
-      if (data.type === 'message' || data.message || data.sender_id) {
-        const newMsg = data.message || data;
+  // Live events from the shared realtime socket, for every conversation in the sidebar
+  const handleRealtimeEvent = useCallback((event: RealtimeEvent) => {
+    const conversationId = event.conversation_id!;
+    if (event.type === 'message') {
+      const newMsg: Message = event.message;
+      const isOpenConversation = conversationId === selectedRef.current;
+      if (isOpenConversation) {
         // Only add if message doesn't already exist
         setMessages(prev => {
-          const exists = prev.some(m => m.id === newMsg.id || m.id === newMsg._id);
+          const exists = prev.some(m => m.id === newMsg.id || m.id === (newMsg as any)._id);
           if (exists) return prev;
           return [...prev, newMsg];
         });
         setTimeout(scrollToBottom, 100);
-        
-        // Update last message in conversations
-        setConversations(prev =>
-          prev.map(conv =>
-            conv.conversation_id === conversationId
-              ? { ...conv, last_message: newMsg.message, last_message_time: newMsg.timestamp }
-              : conv
-          )
+        if (newMsg.sender_id !== user?.id) {
+          fetchAPI(`/chat/messages/${conversationId}/read?through=${encodeURIComponent(newMsg.timestamp)}`, { method: 'PUT' })
+            .catch(() => {});
+        }
+      }
+
+      // Update last message (and unread count) in conversations
+      setConversations(prev =>
+        prev.map(conv =>
+          conv.conversation_id === conversationId
+            ? {
+                ...conv,
+                last_message: newMsg.message,
+                last_message_time: newMsg.timestamp,
+                unread_count: !isOpenConversation && newMsg.sender_id !== user?.id ? conv.unread_count + 1 : conv.unread_count
+              }
+            : conv
+        )
+      );
+      setTypingIn(prev => ({ ...prev, [conversationId]: false }));
+    } else if (event.type === 'typing') {
+      setTypingIn(prev => ({ ...prev, [conversationId]: event.is_typing }));
+      // Clear a stale indicator if the "stopped typing" event never comes
+      clearTimeout(typingTimersRef.current[conversationId]);
+      if (event.is_typing) {
+        typingTimersRef.current[conversationId] = setTimeout(
+          () => setTypingIn(prev => ({ ...prev, [conversationId]: false })),
+          5000
         );
       }
-    };
-    
-    ws.onclose = () => {
-      console.log('WebSocket disconnected');
-    };
-    
-    ws.onerror = (error) => {
-      console.error('WebSocket error:', error);
-    };
-    
-    wsRef.current = ws;
-  }, []);
+    } else if (event.type === 'presence') {
+      setOnlineUsers(prev => {
+        const next = new Set(prev);
+        if (event.online) next.add(event.user_id); else next.delete(event.user_id);
+        return next;
+      });
+    } else if (event.type === 'subscribed') {
+      setOnlineUsers(prev => new Set([...prev, ...event.online]));
+    }
+  }, [user?.id]);
+
+  // Tell the partner we are typing (at most every 3 seconds)
+  const sendTyping = (isTyping: boolean) => {
+    if (!selectedConversation) return;
+    const now = Date.now();
+    if (isTyping && now - typingSentRef.current < 3000) return;
+    typingSentRef.current = isTyping ? now : 0;
+    realtime.send({ type: 'typing', conversation_id: selectedConversation, is_typing: isTyping });
+  };
 
   // Send message
   const sendMessage = async () => {
@@ -198,6 +222,7 @@ const ChatPage: React.FC = () => {
 
     const messageToSend = newMessage.trim();
     setNewMessage('');
+    sendTyping(false);
 
     // Always use HTTP POST for sending messages (more reliable than WebSocket)
     try {
@@ -208,7 +233,12 @@ const ChatPage: React.FC = () => {
       });
       console.log('[CHAT] Message sent successfully:', response);
       console.log('[CHAT] Response sender_id:', response.sender_id, 'User id:', user?.id);
-      setMessages(prev => [...prev, response]);
+      // The realtime socket may already have delivered it
+      setMessages(prev => {
+        const exists = prev.some(m => m.id === response.id);
+        if (exists) return prev;
+        return [...prev, response];
+      });
       setTimeout(scrollToBottom, 100);
     } catch (error) {
       console.error('[CHAT] Failed to send message:', error);
@@ -325,14 +355,39 @@ const ChatPage: React.FC = () => {
     conv.partner_name.toLowerCase().includes(searchTerm.toLowerCase())
   );
 
+  // Load the next page of messages moved to the chat archive (older than the retention window)
+  const loadArchivedMessages = async () => {
+    if (!selectedConversation) return;
+    const before = messages.length > 0 ? messages[0].timestamp : new Date().toISOString();
+    try {
+      const data = await fetchAPI<Message[]>(
+        `/chat/messages/${selectedConversation}?archived_before=${encodeURIComponent(before)}`
+      );
+      if (data.length === 0) {
+        setArchiveExhausted(true);
+        return;
+      }
+      setMessages(prev => {
+        const ids = new Set(prev.map(m => m.id));
+        return [...data.filter(m => !ids.has(m.id)), ...prev];
+      });
+    } catch (error) {
+      console.error('Failed to load archived messages:', error);
+    }
+  };
+
   // Get partner info for current conversation
   const currentPartner = conversations.find(c => c.conversation_id === selectedConversation);
 
   // Poll for new messages as fallback (every 3 seconds)
   const pollMessages = useCallback(async (conversationId: string) => {
     try {
-      const data = await fetchAPI<Message[]>(`/chat/messages/${conversationId}`);
+      const hot = await fetchAPI<Message[]>(`/chat/messages/${conversationId}`);
       setMessages(prev => {
+        // Keep archived messages already loaded in front of the live ones
+        const data = hot.length > 0
+          ? [...prev.filter(m => m.timestamp < hot[0].timestamp), ...hot]
+          : hot;
         // Only update if we have new messages
         if (data.length > prev.length) {
           return data;
@@ -357,33 +412,49 @@ const ChatPage: React.FC = () => {
     loadConversations();
   }, [loadConversations]);
 
+  // One shared socket: subscribe to every listed conversation, not just the open one
+  const conversationIds = conversations.map(c => c.conversation_id).join(',');
+  useEffect(() => {
+    if (!conversationIds) return;
+    const unsubscribes = conversationIds.split(',').map(id => realtime.subscribe(id, handleRealtimeEvent));
+    return () => unsubscribes.forEach(unsubscribe => unsubscribe());
+  }, [conversationIds, handleRealtimeEvent]);
+
+  useEffect(() => {
+    if (!selectedConversation || conversationIds.split(',').includes(selectedConversation)) return;
+    return realtime.subscribe(selectedConversation, handleRealtimeEvent);
+  }, [selectedConversation, conversationIds, handleRealtimeEvent]);
+
   useEffect(() => {
+    selectedRef.current = selectedConversation;
     if (selectedConversation) {
       loadMessages(selectedConversation);
-      setupWebSocket(selectedConversation);
       
       // Update URL
       navigate(`/chat/${selectedConversation}`, { replace: true });
       
-      // Poll for new messages every 3 seconds as fallback
+      // Catch up on anything missed while the socket was reconnecting
+      const stopCatchUp = realtime.on('open', () => {
+        pollMessages(selectedConversation);
+        loadConversations();
+      });
+
+      // Poll every 3 seconds while the realtime socket is down, and catch up on
+      // writes handled by other API workers every CATCH_UP_POLL_MS while it is open
+      let lastPoll = Date.now();
       const pollInterval = setInterval(() => {
+        if (realtime.isOpen() && Date.now() - lastPoll < CATCH_UP_POLL_MS) return;
+        lastPoll = Date.now();
         pollMessages(selectedConversation);
+        if (realtime.isOpen()) loadConversations();
       }, 3000);
       
       return () => {
         clearInterval(pollInterval);
-        if (wsRef.current) {
-          wsRef.current.close();
-        }
+        stopCatchUp();
       };
     }
-    
-    return () => {
-      if (wsRef.current) {
-        wsRef.current.close();
-      }
-    };
-  }, [selectedConversation, loadMessages, setupWebSocket, navigate, pollMessages]);
+  }, [selectedConversation, loadMessages, loadConversations, navigate, pollMessages]);
 
   useEffect(() => {
     scrollToBottom();
@@ -518,7 +589,7 @@ const ChatPage: React.FC = () => {
                     </div>
                     {/* Online indicator or chat status */}
                     {conv.chat_enabled ? (
-                      <div className="absolute bottom-0 right-0 w-3 h-3 bg-green-500 rounded-full border-2 border-white"></div>
+                      <div className={`absolute bottom-0 right-0 w-3 h-3 ${onlineUsers.has(conv.partner_id) ? 'bg-green-500' : 'bg-gray-300'} rounded-full border-2 border-white`}></div>
                     ) : (
                       <div className="absolute bottom-0 right-0 w-3 h-3 bg-yellow-500 rounded-full border-2 border-white"></div>
                     )}
@@ -543,7 +614,9 @@ const ChatPage: React.FC = () => {
                     </div>
                     <div className="flex items-center justify-between mt-1">
                       <p className="text-sm text-gray-500 truncate">
-                        {conv.last_message || 'No messages yet'}
+                        {typingIn[conv.conversation_id]
+                          ? <span className="text-[#25d366]">typing…</span>
+                          : conv.last_message || 'No messages yet'}
                       </p>
                       {conv.unread_count > 0 && (
                         <span className="bg-[#25d366] text-white text-xs rounded-full px-2 py-0.5 min-w-[20px] text-center">
@@ -585,7 +658,9 @@ const ChatPage: React.FC = () => {
                     {currentPartner?.partner_role === 'doctor' ? 'Dr. ' : ''}{currentPartner?.partner_name || 'Chat'}
                   </h2>
                   <p className="text-xs text-white/80">
-                    {currentPartner?.chat_enabled 
+                    {typingIn[selectedConversation] ? 'typing…'
+                      : currentPartner && onlineUsers.has(currentPartner.partner_id) ? 'online'
+                      : currentPartner?.chat_enabled 
                       ? `${currentPartner?.total_appointments || 0} appointment${(currentPartner?.total_appointments || 0) > 1 ? 's' : ''}` 
                       : 'Pending approval'}
                   </p>
@@ -613,6 +688,16 @@ const ChatPage: React.FC = () => {
                   backgroundColor: '#e5ddd5'
                 }}
               >
+                {!messagesLoading && !archiveExhausted && (
+                  <div className="flex justify-center mb-2">
+                    <button
+                      onClick={loadArchivedMessages}
+                      className="bg-white/90 text-[#008069] text-xs px-3 py-1 rounded-lg shadow-sm hover:bg-white"
+                    >
+                      Load earlier messages
+                    </button>
+                  </div>
+                )}
                 {messagesLoading ? (
                   <div className="flex items-center justify-center h-full">
                     <div className="animate-spin rounded-full h-8 w-8 border-4 border-teal-500 border-t-transparent"></div>
@@ -795,7 +880,10 @@ const ChatPage: React.FC = () => {
                   <textarea
                     ref={messageInputRef}
                     value={newMessage}
-                    onChange={(e) => setNewMessage(e.target.value)}
+                    onChange={(e) => {
+                      setNewMessage(e.target.value);
+                      sendTyping(e.target.value.length > 0);
+                    }}
                     onKeyPress={handleKeyPress}
                     placeholder="Type a message"
                     className="w-full px-4 py-2 bg-white rounded-lg border-0 focus:outline-none focus:ring-2 focus:ring-[#008069]/30 resize-none"
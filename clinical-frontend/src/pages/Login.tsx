@@ -120,6 +120,9 @@ export default function Login() {
         createSession(userData);
         
         localStorage.setItem("authToken", response.access_token);
+        if (response.refresh_token) {
+          localStorage.setItem("refreshToken", response.refresh_token);
+        }
         localStorage.setItem("userId", userId);
         localStorage.setItem("userName", response.user.name);
         localStorage.setItem("userEmail", response.user.email);
@@ -1,5 +1,5 @@
 // const API_BASE_URL = "http://localhost:8000";
-const API_BASE_URL = "https://wellness-page.onrender.com";
+export const API_BASE_URL = "https://wellness-page.onrender.com";
  
 export interface ApiResponse<T> {
   data?: T;
@@ -14,10 +14,41 @@ function getAuthToken(): string | null {
   return token;
 }
  
+// Exchange the stored refresh token for a new access token (one request at a time)
+let refreshPromise: Promise<boolean> | null = null;
+async function refreshAuthToken(): Promise<boolean> {
+  const refreshToken = localStorage.getItem("refreshToken");
+  if (!refreshToken) return false;
+
+  if (!refreshPromise) {
+    refreshPromise = (async () => {
+      try {
+        const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ refresh_token: refreshToken }),
+        });
+        // Refresh tokens are single use - another tab may have rotated it meanwhile
+        if (!response.ok) return localStorage.getItem("refreshToken") !== refreshToken;
+        const data = await response.json();
+        localStorage.setItem("authToken", data.access_token);
+        localStorage.setItem("refreshToken", data.refresh_token);
+        return true;
+      } catch {
+        return false;
+      } finally {
+        refreshPromise = null;
+      }
+    })();
+  }
+  return refreshPromise;
+}
+ 
 // Make API request with auth token
 export async function fetchAPI<T>(
   endpoint: string,
-  options: RequestInit = {}
+  options: RequestInit = {},
+  retried = false
 ): Promise<T> {
   try {
     const headers: any = {
@@ -53,10 +84,14 @@ export async function fetchAPI<T>(
       const errorText = await response.text();
       console.error(`❌ API Error: ${response.status} - ${response.statusText}`, errorText);
      
-      // Handle 401 Unauthorized - clear auth and redirect to login
+      // Handle 401 Unauthorized - try a token refresh once, then clear auth and redirect to login
+      if (response.status === 401 && token && !retried && await refreshAuthToken()) {
+        return fetchAPI<T>(endpoint, options, true);
+      }
       if (response.status === 401) {
         console.warn("🔒 Unauthorized - Clearing auth data");
         localStorage.removeItem("authToken");
+        localStorage.removeItem("refreshToken");
         localStorage.removeItem("userId");
         localStorage.removeItem("userType");
         localStorage.removeItem("userName");
@@ -94,6 +129,14 @@ export const apiClient = {
         body: JSON.stringify(userData),
       });
     },
+
+    // Revoke this device's refresh token
+    async logout(refreshToken: string) {
+      return fetchAPI("/auth/logout", {
+        method: "POST",
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      });
+    },
   // Health check
   async health() {
     return fetchAPI("/health");
@@ -439,12 +482,24 @@ export const apiClient = {
     return fetchAPI("/notifications/");
   },
  
+  async getUnreadNotificationCount() {
+    return fetchAPI<{ unread: number; latest_id: string | null; version: number }>("/notifications/unread-count");
+  },
+ 
   async markNotificationRead(notificationId: string) {
     return fetchAPI(`/notifications/${notificationId}/read`, {
       method: "PUT",
     });
   },
  
+  // Mark many notifications read in one request: ids, everything up to `before`, or all
+  async markNotificationsRead(selection: { ids?: string[]; before?: string } = {}) {
+    return fetchAPI<{ unread: number; latest_id: string | null; version: number; updated: number }>("/notifications/read", {
+      method: "PUT",
+      body: JSON.stringify(selection),
+    });
+  },
+ 
   async deleteNotification(notificationId: string) {
     return fetchAPI(`/notifications/${notificationId}`, {
       method: "DELETE",
@@ -602,8 +657,10 @@ export const apiClient = {
     });
   },
  
-  async markChatMessageRead(messageId: string) {
-    return fetchAPI(`/chat/messages/${messageId}/read`, {
+  // Move the read marker of a conversation up to `through` (default: its newest message)
+  async markChatRead(conversationId: string, through?: string) {
+    const query = through ? `?through=${encodeURIComponent(through)}` : "";
+    return fetchAPI(`/chat/messages/${conversationId}/read${query}`, {
       method: "PUT",
     });
   },
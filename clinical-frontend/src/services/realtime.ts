@@ -0,0 +1,175 @@
+import { API_BASE_URL } from "./api";
+
+// One multiplexed WebSocket per client (/chat/ws) carrying chat messages for
+// every subscribed conversation, typing/presence events and notifications.
+// Components subscribe to conversations or event types; the socket is opened
+// on first use, answers server pings and resubscribes after reconnecting.
+// The socket is authenticated as one user: close() (on logout) or a token for
+// a different user tears it down together with every subscription.
+
+export interface RealtimeEvent {
+  type: string;
+  conversation_id?: string;
+  [key: string]: any;
+}
+
+type Handler = (event: RealtimeEvent) => void;
+
+// User id (sub claim) of an access token
+function tokenUser(token: string | null): string | null {
+  if (!token) return null;
+  try {
+    return JSON.parse(atob(token.split(".")[1].replace(/-/g, "+").replace(/_/g, "/"))).sub ?? null;
+  } catch {
+    return null;
+  }
+}
+
+class RealtimeClient {
+  private ws: WebSocket | null = null;
+  private conversations = new Map<string, Set<Handler>>();
+  private listeners = new Map<string, Set<Handler>>();
+  private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+  private retries = 0;
+  private userId: string | null = null;
+
+  constructor() {
+    // Login or logout in another tab
+    window.addEventListener("storage", (event) => {
+      if (event.key === "authToken") this.checkUser();
+    });
+  }
+
+  // Drop a socket that was authenticated as someone other than the current user
+  private checkUser() {
+    if (this.userId !== null && tokenUser(localStorage.getItem("authToken")) !== this.userId) {
+      this.close();
+    }
+  }
+
+  private connect() {
+    if (this.ws || this.reconnectTimer) return;
+    const token = localStorage.getItem("authToken");
+    if (!token) return;
+
+    this.userId = tokenUser(token);
+    const ws = new WebSocket(`${API_BASE_URL.replace(/^http/, "ws")}/chat/ws?token=${token}`);
+    this.ws = ws;
+
+    ws.onopen = () => {
+      this.retries = 0;
+      this.conversations.forEach((_, conversationId) =>
+        this.send({ type: "subscribe", conversation_id: conversationId })
+      );
+      this.emit({ type: "open" });
+    };
+
+    ws.onmessage = (event) => {
+      let data: RealtimeEvent;
+      try {
+        data = JSON.parse(event.data);
+      } catch (error) {
+        console.error("[Realtime] Failed to parse message:", error);
+        return;
+      }
+      // Server heartbeat - answer so the connection is not reaped as idle
+      if (data.type === "ping") {
+        this.send({ type: "pong" });
+        return;
+      }
+      if (data.conversation_id) {
+        this.conversations.get(data.conversation_id)?.forEach((handler) => handler(data));
+      }
+      this.emit(data);
+    };
+
+    ws.onclose = () => {
+      if (this.ws !== ws) return; // Closed by close()
+      this.ws = null;
+      this.emit({ type: "close" });
+      if (this.conversations.size === 0 && this.listeners.size === 0) return;
+      // Back off up to 30s between reconnect attempts
+      const delay = Math.min(30000, 1000 * 2 ** this.retries++);
+      this.reconnectTimer = setTimeout(() => {
+        this.reconnectTimer = null;
+        this.connect();
+      }, delay);
+    };
+
+    ws.onerror = (error) => {
+      console.error("[Realtime] WebSocket error:", error);
+    };
+  }
+
+  private emit(event: RealtimeEvent) {
+    this.listeners.get(event.type)?.forEach((handler) => handler(event));
+  }
+
+  // Tear down the socket, every subscription and any pending reconnect (logout)
+  close() {
+    if (this.reconnectTimer) clearTimeout(this.reconnectTimer);
+    this.reconnectTimer = null;
+    const ws = this.ws;
+    this.ws = null;
+    this.userId = null;
+    this.retries = 0;
+    this.conversations.clear();
+    this.listeners.clear();
+    ws?.close();
+  }
+
+  isOpen(): boolean {
+    this.checkUser();
+    return this.ws?.readyState === WebSocket.OPEN;
+  }
+
+  // Frames the server rejects come back as {type: "error", conversation_id, detail},
+  // delivered to that conversation's subscribers and to on("error")
+  send(frame: RealtimeEvent): boolean {
+    if (!this.isOpen()) return false;
+    this.ws!.send(JSON.stringify(frame));
+    return true;
+  }
+
+  // Receive every event for a conversation; returns the unsubscribe function
+  subscribe(conversationId: string, handler: Handler): () => void {
+    this.checkUser();
+    let handlers = this.conversations.get(conversationId);
+    if (!handlers) {
+      handlers = new Set();
+      this.conversations.set(conversationId, handlers);
+      this.send({ type: "subscribe", conversation_id: conversationId });
+    }
+    handlers.add(handler);
+    this.connect();
+
+    return () => {
+      handlers!.delete(handler);
+      if (handlers!.size === 0 && this.conversations.get(conversationId) === handlers) {
+        this.conversations.delete(conversationId);
+        this.send({ type: "unsubscribe", conversation_id: conversationId });
+      }
+    };
+  }
+
+  // Receive every event of one type (notification, typing, presence, open, close, ...)
+  on(type: string, handler: Handler): () => void {
+    this.checkUser();
+    if (!this.listeners.has(type)) this.listeners.set(type, new Set());
+    this.listeners.get(type)!.add(handler);
+    this.connect();
+
+    return () => {
+      const handlers = this.listeners.get(type);
+      handlers?.delete(handler);
+      if (handlers?.size === 0) this.listeners.delete(type);
+    };
+  }
+}
+
+// Socket fan-out only reaches clients connected to the API worker that handled
+// the write, so clients keep polling at this interval while the socket is open
+export const CATCH_UP_POLL_MS = 30000;
+
+// Global realtime client instance
+export const realtime = new RealtimeClient();